@@ -6,6 +6,9 @@ setup(
     packages=find_packages(),
     install_requires=[
         'pandas',
+        'numpy',
+        'scipy>=1.12',
+        'pyarrow',
         'networkx',
         'matplotlib',
         'seaborn',
@@ -0,0 +1,183 @@
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import SyntheticCitationGenerator
+from centralities.calculator import CentralityCalculator
+from data_ingestion.cleaner import DataCleaner
+from graph.builder import GraphBuilder
+
+
+def _reference_disruption(G):
+    """
+    Computes the disruption index node by node from its definition, as in DisruptionCalculator.
+
+    Parameters:
+    G (networkx.DiGraph): The graph to analyze.
+
+    Returns:
+    dict: Dictionary of nodes with disruption index as values.
+    """
+    disruption = {}
+    for node in G:
+        references = set(G.successors(node))
+        citing = set(G.predecessors(node))
+        j = sum(1 for p in citing if references & set(G.successors(p)))
+        i = len(citing) - j
+        k = sum(1 for s in references for q in G.predecessors(s) if q != node and not G.has_edge(q, node))
+        disruption[node] = (i - j) / (i + j + k) if i + j + k else np.nan
+    return disruption
+
+
+def _reference_trophic_levels(G):
+    """
+    Solves the trophic level system of MacKay, Johnson and Sansom densely, per weakly connected component.
+
+    Parameters:
+    G (networkx.DiGraph): The graph to analyze.
+
+    Returns:
+    dict: Dictionary of nodes with trophic level as values, starting at 1 in every component.
+    """
+    H = nx.DiGraph(G)
+    H.remove_edges_from(nx.selfloop_edges(H))
+    levels = {}
+    for component in nx.weakly_connected_components(H):
+        nodes = list(component)
+        W = nx.to_numpy_array(H, nodelist=nodes)
+        w_in, w_out = W.sum(axis=0), W.sum(axis=1)
+        laplacian = np.diag(w_in + w_out) - W - W.T
+        h = np.linalg.lstsq(laplacian, w_in - w_out, rcond=None)[0]
+        levels.update(zip(nodes, h - h.min() + 1.0))
+    return levels
+
+
+def _per_component(G, function):
+    values = {}
+    for component in nx.connected_components(G):
+        if len(component) > 2:
+            values.update(function(G.subgraph(component)))
+        else:
+            values.update({node: 0.0 for node in component})
+    return values
+
+
+def _largest_strong_component(G):
+    return G.subgraph(max(nx.strongly_connected_components(G), key=len)).copy()
+
+
+def _forest_closeness(G):
+    values = {}
+    for component in nx.weakly_connected_components(G):
+        values.update(nx.closeness_centrality(G.subgraph(component)))
+    return values
+
+
+class ReferenceChecker:
+    """Class to check every metric of CentralityCalculator against a NetworkX reference.
+
+    A small synthetic near-DAG, with forward citations closing cycles, goes through the
+    same cleaning and graph building as the pipeline. Every metric is compared with the
+    NetworkX function it replaces or, where NetworkX has none, with a direct
+    implementation of its definition.
+    """
+
+    def __init__(self, n_nodes=300, forward_fraction=0.02, seed=0, max_workers=1):
+        """
+        Parameters:
+        n_nodes (int): Number of judgments of the synthetic graph.
+        forward_fraction (float): Share of the references going to a later judgment.
+        seed (int): Seed of the synthetic graph.
+        max_workers (int): Number of processes of the calculator.
+        """
+        self.n_nodes = n_nodes
+        self.forward_fraction = forward_fraction
+        self.seed = seed
+        self.max_workers = max_workers
+
+    def graph(self):
+        """
+        Generates, cleans and builds the synthetic graph.
+
+        Returns:
+        networkx.DiGraph: The citation graph.
+        """
+        nodes_df, raw_edges_df = SyntheticCitationGenerator(self.n_nodes, forward_fraction=self.forward_fraction,
+                                                            seed=self.seed).generate()
+        cleaner = DataCleaner()
+        nodes_df = cleaner.remove_communicated_cases(nodes_df)
+        edges_df = cleaner.filter_targets(raw_edges_df, set(nodes_df['ecli']), drop_self_loops=True)
+        return GraphBuilder().create_csr_graph(nodes_df, edges_df).to_networkx()
+
+    def checks(self):
+        """
+        Returns the metrics to check.
+
+        Returns:
+        list: Tuples of the metric name, the calculator method taking the calculator and the
+        graph, the reference function taking the graph and the absolute tolerance.
+        """
+        undirected = lambda G: nx.Graph(G.to_undirected())
+        return [
+            ('degree_centrality', lambda c, G: c.calculate_degree_centrality(G), nx.degree_centrality, 1e-12),
+            ('in_degree_centrality', lambda c, G: c.calculate_in_degree_centrality(G),
+             lambda G: dict(G.in_degree()), 0),
+            ('out_degree_centrality', lambda c, G: c.calculate_out_degree_centrality(G),
+             lambda G: dict(G.out_degree()), 0),
+            ('core_number', lambda c, G: c.calculate_core_number(G), nx.core_number, 0),
+            # NetworkX only defines it on a strongly connected graph
+            ('eigenvector_centrality', lambda c, G: c.calculate_eigenvector_centrality(_largest_strong_component(G)),
+             lambda G: nx.eigenvector_centrality_numpy(_largest_strong_component(G)), 1e-6),
+            # The solver stops once the L1 change is below the number of nodes times 1e-6
+            ('pagerank', lambda c, G: c.calculate_pagerank(G), lambda G: nx.pagerank(G, tol=1e-10), 1e-4),
+            ('hub_centrality', lambda c, G: c.calculate_hub_centrality(G), lambda G: nx.hits(G, tol=1e-12)[0], 1e-6),
+            ('authority_centrality', lambda c, G: c.calculate_authority_centrality(G),
+             lambda G: nx.hits(G, tol=1e-12)[1], 1e-6),
+            ('betweenness_centrality', lambda c, G: c.calculate_betweenness_centrality(G),
+             nx.betweenness_centrality, 1e-9),
+            ('closeness_centrality', lambda c, G: c.calculate_closeness_centrality(G),
+             nx.closeness_centrality, 1e-9),
+            ('harmonic_centrality', lambda c, G: c.calculate_harmonic_centrality(G),
+             nx.harmonic_centrality, 1e-9),
+            ('forest_closeness_centrality', lambda c, G: c.calculate_forest_closeness_centrality(G),
+             _forest_closeness, 1e-9),
+            ('current_flow_betweenness_centrality',
+             lambda c, G: c.calculate_current_flow_betweenness_centrality(G),
+             lambda G: _per_component(undirected(G), nx.current_flow_betweenness_centrality), 1e-8),
+            ('current_flow_closeness_centrality', lambda c, G: c.calculate_current_flow_closeness_centrality(G),
+             lambda G: _per_component(undirected(G), nx.current_flow_closeness_centrality), 1e-8),
+            ('trophic_level', lambda c, G: c.calculate_trophic_level(G), _reference_trophic_levels, 1e-6),
+            ('disruption', lambda c, G: c.calculate_disruption(G), _reference_disruption, 1e-12),
+        ]
+
+    def run(self, metrics=None):
+        """
+        Runs the checks.
+
+        Parameters:
+        metrics (list, optional): Names of the metrics to check, all by default.
+
+        Returns:
+        list: One dictionary per metric with its name, the largest absolute difference from the
+        reference, the tolerance, whether it passed and the error message of a failed call.
+        """
+        G = self.graph()
+        results = []
+        for name, method, reference, tolerance in self.checks():
+            if metrics is not None and name not in metrics:
+                continue
+            result = {'metric': name, 'nodes': G.number_of_nodes(), 'edges': G.number_of_edges(),
+                      'max_abs_error': None, 'tolerance': tolerance, 'passed': False, 'error': None}
+            try:
+                calculator = CentralityCalculator(max_workers=self.max_workers)
+                expected = pd.Series(reference(G), dtype=np.float64)
+                actual = pd.Series(method(calculator, G), dtype=np.float64).reindex(expected.index)
+                # NaN must be matched by NaN
+                mismatched_nan = int((actual.isna() != expected.isna()).sum())
+                error = float((actual - expected).abs().max()) if expected.notna().any() else 0.0
+                result['max_abs_error'] = error if not mismatched_nan else float('inf')
+                result['passed'] = not mismatched_nan and error <= tolerance
+            except Exception as e:
+                result['error'] = str(e)
+            results.append(result)
+        return results
@@ -0,0 +1,378 @@
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# Add the src directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.correctness import ReferenceChecker
+from benchmarks.synthetic import SyntheticCitationGenerator
+from centralities.calculator import CentralityCalculator
+from data_ingestion.cleaner import DataCleaner
+from graph.builder import GraphBuilder
+from graph.csr import CSRGraph
+from utils.instrumentation import current_rss, peak_rss
+
+RESULTS_DIR = 'data/benchmarks'
+
+# Metrics by name: the calculator call, whether it takes the networkx graph instead of the
+# CSR graph, and the largest number of nodes it runs on by default
+METRICS = {
+    'degree_centrality': (lambda c, G: c.calculate_degree_centrality(G), True, 200000),
+    'in_degree_centrality': (lambda c, G: c.calculate_in_degree_centrality(G), True, 200000),
+    'out_degree_centrality': (lambda c, G: c.calculate_out_degree_centrality(G), True, 200000),
+    'relative_in_degree_centrality': (lambda c, G: c.calculate_relative_in_degree_centrality(G), True, 200000),
+    'core_number': (lambda c, G: c.calculate_core_number(G), True, 200000),
+    'eigenvector_centrality': (lambda c, G: c.calculate_eigenvector_centrality(G), False, 10 ** 6),
+    'pagerank': (lambda c, G: c.calculate_pagerank(G), False, 10 ** 6),
+    'hits': (lambda c, G: c.calculate_hits(G), False, 10 ** 6),
+    'trophic_level': (lambda c, G: c.calculate_trophic_level(G), False, 10 ** 6),
+    'disruption': (lambda c, G: c.calculate_disruption(G), False, 10 ** 6),
+    'current_flow_betweenness_centrality':
+        (lambda c, G: c.calculate_current_flow_betweenness_centrality(G), False, 2500),
+    'current_flow_closeness_centrality':
+        (lambda c, G: c.calculate_current_flow_closeness_centrality(G), False, 2500),
+    'distance_centralities': (lambda c, G: c.calculate_distance_centralities(G), False, 2500),
+    'approximate_betweenness_centrality':
+        (lambda c, G: c.calculate_approximate_betweenness_centrality(G, sample_size=64, seed=0), False, 10 ** 6),
+    'approximate_closeness_centrality':
+        (lambda c, G: c.calculate_approximate_closeness_centrality(G, sample_size=64, seed=0), False, 10 ** 6),
+}
+
+# Largest number of nodes of the stages building a networkx graph
+NETWORKX_MAX_NODES = {'create_graph': 20000, 'to_networkx': 200000}
+
+
+def _git_revision():
+    """
+    Returns the commit hash of the working tree and whether it has uncommitted changes.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=directory, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=directory,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        return commit, bool(status)
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+class BenchmarkSuite:
+    """Class to time and memory-profile the pipeline stages and metrics on synthetic citation graphs.
+
+    For every size a synthetic citation graph is generated and taken through the same
+    stages as main: cleaning, graph building and every centrality. Each measurement is
+    repeated and reports the wall and CPU time of every repeat, then one more run under
+    tracemalloc reports the peak of the traced allocations, numpy arrays included. The
+    resident set size is recorded around every measurement.
+
+    Results are written as JSON together with the commit they were measured on, so the
+    files of two commits can be compared with compare.
+    """
+
+    def __init__(self, sizes=(1000, 10000, 100000, 1000000), metrics=None, repeats=3, max_workers=1,
+                 trace_memory=True, forward_fraction=0.01, seed=0, max_nodes=None, logger=None):
+        """
+        Parameters:
+        sizes (list): Numbers of judgments of the synthetic graphs.
+        metrics (list, optional): Names of the metrics in METRICS to run, all by default.
+        repeats (int): Number of timed runs of every measurement.
+        max_workers (int): Number of processes of the calculator.
+        trace_memory (bool): Whether to add a run under tracemalloc for the allocation peak.
+        forward_fraction (float): Share of the references going to a later judgment, which
+            closes cycles; 0 generates DAGs.
+        seed (int): Seed of the synthetic graphs.
+        max_nodes (dict, optional): Largest number of nodes per metric or stage, overriding
+            the defaults in METRICS and NETWORKX_MAX_NODES.
+        logger (logging.Logger, optional): Logger used to report progress.
+        """
+        self.sizes = list(sizes)
+        self.metrics = list(METRICS) if metrics is None else list(metrics)
+        unknown = [metric for metric in self.metrics if metric not in METRICS]
+        if unknown:
+            raise ValueError(f"Unknown metrics: {unknown}")
+        self.repeats = repeats
+        self.max_workers = max_workers
+        self.trace_memory = trace_memory
+        self.forward_fraction = forward_fraction
+        self.seed = seed
+        self.max_nodes = max_nodes or {}
+        self.logger = logger
+
+    def measure(self, function, repeats=None):
+        """
+        Times a function and measures its memory.
+
+        Parameters:
+        function (callable): Function without arguments.
+        repeats (int, optional): Number of timed runs, repeats of the suite by default.
+
+        Returns:
+        tuple: The return value of the last run and a dictionary of the measurements.
+        """
+        repeats = self.repeats if repeats is None else repeats
+        gc.collect()
+        rss_before = current_rss()
+        wall, cpu = [], []
+        value = None
+        for _ in range(max(1, repeats)):
+            value = None
+            gc.collect()
+            start_wall, start_cpu = time.perf_counter(), time.process_time()
+            value = function()
+            wall.append(time.perf_counter() - start_wall)
+            cpu.append(time.process_time() - start_cpu)
+        rss_after = current_rss()
+
+        traced_peak = None
+        if self.trace_memory:
+            value = None
+            gc.collect()
+            tracemalloc.start()
+            try:
+                value = function()
+                traced_peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        return value, {
+            'wall_seconds': min(wall),
+            'wall_seconds_median': float(np.median(wall)),
+            'wall_seconds_all': wall,
+            'cpu_seconds': min(cpu),
+            'traced_peak_bytes': traced_peak,
+            'rss_before_bytes': rss_before,
+            'rss_after_bytes': rss_after,
+            'peak_rss_bytes': peak_rss(),
+        }
+
+    def run(self, check=True):
+        """
+        Runs every stage and metric at every size.
+
+        Parameters:
+        check (bool): Whether to also run the correctness checks against NetworkX.
+
+        Returns:
+        dict: The report, with the environment, the commit, the measurements and the checks.
+        """
+        commit, dirty = _git_revision()
+        report = {
+            'commit': commit,
+            'dirty': dirty,
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'versions': self._versions(),
+            'settings': {'sizes': self.sizes, 'metrics': self.metrics, 'repeats': self.repeats,
+                         'max_workers': self.max_workers, 'forward_fraction': self.forward_fraction,
+                         'seed': self.seed},
+            'results': [],
+            'checks': [],
+        }
+        for size in self.sizes:
+            report['results'].extend(self._run_size(size))
+        if check:
+            self._log("Running the correctness checks against NetworkX")
+            report['checks'] = ReferenceChecker(seed=self.seed, max_workers=self.max_workers).run()
+        return report
+
+    def _run_size(self, size):
+        """
+        Runs the stages and metrics on one synthetic graph.
+
+        Parameters:
+        size (int): Number of judgments.
+
+        Returns:
+        list: One dictionary per stage and metric.
+        """
+        results = []
+
+        def record(kind, name, function, repeats=None, limit=None, **extra):
+            entry = {'kind': kind, 'name': name, 'size': size, **extra}
+            if limit is not None and size > limit:
+                entry['status'] = 'skipped'
+                results.append(entry)
+                return None
+            self._log(f"{size} nodes: {kind} {name}")
+            try:
+                value, measurements = self.measure(function, repeats)
+                entry.update(measurements, status='ok')
+            except Exception as e:
+                value = None
+                entry.update(status='failed', error=str(e))
+            results.append(entry)
+            return value
+
+        generator = SyntheticCitationGenerator(size, forward_fraction=self.forward_fraction, seed=self.seed)
+        generated = record('stage', 'generate', generator.generate, repeats=1)
+        if generated is None:
+            return results
+        raw_nodes_df, raw_edges_df = generated
+
+        cleaner = DataCleaner()
+        nodes_df = record('stage', 'remove_communicated_cases',
+                          lambda: cleaner.remove_communicated_cases(raw_nodes_df))
+        valid_targets = set(nodes_df['ecli'])
+        edges_df = record('stage', 'filter_targets',
+                          lambda: cleaner.filter_targets(raw_edges_df, valid_targets, drop_self_loops=True))
+
+        builder = GraphBuilder()
+        csr_graph = record('stage', 'create_csr_graph', lambda: builder.create_csr_graph(nodes_df, edges_df))
+        if csr_graph is None:
+            return results
+        graph_size = {'nodes': csr_graph.number_of_nodes(), 'edges': csr_graph.number_of_edges()}
+        for entry in results:
+            entry.update(graph_size)
+        record('stage', 'create_graph', lambda: builder.create_graph(nodes_df, edges_df), repeats=1,
+               limit=self._limit('create_graph', NETWORKX_MAX_NODES['create_graph']), **graph_size)
+        # A fresh wrapper per run, since the graph caches its networkx conversion
+        G = record('stage', 'to_networkx', lambda: CSRGraph(csr_graph.node_ids, csr_graph.adjacency).to_networkx(),
+                   limit=self._limit('to_networkx', NETWORKX_MAX_NODES['to_networkx']), **graph_size)
+
+        for metric in self.metrics:
+            method, needs_networkx, default_limit = METRICS[metric]
+            limit = self._limit(metric, default_limit)
+            if needs_networkx and G is None:
+                limit = 0
+            graph = G if needs_networkx else csr_graph
+            # A fresh calculator per run, so no run reuses the solver state of the previous one
+            record('metric', metric, lambda: method(CentralityCalculator(max_workers=self.max_workers), graph),
+                   limit=limit, **graph_size)
+        return results
+
+    def _limit(self, name, default):
+        return self.max_nodes.get(name, default)
+
+    def _versions(self):
+        versions = {}
+        for module in ('numpy', 'scipy', 'pandas', 'networkx'):
+            try:
+                versions[module] = __import__(module).__version__
+            except ImportError:
+                versions[module] = None
+        return versions
+
+    def _log(self, message):
+        if self.logger is not None:
+            self.logger.info(message)
+
+    def save(self, report, output_dir=RESULTS_DIR):
+        """
+        Writes a report as JSON, named after its time and commit.
+
+        Parameters:
+        report (dict): Output of run.
+        output_dir (str): Directory of the result files.
+
+        Returns:
+        str: Path of the written file.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        stamp = report['timestamp'].replace(':', '').replace('-', '').split('+')[0]
+        commit = (report['commit'] or 'unknown')[:10] + ('-dirty' if report['dirty'] else '')
+        path = os.path.join(output_dir, f'{stamp}-{commit}.json')
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        return path
+
+
+def compare(baseline, current, threshold=1.1, min_delta=0.01):
+    """
+    Compares the timings and memory of two reports.
+
+    Parameters:
+    baseline (dict or str): Report, or path of a report, to compare against.
+    current (dict or str): Report, or path of a report, to compare.
+    threshold (float): Ratio of the current to the baseline time above which a
+        measurement is flagged as a regression.
+    min_delta (float): Smallest slowdown in seconds flagged, so timer noise on very short
+        measurements is not reported.
+
+    Returns:
+    pd.DataFrame: One row per stage or metric and size measured in both, with the times, the
+    traced memory peaks, their ratios and the regression flag.
+    """
+    frames = []
+    for report in (baseline, current):
+        if isinstance(report, str):
+            with open(report) as f:
+                report = json.load(f)
+        results = pd.DataFrame(report['results'])
+        if results.empty or 'wall_seconds' not in results:
+            results = pd.DataFrame(columns=['kind', 'name', 'size', 'status', 'wall_seconds', 'traced_peak_bytes'])
+        frames.append(results[results['status'] == 'ok'][['kind', 'name', 'size', 'wall_seconds',
+                                                           'traced_peak_bytes']])
+    merged = frames[0].merge(frames[1], on=['kind', 'name', 'size'], suffixes=('_baseline', '_current'))
+    merged['time_ratio'] = merged['wall_seconds_current'] / merged['wall_seconds_baseline']
+    merged['memory_ratio'] = (merged['traced_peak_bytes_current'].astype(np.float64)
+                              / merged['traced_peak_bytes_baseline'].astype(np.float64))
+    slowdown = merged['wall_seconds_current'] - merged['wall_seconds_baseline']
+    merged['regression'] = (merged['time_ratio'] > threshold) & (slowdown > min_delta)
+    return merged.sort_values(['kind', 'name', 'size'], ignore_index=True)
+
+
+def main(argv=None):
+    """
+    Runs the benchmark suite from the command line and writes its report.
+
+    Parameters:
+    argv (list, optional): Command line arguments, sys.argv by default.
+
+    Returns:
+    int: Exit status, 1 when a correctness check or, with --compare, a timing regressed.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline stages and metrics on synthetic '
+                                                 'citation graphs.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000],
+                        help='Numbers of judgments of the synthetic graphs.')
+    parser.add_argument('--metrics', nargs='+', choices=sorted(METRICS), help='Metrics to run, all by default.')
+    parser.add_argument('--repeats', type=int, default=3, help='Number of timed runs per measurement.')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes of the calculator.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic graphs.')
+    parser.add_argument('--forward-fraction', type=float, default=0.01,
+                        help='Share of references to later judgments; 0 generates DAGs.')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc runs.')
+    parser.add_argument('--no-check', action='store_true', help='Skip the correctness checks.')
+    parser.add_argument('--output-dir', default=RESULTS_DIR, help='Directory of the result files.')
+    parser.add_argument('--compare', metavar='BASELINE', help='Report to compare the new results against.')
+    parser.add_argument('--threshold', type=float, default=1.1, help='Time ratio flagged as a regression.')
+    args = parser.parse_args(argv)
+
+    from utils.logger import setup_logger
+    logger = setup_logger()
+    suite = BenchmarkSuite(sizes=args.sizes, metrics=args.metrics, repeats=args.repeats, max_workers=args.workers,
+                           trace_memory=not args.no_memory, forward_fraction=args.forward_fraction,
+                           seed=args.seed, logger=logger)
+    report = suite.run(check=not args.no_check)
+    path = suite.save(report, args.output_dir)
+    logger.info(f"Benchmark results written to {path}")
+
+    status = 0
+    failed_checks = [check['metric'] for check in report['checks'] if not check['passed']]
+    if failed_checks:
+        logger.error(f"Correctness checks failed: {failed_checks}")
+        status = 1
+    if args.compare:
+        comparison = compare(args.compare, report, args.threshold)
+        print(comparison.to_string())
+        if comparison['regression'].any():
+            logger.error(f"{int(comparison['regression'].sum())} measurements regressed")
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Seconds a cold start may take, from launching the interpreter to having the modules of a job loaded
+STARTUP_BUDGET = 1.0
+
+# Code run by each startup measurement: the entry point alone, and a job computing the cheapest metrics,
+# with the modules of the ingestion and graph steps it goes through
+STARTUP_TARGETS = {
+    'main': 'import main',
+    'linear_metrics': (
+        'import main\n'
+        'from centralities.registry import MetricRegistry\n'
+        'import data_ingestion.store, data_ingestion.reader, data_ingestion.cleaner, graph.builder\n'
+        'import centralities.cache, centralities.scheduler\n'
+        'registry = MetricRegistry()\n'
+        "registry.calculators(registry.select(max_cost='linear'))\n"
+    ),
+}
+
+
+def _parse_importtime(stderr, top):
+    """
+    Extracts the slowest imports from the output of python -X importtime.
+
+    Parameters:
+    stderr (str): Standard error of the interpreter.
+    top (int): Number of imports to return.
+
+    Returns:
+    list: Pairs of module name and cumulative import time in seconds, slowest first, for the
+    modules imported by the code and their direct imports.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        fields = line[len('import time:'):].split('|')
+        if not line.startswith('import time:') or len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        # The name is indented by two spaces per level of nesting, after a single space
+        depth = (len(fields[2]) - len(fields[2].lstrip()) + 1) // 2
+        if depth <= 2:
+            imports.append((fields[2].strip(), int(fields[1]) / 1e6))
+    return sorted(imports, key=lambda item: -item[1])[:top]
+
+
+def measure_startup(code, repeats=5, top=10):
+    """
+    Times a cold start by running code in fresh interpreters with the src directory on the path.
+
+    Parameters:
+    code (str): The code to run.
+    repeats (int): Number of timed interpreters started.
+    top (int): Number of slowest imports reported.
+
+    Returns:
+    dict: The fastest and median wall time in seconds, the slowest imports, from one more
+    run under -X importtime, and the error of a failed run.
+    """
+    environment = dict(os.environ, PYTHONPATH=SRC_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    times, slowest, error = [], [], None
+    # The import profile slows the interpreter down, so the timed runs go without it
+    for options in [[]] * max(1, repeats) + [['-X', 'importtime']]:
+        start = time.perf_counter()
+        process = subprocess.run([sys.executable, *options, '-c', code], cwd=SRC_DIR, env=environment,
+                                 capture_output=True, text=True)
+        elapsed = time.perf_counter() - start
+        if process.returncode != 0:
+            error = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else 'failed'
+            break
+        if options:
+            slowest = _parse_importtime(process.stderr, top)
+        else:
+            times.append(elapsed)
+    return {
+        'seconds': min(times) if times else None,
+        'seconds_median': float(np.median(times)) if times else None,
+        'slowest_imports': slowest,
+        'error': error,
+    }
+
+
+def main(argv=None):
+    """
+    Measures the cold start of the pipeline from the command line.
+
+    Parameters:
+    argv (list, optional): Command line arguments, sys.argv by default.
+
+    Returns:
+    int: Exit status, 1 when a target fails or exceeds the budget.
+    """
+    parser = argparse.ArgumentParser(description='Measure how long the pipeline takes to start.')
+    parser.add_argument('--targets', nargs='+', choices=sorted(STARTUP_TARGETS), default=sorted(STARTUP_TARGETS),
+                        help='Startup targets to measure.')
+    parser.add_argument('--metrics', nargs='+', default=[],
+                        help='Also measure loading the calculators of these registry metrics.')
+    parser.add_argument('--repeats', type=int, default=5, help='Number of cold starts per target.')
+    parser.add_argument('--budget', type=float, default=STARTUP_BUDGET, help='Seconds a cold start may take.')
+    args = parser.parse_args(argv)
+
+    targets = {name: STARTUP_TARGETS[name] for name in args.targets}
+    for metric in args.metrics:
+        targets[f'metric:{metric}'] = (
+            'import main\n'
+            'from centralities.registry import MetricRegistry\n'
+            'registry = MetricRegistry()\n'
+            f'registry.calculators(registry.select([{metric!r}]))\n'
+        )
+
+    status = 0
+    for name, code in targets.items():
+        result = measure_startup(code, args.repeats)
+        if result['error'] is not None:
+            print(f"{name}: failed: {result['error']}")
+            status = 1
+            continue
+        over = result['seconds'] > args.budget
+        print(f"{name}: {result['seconds']:.3f} s (median {result['seconds_median']:.3f} s)"
+              f"{' over the budget of %.2f s' % args.budget if over else ''}")
+        for module, seconds in result['slowest_imports']:
+            print(f"    {module:<40} {seconds:.3f} s")
+        if over:
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
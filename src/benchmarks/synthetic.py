@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+DOCTYPE_BRANCHES = ['GRANDCHAMBER', 'CHAMBER', 'COMMITTEE', 'COMMUNICATEDCASES']
+DOCTYPE_BRANCH_SHARES = [0.02, 0.38, 0.55, 0.05]
+
+
+class SyntheticCitationGenerator:
+    """Class to generate synthetic citation data shaped like the ECHR judgments.
+
+    Judgments get dates that become denser over time and, in date order, cite earlier
+    judgments by preferential attachment: a judgment is cited with probability
+    proportional to its citations so far plus attachment_offset, except for a
+    recency_fraction of the references that go uniformly to the most recent judgments.
+    Judgments are processed in blocks, each citing the judgments of the previous blocks,
+    so that the sampling is vectorized.
+
+    The result is a DAG unless forward_fraction or self_citation_fraction are positive:
+    forward references go to later judgments and close cycles, self-citations add loops,
+    as in the real data. The output mimics the raw inputs, with ECLI identifiers, the node
+    attributes the pipeline reads and the references as lists, so it can be fed to
+    DataCleaner and GraphBuilder like nodes_p1.json and edges_p1.json.
+    """
+
+    def __init__(self, n_nodes, mean_references=5.0, attachment_offset=1.0, recency_fraction=0.3,
+                 recency_window=0.02, forward_fraction=0.0, self_citation_fraction=0.0, n_blocks=200,
+                 start_year=1960, end_year=2024, seed=None):
+        """
+        Parameters:
+        n_nodes (int): Number of judgments.
+        mean_references (float): Mean number of references per judgment.
+        attachment_offset (float): Attractiveness of a judgment without citations.
+        recency_fraction (float): Share of the references going to the most recent judgments.
+        recency_window (float): Share of the judgments counted as most recent.
+        forward_fraction (float): Share of the references going to a later judgment.
+        self_citation_fraction (float): Share of the judgments citing themselves.
+        n_blocks (int): Number of date-ordered blocks sampled at once.
+        start_year (int): Year of the first judgment.
+        end_year (int): Year of the last judgment.
+        seed (int, optional): Seed of the generator.
+        """
+        self.n_nodes = n_nodes
+        self.mean_references = mean_references
+        self.attachment_offset = attachment_offset
+        self.recency_fraction = recency_fraction
+        self.recency_window = recency_window
+        self.forward_fraction = forward_fraction
+        self.self_citation_fraction = self_citation_fraction
+        self.n_blocks = n_blocks
+        self.start_year = start_year
+        self.end_year = end_year
+        self.seed = seed
+
+    def generate(self):
+        """
+        Generates the judgments and their references.
+
+        Returns:
+        tuple: The nodes DataFrame, with the columns 'ecli', 'judgementdate', 'doctypebranch',
+        'court_branch', 'importance' and 'languageisocode', and the raw edges DataFrame, with
+        the columns 'ecli' and 'references' holding the list of cited ECLIs.
+        """
+        rng = np.random.default_rng(self.seed)
+        n = self.n_nodes
+        dates = self._dates(rng)
+        sources, targets = self._references(rng)
+        iso_dates = np.datetime_as_string(dates, unit='D')
+        eclis = np.array([f'ECLI:CE:ECHR:{date[:4]}:{date[5:7]}{date[8:10]}JUD{i + 1:09d}'
+                          for i, date in enumerate(iso_dates)], dtype=object)
+        # Dates are written day first like in the HUDOC metadata, e.g. 26/01/2000 00:00:00
+        date_strings = np.array([f'{date[8:10]}/{date[5:7]}/{date[:4]} 00:00:00' for date in iso_dates], dtype=object)
+
+        in_degree = np.bincount(targets, minlength=n)
+        # Judgments cited more often tend to be more important (1 is the highest level)
+        signal = np.log1p(in_degree) + rng.normal(0, 0.75, n)
+        importance = 4 - np.searchsorted(np.quantile(signal, [0.55, 0.85, 0.95]), signal)
+        branches = rng.choice(DOCTYPE_BRANCHES, size=n, p=DOCTYPE_BRANCH_SHARES)
+        nodes_df = pd.DataFrame({
+            'ecli': eclis,
+            'judgementdate': date_strings,
+            'doctypebranch': branches,
+            'court_branch': branches,
+            'importance': importance.astype(np.int64),
+            'languageisocode': rng.choice(['ENG', 'FRE'], size=n, p=[0.8, 0.2]),
+        })
+
+        order = np.argsort(sources, kind='stable')
+        counts = np.bincount(sources, minlength=n)
+        citing = np.flatnonzero(counts)
+        references = np.split(eclis[targets[order]], np.cumsum(counts[citing])[:-1]) if len(citing) else []
+        edges_df = pd.DataFrame({'ecli': eclis[citing], 'references': [list(r) for r in references]})
+        return nodes_df, edges_df
+
+    def _dates(self, rng, growth=3.0):
+        # Inverse transform of a density growing exponentially from the start to the end year
+        u = np.sort(rng.random(self.n_nodes))
+        fraction = np.log1p(u * np.expm1(growth)) / growth
+        start = np.datetime64(f'{self.start_year}-01-01', 'D')
+        days = (np.datetime64(f'{self.end_year}-12-31', 'D') - start).astype(np.int64)
+        return start + (fraction * days).astype(np.int64)
+
+    def _references(self, rng):
+        """
+        Samples the references of every judgment, block by block in date order.
+
+        Returns:
+        tuple: Arrays of citing and cited node indices, without duplicates.
+        """
+        n = self.n_nodes
+        n_references = rng.poisson(self.mean_references, n)
+        bounds = np.unique(np.linspace(0, n, min(self.n_blocks, n) + 1).astype(np.int64))
+        window = max(1, int(self.recency_window * n))
+        in_degree = np.zeros(n, dtype=np.float64)
+        sources, targets = [], []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            if start == 0:
+                continue
+            block_sources = np.repeat(np.arange(start, stop), n_references[start:stop])
+            k = len(block_sources)
+            recent = rng.random(k) < self.recency_fraction
+            cumulative = np.cumsum(in_degree[:start] + self.attachment_offset)
+            block_targets = np.searchsorted(cumulative, rng.random(k) * cumulative[-1], side='right')
+            low = max(0, start - window)
+            block_targets[recent] = rng.integers(low, start, size=int(recent.sum()))
+            block_targets = np.minimum(block_targets, start - 1)
+            in_degree += np.bincount(block_targets, minlength=n)
+            sources.append(block_sources)
+            targets.append(block_targets)
+
+        sources = np.concatenate(sources) if sources else np.empty(0, dtype=np.int64)
+        targets = np.concatenate(targets) if targets else np.empty(0, dtype=np.int64)
+        if self.forward_fraction > 0 and len(sources):
+            forward = np.flatnonzero((rng.random(len(sources)) < self.forward_fraction) & (sources < n - 1))
+            targets[forward] = rng.integers(sources[forward] + 1, n)
+        if self.self_citation_fraction > 0:
+            looping = np.flatnonzero(rng.random(n) < self.self_citation_fraction)
+            sources, targets = np.r_[sources, looping], np.r_[targets, looping]
+
+        codes = np.sort(sources.astype(np.int64) * n + targets)
+        codes = codes[np.r_[True, codes[1:] != codes[:-1]]]
+        return codes // n, codes % n
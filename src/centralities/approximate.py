@@ -0,0 +1,166 @@
+import math
+
+import numpy as np
+
+from centralities.paths import PathCentralityEngine
+from graph.csr import CSRGraph
+
+
+class ApproximationResult:
+    """Class holding an approximate centrality together with its estimated error."""
+
+    def __init__(self, values, sample_size, epsilon, confidence, seed):
+        """
+        Parameters:
+        values (dict): Dictionary of nodes with the estimated centrality as values.
+        sample_size (int): Number of pivot sources that were traversed.
+        epsilon (float): Bound on the absolute error of the sampled averages, holding for
+            all nodes at once with the given confidence.
+        confidence (float): Probability with which the bound holds.
+        seed (int): Seed of the pivot sample.
+        """
+        self.values = values
+        self.sample_size = sample_size
+        self.epsilon = epsilon
+        self.confidence = confidence
+        self.seed = seed
+
+    def __repr__(self):
+        return (f"ApproximationResult(sample_size={self.sample_size}, epsilon={self.epsilon:.4g}, "
+                f"confidence={self.confidence}, seed={self.seed})")
+
+
+class ApproximateCentrality:
+    """Class to approximate betweenness and closeness centrality by pivot sampling.
+
+    Instead of a BFS from every node, the searches start from a uniform sample of
+    pivots and the accumulated values are rescaled to the whole graph. The sample
+    size is either given directly or derived from a target error and confidence with
+    Hoeffding's inequality and a union bound over all nodes:
+    ``k = ln(2n / (1 - confidence)) / (2 * epsilon**2)``.
+    """
+
+    def __init__(self, sample_size=None, epsilon=None, confidence=0.95, seed=None, max_workers=1):
+        """
+        Parameters:
+        sample_size (int, optional): Number of pivots to traverse.
+        epsilon (float, optional): Target error bound, used when sample_size is not given.
+        confidence (float): Probability with which the error bound must hold.
+        seed (int, optional): Seed of the pivot sample, for reproducible results.
+        max_workers (int): Number of processes sharing the pivots.
+        """
+        if sample_size is None and epsilon is None:
+            raise ValueError("Either sample_size or epsilon must be given")
+        self.sample_size = sample_size
+        self.epsilon = epsilon
+        self.confidence = confidence
+        self.seed = seed
+        self.path_engine = PathCentralityEngine(max_workers=max_workers)
+
+    def betweenness_centrality(self, G):
+        """
+        Approximates the normalized betweenness centrality.
+
+        The error bound applies to the normalized betweenness values.
+
+        Parameters:
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
+
+        Returns:
+        ApproximationResult: The estimated betweenness centrality and its error bound.
+        """
+        graph = G if isinstance(G, CSRGraph) else CSRGraph.from_networkx(G)
+        n = graph.number_of_nodes()
+        pivots = self._sample_pivots(n)
+        betweenness = self.path_engine.betweenness_sums(graph, pivots)
+        if n > 2:
+            # Each pivot's dependency divided by n - 2 lies in [0, 1]; its mean over all
+            # n sources times n / (n - 1) is the normalized betweenness
+            betweenness = betweenness / (len(pivots) * (n - 2)) * n / (n - 1)
+        epsilon = self._epsilon(n, len(pivots)) * (n / (n - 1) if n > 1 else 1)
+        return ApproximationResult(graph.to_dict(betweenness), len(pivots), epsilon, self.confidence, self.seed)
+
+    def closeness_centrality(self, G):
+        """
+        Approximates the closeness centrality, using incoming distances for directed graphs.
+
+        The number of nodes reaching each node and their total distance are estimated
+        from the pivots. The error bound applies to the fraction of nodes reaching a node
+        and to the mean distance expressed as a fraction of the largest distance.
+
+        Parameters:
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
+
+        Returns:
+        ApproximationResult: The estimated closeness centrality and its error bound.
+        """
+        graph = G if isinstance(G, CSRGraph) else CSRGraph.from_networkx(G)
+        n = graph.number_of_nodes()
+        pivots = self._sample_pivots(n)
+        total_distance, reached, _ = self.path_engine.distance_sums(graph, pivots)
+
+        # A pivot reaches itself at distance 0; leave it out of its own estimate
+        is_pivot = np.zeros(n, dtype=bool)
+        is_pivot[pivots] = True
+        other_pivots = len(pivots) - is_pivot
+        scale = np.divide(n - 1, other_pivots, out=np.zeros(n), where=other_pivots > 0)
+        estimated_reached = (reached - is_pivot) * scale
+        estimated_distance = total_distance * scale
+
+        closeness = np.zeros(n)
+        valid = (estimated_distance > 0) & (n > 1)
+        closeness[valid] = (estimated_reached[valid] / estimated_distance[valid]) * (estimated_reached[valid] / (n - 1))
+        epsilon = self._epsilon(n, len(pivots))
+        return ApproximationResult(graph.to_dict(closeness), len(pivots), epsilon, self.confidence, self.seed)
+
+    def compare_to_exact(self, approximate, exact):
+        """
+        Measures how well an approximation preserves the rank order of the exact values.
+
+        Parameters:
+        approximate (ApproximationResult or dict): The approximate centrality.
+        exact (dict): Dictionary of nodes with the exact centrality as values.
+
+        Returns:
+        float: Kendall tau between the approximate and the exact values.
+        """
+        # scipy.stats takes longer to import than the rest of the centralities together
+        from scipy.stats import kendalltau
+
+        values = approximate.values if isinstance(approximate, ApproximationResult) else approximate
+        nodes = [node for node in exact if node in values]
+        tau, _ = kendalltau([values[node] for node in nodes], [exact[node] for node in nodes])
+        return tau
+
+    def _sample_pivots(self, n):
+        """
+        Draws the pivot sample, without replacement.
+
+        Parameters:
+        n (int): Number of nodes in the graph.
+
+        Returns:
+        np.ndarray: Sorted integer ids of the pivots.
+        """
+        if self.sample_size is not None:
+            k = self.sample_size
+        else:
+            k = math.ceil(math.log(2 * max(n, 1) / (1 - self.confidence)) / (2 * self.epsilon ** 2))
+        k = max(1, min(k, n)) if n else 0
+        rng = np.random.default_rng(self.seed)
+        return np.sort(rng.choice(n, size=k, replace=False))
+
+    def _epsilon(self, n, k):
+        """
+        Returns the error bound achieved by k pivots, zero when every node is a pivot.
+
+        Parameters:
+        n (int): Number of nodes in the graph.
+        k (int): Number of pivots.
+
+        Returns:
+        float: The Hoeffding error bound holding for all nodes with the configured confidence.
+        """
+        if k == 0 or k >= n:
+            return 0.0
+        return math.sqrt(math.log(2 * n / (1 - self.confidence)) / (2 * k))
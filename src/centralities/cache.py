@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from graph.csr import CSRGraph
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, where eviction runs without a lock
+    fcntl = None
+
+
+class CentralityCache:
+    """Class to persist centrality results between runs, one array per metric.
+
+    Every result is stored as a .npy array aligned to the node ids of the graph, under a
+    content address built from a structural hash of the graph, the metric name and its
+    parameters. A rerun on the same graph loads the stored metrics and only computes the
+    missing ones.
+
+    Files are written to a temporary name and renamed into place, so concurrent runs
+    never read a partial array. Reading a file refreshes its modification time; when the
+    cache grows beyond max_bytes the least recently used files are evicted, under a file
+    lock so that concurrent runs do not evict at the same time.
+    """
+
+    def __init__(self, root='data/processed/cache/centralities', max_bytes=1 << 30):
+        """
+        Parameters:
+        root (str): Directory in which the arrays are stored.
+        max_bytes (int): Size the cache is reduced to after every write.
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def graph_key(self, G):
+        """
+        Computes a structural hash of the graph: its node identifiers in order and its edges.
+
+        Parameters:
+        G (networkx.DiGraph or CSRGraph): The graph to hash.
+
+        Returns:
+        str: Hexadecimal SHA-256 digest.
+        """
+        graph = G if isinstance(G, CSRGraph) else CSRGraph.from_networkx(G)
+        adjacency = graph.adjacency.copy()
+        adjacency.sort_indices()
+        digest = hashlib.sha256()
+        digest.update('\0'.join(map(str, graph.node_ids)).encode())
+        digest.update(b'\0')
+        digest.update(adjacency.indptr.astype(np.int64).tobytes())
+        digest.update(adjacency.indices.astype(np.int64).tobytes())
+        return digest.hexdigest()
+
+    def path(self, graph_key, metric, params=None):
+        """
+        Returns the path of a cached metric.
+
+        Parameters:
+        graph_key (str): Output of graph_key.
+        metric (str): Name of the metric.
+        params (dict, optional): Parameters the metric was computed with.
+
+        Returns:
+        str: The path of the array.
+        """
+        address = json.dumps([graph_key, metric, params or {}], sort_keys=True, default=str)
+        return os.path.join(self.root, f'{metric}-{hashlib.sha256(address.encode()).hexdigest()[:32]}.npy')
+
+    def load(self, graph_key, metric, params=None):
+        """
+        Loads a cached metric.
+
+        Parameters:
+        graph_key (str): Output of graph_key.
+        metric (str): Name of the metric.
+        params (dict, optional): Parameters the metric was computed with.
+
+        Returns:
+        np.ndarray or None: The values aligned to the node ids, None when not cached.
+        """
+        file_path = self.path(graph_key, metric, params)
+        try:
+            values = np.load(file_path, allow_pickle=False)
+            os.utime(file_path)
+        except (FileNotFoundError, ValueError):
+            # Missing, evicted in the meantime, or unreadable
+            return None
+        return values
+
+    def save(self, graph_key, metric, values, params=None):
+        """
+        Stores a metric atomically and evicts old entries if the cache is too large.
+
+        Parameters:
+        graph_key (str): Output of graph_key.
+        metric (str): Name of the metric.
+        values (np.ndarray): The values aligned to the node ids.
+        params (dict, optional): Parameters the metric was computed with.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        file_path = self.path(graph_key, metric, params)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, values, allow_pickle=False)
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def load_measures(self, G, metrics, params=None, metric_params=None):
+        """
+        Loads every cached metric of the graph among the requested ones.
+
+        Parameters:
+        G (networkx.DiGraph or CSRGraph): The graph the metrics belong to.
+        metrics (list): Names of the metrics.
+        params (dict, optional): Parameters the metrics were computed with.
+        metric_params (dict, optional): Dictionary of metric names with parameters of their own,
+            added to params, e.g. the output of MetricRegistry.params.
+
+        Returns:
+        dict: Dictionary of the cached metric names with node dictionaries as values.
+        """
+        graph = G if isinstance(G, CSRGraph) else CSRGraph.from_networkx(G)
+        graph_key = self.graph_key(graph)
+        measures = {}
+        for metric in metrics:
+            values = self.load(graph_key, metric, self._params(metric, params, metric_params))
+            if values is not None and len(values) == graph.number_of_nodes():
+                measures[metric] = graph.to_dict(values)
+        return measures
+
+    def save_measures(self, G, measures, params=None, metric_params=None):
+        """
+        Stores metric results given as node dictionaries.
+
+        Parameters:
+        G (networkx.DiGraph or CSRGraph): The graph the metrics belong to.
+        measures (dict): Dictionary of metric names with node dictionaries as values.
+        params (dict, optional): Parameters the metrics were computed with.
+        metric_params (dict, optional): Dictionary of metric names with parameters of their own,
+            added to params.
+        """
+        graph = G if isinstance(G, CSRGraph) else CSRGraph.from_networkx(G)
+        graph_key = self.graph_key(graph)
+        for metric, result in measures.items():
+            values = np.asarray([result.get(node, np.nan) for node in graph.node_ids])
+            if values.dtype == object:
+                values = values.astype(np.float64)
+            self.save(graph_key, metric, values, self._params(metric, params, metric_params))
+
+    @staticmethod
+    def _params(metric, params, metric_params):
+        if not metric_params or metric not in metric_params:
+            return params
+        return {**(params or {}), **metric_params[metric]}
+
+    def evict(self):
+        """
+        Deletes the least recently used arrays until the cache fits in max_bytes.
+        """
+        with open(os.path.join(self.root, '.lock'), 'w') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = []
+            for entry in os.scandir(self.root):
+                if entry.name.endswith('.npy'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, file_path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(file_path)
+                except FileNotFoundError:
+                    pass
+                total -= size
@@ -1,68 +1,143 @@
+import logging
+
 import networkx as nx
-import numpy as np
-from networkx.algorithms.centrality import (
-    degree_centrality,
-    betweenness_centrality,
-    closeness_centrality,
-    eigenvector_centrality_numpy,
-    harmonic_centrality,
-    current_flow_betweenness_centrality,
-    current_flow_closeness_centrality,
-)
-from networkx.algorithms.link_analysis.hits_alg import hits
-from networkx.algorithms.link_analysis.pagerank_alg import pagerank
-
-from scipy.sparse.linalg import eigs
 
 class CentralityCalculator:
-    """Class to calculate various centrality measures for a graph."""
+    """Class to calculate various centrality measures for a graph.
+
+    The engines behind the calculators, and the libraries they need, are imported and
+    built on first use, so a job computing only the degree metrics does not load them.
+    Every method takes a networkx graph or a CSRGraph. The engines work on the CSR arrays
+    directly; the metrics computed with networkx convert a CSRGraph on first use.
+    """
+
+    def __init__(self, max_workers=1, warm_start=None, current_flow_threshold=None, trophic_method='linear',
+                 approx_sample_size=None, approx_epsilon=0.05, approx_seed=None):
+        """
+        Parameters:
+        max_workers (int): Number of processes sharing the BFS sources of the shortest-path centralities
+            and the connected components of the current-flow centralities.
+        warm_start (dict, optional): Dictionary of metric names with the node dictionaries of a previous
+            run, used as starting vectors by the eigenvector centrality, PageRank and HITS solvers.
+        current_flow_threshold (int, optional): Component size above which the current-flow centralities
+            are approximated, exact everywhere by default.
+        trophic_method (str): Method of calculate_trophic_level when none is given, see there.
+        approx_sample_size (int, optional): Number of pivots of the approximate betweenness and closeness
+            centralities, derived from approx_epsilon by default.
+        approx_epsilon (float): Target bound on the absolute error of the approximate centralities, used
+            when approx_sample_size is not given.
+        approx_seed (int, optional): Seed of the pivot sample of the approximate centralities.
+        """
+        self.max_workers = max_workers
+        self.current_flow_threshold = current_flow_threshold
+        self.trophic_method = trophic_method
+        self.approx_sample_size = approx_sample_size
+        self.approx_epsilon = approx_epsilon
+        self.approx_seed = approx_seed
+        self.approximation_diagnostics = {}
+        self.warm_start = warm_start or {}
+        self.pagerank_diagnostics = None
+        self._path_engine = None
+        self._current_flow_engine = None
+        self._trophic_analyzer = None
+        self._spectral = None
+
+    @property
+    def path_engine(self):
+        """PathCentralityEngine: Engine of the shortest-path centralities."""
+        if self._path_engine is None:
+            from centralities.paths import PathCentralityEngine
+
+            self._path_engine = PathCentralityEngine(max_workers=self.max_workers)
+        return self._path_engine
+
+    @property
+    def current_flow_engine(self):
+        """CurrentFlowEngine: Engine of the current-flow centralities."""
+        if self._current_flow_engine is None:
+            from centralities.current_flow import CurrentFlowEngine
+
+            self._current_flow_engine = CurrentFlowEngine(max_workers=self.max_workers,
+                                                          approximate_threshold=self.current_flow_threshold)
+        return self._current_flow_engine
+
+    @property
+    def trophic_analyzer(self):
+        """TrophicAnalyzer: Solver of the trophic levels."""
+        if self._trophic_analyzer is None:
+            from centralities.trophic import TrophicAnalyzer
+
+            self._trophic_analyzer = TrophicAnalyzer()
+        return self._trophic_analyzer
+
+    def spectral_backend(self, G):
+        """
+        Returns the sparse linear-algebra backend of the graph, built once and reused.
+
+        Parameters:
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
+
+        Returns:
+        SpectralBackend: The backend holding the sparse adjacency of G.
+        """
+        if self._spectral is None or self._spectral[0] is not G or self._spectral[1] != G.number_of_edges():
+            from centralities.spectral import SpectralBackend
+
+            self._spectral = (G, G.number_of_edges(), SpectralBackend(G))
+        return self._spectral[2]
+
+    @staticmethod
+    def _networkx(G):
+        # CSRGraph converts itself once and caches the result
+        return G.to_networkx() if hasattr(G, 'to_networkx') else G
 
     def calculate_degree_centrality(self, G):
         """
         Calculates the degree centrality for each node in the graph.
 
         Parameters:
-        G (networkx.DiGraph): The graph to analyze.
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
 
         Returns:
         dict: Dictionary of nodes with degree centrality as values.
         """
-        return nx.degree_centrality(G)
+        return nx.degree_centrality(self._networkx(G))
 
     def calculate_in_degree_centrality(self, G):
         """
         Calculates the in-degree centrality for each node in the graph.
 
         Parameters:
-        G (networkx.DiGraph): The graph to analyze.
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
 
         Returns:
         dict: Dictionary of nodes with in-degree centrality as values.
         """
-        return dict(G.in_degree())
+        return dict(self._networkx(G).in_degree())
 
     def calculate_core_number(self, G):
         """
         Calculates the core number for each node in the graph.
 
         Parameters:
-        G (networkx.DiGraph): The graph to analyze.
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
 
         Returns:
         dict: Dictionary of nodes with core number as values.
         """
-        return nx.core_number(G)
+        return nx.core_number(self._networkx(G))
 
     def calculate_relative_in_degree_centrality(self, G):
         """
         Calculates the relative in-degree centrality for each node in the graph.
 
         Parameters:
-        G (networkx.DiGraph): The graph to analyze.
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
 
         Returns:
         dict: Dictionary of nodes with relative in-degree centrality as values.
         """
+        G = self._networkx(G)
         in_degrees = dict(G.in_degree())
         num_nodes = len(G.nodes)
         return {node: degree / num_nodes for node, degree in in_degrees.items()}
@@ -72,97 +147,71 @@ class CentralityCalculator:
         Calculates the eigenvector centrality for each node in the graph.
 
         Parameters:
-        G (networkx.DiGraph): The graph to analyze.
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
 
         Returns:
         dict: Dictionary of nodes with eigenvector centrality as values.
         """
-        return nx.eigenvector_centrality_numpy(G)
+        return self.spectral_backend(G).eigenvector_centrality(warm_start=self.warm_start.get('eigenvector_centrality'))
 
     def calculate_pagerank(self, G):
         """
         Calculates the PageRank for each node in the graph.
 
         Parameters:
-        G (networkx.DiGraph): The graph to analyze.
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
 
         Returns:
         dict: Dictionary of nodes with PageRank as values.
         """
-        return nx.pagerank(G)
+        pagerank, self.pagerank_diagnostics = self.spectral_backend(G).pagerank(warm_start=self.warm_start.get('pagerank'))
+        return pagerank
 
     def calculate_current_flow_betweenness_centrality(self, G):
         """
-        Calculates the current flow betweenness centrality for each node in the graph.
+        Calculates the current flow betweenness centrality for each node in the graph, on its
+        undirected version, per connected component.
 
         Parameters:
-        G (networkx.Graph or networkx.DiGraph): The graph to analyze.
+        G (networkx.Graph or networkx.DiGraph or CSRGraph): The graph to analyze.
 
         Returns:
         dict: Dictionary of nodes with current flow betweenness centrality as values.
         """
-        if nx.is_directed(G):
-            # Convert directed graph to undirected graph
-            undirected_G = G.to_undirected()
-        else:
-            undirected_G = G
-
-        centrality = {}
-
-        # Check for connected components
-        if not nx.is_connected(undirected_G):
-            for component in nx.connected_components(undirected_G):
-                subgraph = undirected_G.subgraph(component)
-                if subgraph.number_of_edges() > 0:  # Skip components without edges
-                    try:
-                        subgraph_centrality = current_flow_betweenness_centrality(subgraph)
-                        centrality.update(subgraph_centrality)
-                    except ZeroDivisionError:
-                        # Handle the case where division by zero might occur
-                        for node in subgraph.nodes():
-                            centrality[node] = 0.0
-        else:
-            try:
-                centrality = current_flow_betweenness_centrality(undirected_G)
-            except ZeroDivisionError:
-                # Handle the case where division by zero might occur
-                for node in undirected_G.nodes():
-                    centrality[node] = 0.0
-
-        return {node: centrality.get(node, 0.0) for node in G.nodes()}
+        return self.current_flow_engine.betweenness_centrality(G)
 
     def calculate_forest_closeness_centrality(self, G):
         """
         Calculates the forest closeness centrality for each node in the graph.
 
         Parameters:
-        G (networkx.DiGraph): The graph to analyze.
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
 
         Returns:
         dict: Dictionary of nodes with forest closeness centrality as values.
         """
-        if nx.is_directed(G):
-            subgraphs = [G.subgraph(c).copy() for c in nx.weakly_connected_components(G)]
-        else:
-            subgraphs = [G.subgraph(c).copy() for c in nx.connected_components(G)]
-        
-        forest_closeness = {}
-        for subgraph in subgraphs:
-            closeness = nx.closeness_centrality(subgraph)
-            forest_closeness.update(closeness)
-        
-        return forest_closeness
+        return self.path_engine.forest_closeness_centrality(G)
 
-    def calculate_trophic_level(self, G):
+    def calculate_trophic_level(self, G, method=None):
         """
         Calculates the trophic level for each node in the graph.
 
         Parameters:
-        G (networkx.DiGraph): The graph to analyze.
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
+        method (str, optional): 'linear' to solve the trophic Laplacian system, which accepts graphs
+            with cycles, or 'topological' for the mean level of the citing nodes plus one, which
+            requires an acyclic graph; trophic_method by default.
 
         Returns:
         dict: Dictionary of nodes with trophic level as values.
         """
+        method = method or self.trophic_method
+        if method == 'linear':
+            return self.trophic_analyzer.trophic_levels(G)
+        if method != 'topological':
+            raise ValueError(f"Unknown trophic level method: {method}")
+        G = self._networkx(G)
+
         # Initialize trophic levels
         trophic_levels = {node: None for node in G.nodes()}
 
@@ -191,53 +240,154 @@ class CentralityCalculator:
 
         return trophic_levels
 
+    def calculate_trophic_incoherence(self, G, per_component=False):
+        """
+        Calculates the trophic incoherence of the graph, how far its citations are from all
+        raising the trophic level by exactly one.
+
+        Parameters:
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
+        per_component (bool): Return the incoherence of every node's weakly connected component.
+
+        Returns:
+        float or dict: Incoherence of the graph, or dictionary of nodes with the incoherence of
+        their component as values.
+        """
+        return self.trophic_analyzer.trophic_incoherence(G, per_component)
+
     def calculate_betweenness_centrality(self, G):
         """
         Calculates the betweenness centrality for each node in the graph.
 
         Parameters:
-        G (networkx.DiGraph): The graph to analyze.
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
 
         Returns:
         dict: Dictionary of nodes with betweenness centrality as values.
         """
-        return nx.betweenness_centrality(G)
+        return self.path_engine.betweenness_centrality(G)
+
+    def calculate_approximate_betweenness_centrality(self, G, sample_size=None, epsilon=None, confidence=0.95, seed=None):
+        """
+        Approximates the betweenness centrality from a sample of pivot nodes.
+
+        Without sample_size and epsilon, the approximation settings of the calculator are used.
+
+        Parameters:
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
+        sample_size (int, optional): Number of pivots, derived from epsilon and confidence by default.
+        epsilon (float, optional): Target bound on the absolute error, used when sample_size is not given.
+        confidence (float): Probability with which the error bound must hold.
+        seed (int, optional): Seed of the pivot sample, approx_seed by default.
+
+        Returns:
+        ApproximationResult: The estimated betweenness centrality in its values attribute,
+        with the sample size and achieved error bound.
+        """
+        from centralities.approximate import ApproximateCentrality
+
+        if sample_size is None and epsilon is None:
+            sample_size, epsilon = self.approx_sample_size, self.approx_epsilon
+        seed = self.approx_seed if seed is None else seed
+        approximator = ApproximateCentrality(sample_size, epsilon, confidence, seed, self.path_engine.max_workers)
+        return approximator.betweenness_centrality(G)
+
+    def calculate_approximate_betweenness_values(self, G):
+        """
+        Approximates the betweenness centrality with the approximation settings of the calculator,
+        logging the sample size and the error bound achieved.
+
+        Parameters:
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
+
+        Returns:
+        dict: Dictionary of nodes with the estimated betweenness centrality as values.
+        """
+        return self._approximation_values('approximate_betweenness_centrality',
+                                          self.calculate_approximate_betweenness_centrality(G))
+
+    def calculate_approximate_closeness_centrality(self, G, sample_size=None, epsilon=None, confidence=0.95, seed=None):
+        """
+        Approximates the closeness centrality from a sample of pivot nodes.
+
+        Without sample_size and epsilon, the approximation settings of the calculator are used.
+
+        Parameters:
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
+        sample_size (int, optional): Number of pivots, derived from epsilon and confidence by default.
+        epsilon (float, optional): Target bound on the absolute error, used when sample_size is not given.
+        confidence (float): Probability with which the error bound must hold.
+        seed (int, optional): Seed of the pivot sample, approx_seed by default.
+
+        Returns:
+        ApproximationResult: The estimated closeness centrality in its values attribute,
+        with the sample size and achieved error bound.
+        """
+        from centralities.approximate import ApproximateCentrality
+
+        if sample_size is None and epsilon is None:
+            sample_size, epsilon = self.approx_sample_size, self.approx_epsilon
+        seed = self.approx_seed if seed is None else seed
+        approximator = ApproximateCentrality(sample_size, epsilon, confidence, seed, self.path_engine.max_workers)
+        return approximator.closeness_centrality(G)
+
+    def calculate_approximate_closeness_values(self, G):
+        """
+        Approximates the closeness centrality with the approximation settings of the calculator,
+        logging the sample size and the error bound achieved.
+
+        Parameters:
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
+
+        Returns:
+        dict: Dictionary of nodes with the estimated closeness centrality as values.
+        """
+        return self._approximation_values('approximate_closeness_centrality',
+                                          self.calculate_approximate_closeness_centrality(G))
+
+    def _approximation_values(self, metric, result):
+        self.approximation_diagnostics[metric] = result
+        logging.getLogger(__name__).info(
+            f"Approximated {metric} from {result.sample_size} pivots: absolute error below {result.epsilon:.4g} "
+            f"with confidence {result.confidence} (seed {result.seed})")
+        return result.values
 
     def calculate_current_flow_closeness_centrality(self, G):
         """
-        Calculates the current flow closeness centrality for each node in the graph.
+        Calculates the current flow closeness centrality for each node in the graph, on its
+        undirected version, per connected component.
 
         Parameters:
-        G (networkx.DiGraph): The graph to analyze.
+        G (networkx.Graph or networkx.DiGraph or CSRGraph): The graph to analyze.
 
         Returns:
         dict: Dictionary of nodes with current flow closeness centrality as values.
         """
-        return current_flow_closeness_centrality(G)
+        return self.current_flow_engine.closeness_centrality(G)
 
     def calculate_out_degree_centrality(self, G):
         """
         Calculates the out-degree centrality for each node in the graph.
 
         Parameters:
-        G (networkx.DiGraph): The graph to analyze.
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
 
         Returns:
         dict: Dictionary of nodes with out-degree centrality as values.
         """
-        return dict(G.out_degree())
+        return dict(self._networkx(G).out_degree())
 
     def calculate_hub_centrality(self, G):
         """
         Calculates the hub centrality for each node in the graph.
 
         Parameters:
-        G (networkx.DiGraph): The graph to analyze.
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
 
         Returns:
         dict: Dictionary of nodes with hub centrality as values.
         """
-        hubs, _ = hits(G)
+        hubs, _ = self.spectral_backend(G).hits(warm_start=self.warm_start.get('authority_centrality'))
         return hubs
 
     def calculate_authority_centrality(self, G):
@@ -245,74 +395,77 @@ class CentralityCalculator:
         Calculates the authority centrality for each node in the graph.
 
         Parameters:
-        G (networkx.DiGraph): The graph to analyze.
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
 
         Returns:
         dict: Dictionary of nodes with authority centrality as values.
         """
-        _, authorities = hits(G)
+        _, authorities = self.spectral_backend(G).hits(warm_start=self.warm_start.get('authority_centrality'))
         return authorities
 
+    def calculate_hits(self, G):
+        """
+        Calculates the hub and authority centrality for each node in the graph in a single pass.
+
+        Parameters:
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
+
+        Returns:
+        dict: Dictionary with the keys 'hub_centrality' and 'authority_centrality', each holding
+        a dictionary of nodes with the centrality as values.
+        """
+        hubs, authorities = self.spectral_backend(G).hits(warm_start=self.warm_start.get('authority_centrality'))
+        return {'hub_centrality': hubs, 'authority_centrality': authorities}
+
     def calculate_harmonic_centrality(self, G):
         """
         Calculates the harmonic centrality for each node in the graph.
 
         Parameters:
-        G (networkx.DiGraph): The graph to analyze.
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
 
         Returns:
         dict: Dictionary of nodes with harmonic centrality as values.
         """
-        return nx.harmonic_centrality(G)
+        return self.path_engine.harmonic_centrality(G)
     
-    def get_neighbours(graph, node):
-        incoming, outgoing = [], []
-        graph.forInEdgesOf(node, lambda u, v, w, id: incoming.append(v))
-        graph.forEdgesOf(node, lambda u, v, w, id: outgoing.append(v))
-        return incoming, outgoing
-
     def calculate_disruption(self, G):
         """
         Calculates the disruption centrality for each node in the graph.
 
         Parameters:
-        G (networkx.DiGraph): The graph to analyze.
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
 
         Returns:
         dict: Dictionary of nodes with disruption centrality as values.
         """
-        disruptions = np.zeros(G.numberOfNodes())
-        for node in G.iterNodes():
-            incoming, outgoing = self.get_neighbours(G, node)
-            i, j, k = [], [], []
-            for in_node in incoming:
-                for out_node in outgoing:
-                    # This method does not account for directedness, but this does not matter because ingoing and outgoing lists are used.
-                    if G.hasEdge(in_node, out_node):
-                        if not out_node in j:
-                            j.append(out_node)
-            for out_node in outgoing:
-                if not out_node in j:
-                    i.append(out_node)
-            for in_node in incoming:
-                _, outgoing = self.get_neighbours(G, in_node)
-                for out_node in outgoing:
-                    if not out_node in j and not out_node == node:
-                        k.append(out_node)
-            n_i, n_j, n_k = len(i), len(j), len(k)
-            numerator, denominator = n_i-n_j, n_i+n_j+n_k
-            disruption = numerator/denominator if denominator != 0 else np.nan
-            disruptions[node] = disruption
-        return disruptions
+        from centralities.disruption import DisruptionCalculator
+
+        return DisruptionCalculator().calculate(G)
+
+    def calculate_distance_centralities(self, G):
+        """
+        Calculates betweenness, closeness, harmonic and forest closeness centrality from a single
+        breadth-first search per node.
+
+        Parameters:
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
+
+        Returns:
+        dict: Dictionary with the keys 'betweenness_centrality', 'closeness_centrality',
+        'harmonic_centrality' and 'forest_closeness_centrality', each holding a dictionary
+        of nodes with the centrality as values.
+        """
+        return self.path_engine.distance_centralities(G)
 
     def calculate_closeness_centrality(self, G):
         """
         Calculates the closeness centrality for each node in the graph.
 
         Parameters:
-        G (networkx.DiGraph): The graph to analyze.
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
 
         Returns:
         dict: Dictionary of nodes with closeness centrality as values.
         """
-        return nx.closeness_centrality(G)
\ No newline at end of file
+        return self.path_engine.closeness_centrality(G)
\ No newline at end of file
@@ -0,0 +1,293 @@
+import multiprocessing
+import os
+from contextlib import nullcontext
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components, laplacian
+from scipy.sparse.linalg import cg, splu
+
+from graph.csr import CSRGraph
+from utils.instrumentation import get_tracer
+
+# Largest component factorized by the 'auto' solver; beyond it the fill-in of the
+# LU factors grows too fast on citation graphs and conjugate gradients is used
+LU_MAX_NODES = 10000
+
+# Smallest component traced as a span of its own; the many small ones only count towards their metric
+TRACED_COMPONENT_NODES = 1000
+
+
+class _GroundedLaplacianSolver:
+    """Solves systems in the Laplacian of a connected graph grounded at node 0.
+
+    The grounded Laplacian is factorized once with a sparse LU decomposition in a
+    fill-reducing symmetric ordering, or, with solver='cg', solved by conjugate
+    gradients with a Jacobi preconditioner to relative tolerance tol. The returned
+    potentials have node 0 at zero.
+    """
+
+    def __init__(self, L, solver='lu', tol=1e-10):
+        self.n = L.shape[0]
+        grounded = L.tocsr()[1:, 1:].tocsc()
+        self.solver = solver
+        self.tol = tol
+        if solver == 'lu':
+            # The grounded Laplacian is symmetric positive definite, so no pivoting is needed
+            self.lu = splu(grounded, permc_spec='MMD_AT_PLUS_A', diag_pivot_thresh=0,
+                           options={'SymmetricMode': True})
+        else:
+            self.grounded = grounded.tocsr()
+            self.preconditioner = sparse.diags(1.0 / grounded.diagonal())
+
+    def solve(self, rhs):
+        """
+        Parameters:
+        rhs (np.ndarray): Right-hand sides of shape (n, k).
+
+        Returns:
+        np.ndarray: Potentials of shape (n, k).
+        """
+        potentials = np.zeros(rhs.shape)
+        if self.n == 1:
+            return potentials
+        if self.solver == 'lu':
+            potentials[1:] = self.lu.solve(np.ascontiguousarray(rhs[1:]))
+        else:
+            for column in range(rhs.shape[1]):
+                potentials[1:, column], info = cg(self.grounded, rhs[1:, column], rtol=self.tol,
+                                                  M=self.preconditioner, maxiter=10 * self.n)
+                if info > 0:
+                    raise RuntimeError(f"Current-flow solver did not converge in {info} iterations")
+        return potentials
+
+
+def _incidence(edges, n):
+    """
+    Builds the signed edge-node incidence matrix, +1 at the head and -1 at the tail of every edge.
+
+    Parameters:
+    edges (scipy.sparse.coo_matrix): Upper triangle of the symmetric adjacency.
+    n (int): Number of nodes.
+
+    Returns:
+    scipy.sparse.csr_matrix: Incidence matrix of shape (m, n).
+    """
+    m = edges.nnz
+    rows = np.r_[np.arange(m), np.arange(m)]
+    return sparse.csr_matrix((np.r_[np.ones(m), -np.ones(m)], (rows, np.r_[edges.row, edges.col])), shape=(m, n))
+
+
+def _component_betweenness(adjacency, solver, block_size, samples, seed, tol=1e-10):
+    """
+    Calculates the normalized current-flow betweenness of a connected component.
+
+    Exactly, every edge's row of the flow matrix is ranked as in Brandes and Fleischer,
+    as networkx does. With samples set, the throughput of random source-target pairs
+    is averaged instead.
+
+    Parameters:
+    adjacency (scipy.sparse.csr_matrix): Symmetric adjacency of the component.
+    solver (str): 'lu' or 'cg'.
+    block_size (int): Number of right-hand sides solved at a time.
+    samples (int or None): Number of sampled source-target pairs, None for the exact value.
+    seed (int or None): Seed of the sampled pairs.
+    tol (float): Relative tolerance of the conjugate gradients solver.
+
+    Returns:
+    np.ndarray: Betweenness of every node of the component.
+    """
+    n = adjacency.shape[0]
+    if n <= 2:
+        return np.zeros(n)
+    system = _GroundedLaplacianSolver(laplacian(adjacency.astype(np.float64)), solver, tol)
+    edges = sparse.triu(adjacency, k=1).tocoo()
+    heads, tails = edges.row, edges.col
+    betweenness = np.zeros(n)
+
+    if samples is None:
+        positions = np.arange(n)
+        for start in range(0, len(heads), block_size):
+            u, v = heads[start:start + block_size], tails[start:start + block_size]
+            rhs = np.zeros((n, len(u)))
+            rhs[u, np.arange(len(u))] = 1.0
+            rhs[v, np.arange(len(u))] = -1.0
+            rows = system.solve(rhs).T
+            # Rank of every node in each row, highest potential first
+            descending = np.argsort(rows, axis=1)[:, ::-1]
+            rank = np.empty_like(descending)
+            rank[np.arange(len(u))[:, None], descending] = positions
+            np.add.at(betweenness, u, ((positions - rank) * rows).sum(axis=1))
+            np.add.at(betweenness, v, ((n - 1 - positions - rank) * rows).sum(axis=1))
+        return (betweenness - positions) * 2.0 / ((n - 1.0) * (n - 2.0))
+
+    incidence = _incidence(edges, n)
+    rng = np.random.default_rng(seed)
+    sources = rng.integers(0, n, size=samples)
+    targets = (sources + rng.integers(1, n, size=samples)) % n
+    for start in range(0, samples, block_size):
+        s, t = sources[start:start + block_size], targets[start:start + block_size]
+        rhs = np.zeros((n, len(s)))
+        rhs[s, np.arange(len(s))] = 1.0
+        rhs[t, np.arange(len(s))] = -1.0
+        flows = np.abs(incidence @ system.solve(rhs))
+        # Throughput of a node is half the flow over its edges, leaving out the endpoints
+        throughput = abs(incidence).T @ flows
+        throughput[s, np.arange(len(s))] = 0.0
+        throughput[t, np.arange(len(s))] = 0.0
+        betweenness += throughput.sum(axis=1) / 2.0
+    # Scale the sampled pairs up to all n(n-1)/2 pairs, then normalize as networkx
+    return betweenness * n / (samples * (n - 2.0))
+
+
+def _component_closeness(adjacency, solver, block_size, probes, seed, tol=1e-10):
+    """
+    Calculates the current-flow closeness, the inverse of the summed effective
+    resistances, of a connected component.
+
+    Exactly, the diagonal of the grounded inverse Laplacian is solved block by block.
+    With probes set, the effective resistances are estimated from a random projection
+    of the edge flows (Spielman and Srivastava) with that many dimensions.
+
+    Parameters:
+    adjacency (scipy.sparse.csr_matrix): Symmetric adjacency of the component.
+    solver (str): 'lu' or 'cg'.
+    block_size (int): Number of right-hand sides solved at a time.
+    probes (int or None): Dimension of the random projection, None for the exact value.
+    seed (int or None): Seed of the random projection.
+    tol (float): Relative tolerance of the conjugate gradients solver.
+
+    Returns:
+    np.ndarray: Closeness of every node of the component.
+    """
+    n = adjacency.shape[0]
+    if n == 1:
+        return np.zeros(1)
+    system = _GroundedLaplacianSolver(laplacian(adjacency.astype(np.float64)), solver, tol)
+
+    if probes is None:
+        # sum_w R(v, w) = n C[v, v] + trace(C) - 2 (C 1)[v]
+        diagonal = np.zeros(n)
+        for start in range(0, n, block_size):
+            block = np.arange(start, min(start + block_size, n))
+            rhs = np.zeros((n, len(block)))
+            rhs[block, np.arange(len(block))] = 1.0
+            diagonal[block] = system.solve(rhs)[block, np.arange(len(block))]
+        row_sums = system.solve(np.ones((n, 1)))[:, 0]
+        resistance = n * diagonal + diagonal.sum() - 2.0 * row_sums
+    else:
+        incidence = _incidence(sparse.triu(adjacency, k=1).tocoo(), n)
+        rng = np.random.default_rng(seed)
+        projection = rng.choice([-1.0, 1.0], size=(incidence.shape[0], probes)) / np.sqrt(probes)
+        # Rows of the embedding approximate every node's potential profile
+        embedding = system.solve(incidence.T @ projection)
+        squared_norms = (embedding ** 2).sum(axis=1)
+        resistance = n * squared_norms + squared_norms.sum() - 2.0 * embedding @ embedding.sum(axis=0)
+    return 1.0 / resistance
+
+
+def _component_task(task):
+    metric, adjacency, solver, block_size, sample_count, seed, tol = task
+    if solver == 'auto':
+        solver = 'lu' if adjacency.shape[0] <= LU_MAX_NODES else 'cg'
+    span = nullcontext()
+    if adjacency.shape[0] >= TRACED_COMPONENT_NODES:
+        span = get_tracer().span('current_flow_component', 'component', metric=metric, solver=solver,
+                                 nodes=adjacency.shape[0], edges=adjacency.nnz // 2,
+                                 sampled=sample_count is not None)
+    with span:
+        if metric == 'betweenness':
+            return _component_betweenness(adjacency, solver, block_size, sample_count, seed, tol)
+        return _component_closeness(adjacency, solver, block_size, sample_count, seed, tol)
+
+
+class CurrentFlowEngine:
+    """Class to compute current-flow centralities per connected component on a sparse Laplacian.
+
+    The graph is treated as undirected and unweighted, self-loops are ignored. Each
+    connected component's grounded Laplacian is factorized once and solved for blocks
+    of right-hand sides; components are processed in parallel. Components larger than
+    approximate_threshold switch to sampling (betweenness) or random projections
+    (closeness). Nodes of components too small for the metric get 0.
+    """
+
+    def __init__(self, max_workers=1, solver='auto', block_size=256, approximate_threshold=None,
+                 samples=2000, probes=64, seed=None, tol=1e-10):
+        """
+        Parameters:
+        max_workers (int, optional): Number of worker processes, the number of CPUs if None.
+        solver (str): 'lu' for a sparse LU factorization, 'cg' for preconditioned conjugate gradients,
+            'auto' to factorize components of up to LU_MAX_NODES nodes and use conjugate gradients above.
+        block_size (int): Number of right-hand sides solved at a time, bounds the memory per component.
+        approximate_threshold (int, optional): Component size above which the approximate mode is used.
+        samples (int): Number of source-target pairs sampled for approximate betweenness.
+        probes (int): Dimension of the random projection for approximate closeness.
+        seed (int, optional): Seed of the approximate mode.
+        tol (float): Relative tolerance of the conjugate gradients solver, which raises when it is not met.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.solver = solver
+        self.block_size = block_size
+        self.approximate_threshold = approximate_threshold
+        self.samples = samples
+        self.probes = probes
+        self.seed = seed
+        self.tol = tol
+
+    def betweenness_centrality(self, G):
+        """
+        Calculates the normalized current-flow betweenness, as nx.current_flow_betweenness_centrality
+        on every connected component.
+
+        Parameters:
+        G (networkx.Graph or networkx.DiGraph or CSRGraph): The graph to analyze.
+
+        Returns:
+        dict: Dictionary of nodes with current flow betweenness centrality as values.
+        """
+        return self._run('betweenness', G, self.samples)
+
+    def closeness_centrality(self, G):
+        """
+        Calculates the current-flow closeness, as nx.current_flow_closeness_centrality on every
+        connected component.
+
+        Parameters:
+        G (networkx.Graph or networkx.DiGraph or CSRGraph): The graph to analyze.
+
+        Returns:
+        dict: Dictionary of nodes with current flow closeness centrality as values.
+        """
+        return self._run('closeness', G, self.probes)
+
+    def _run(self, metric, G, sample_count):
+        graph = G if isinstance(G, CSRGraph) else CSRGraph.from_networkx(G)
+        adjacency = graph.adjacency + graph.reverse()
+        adjacency.setdiag(0)
+        adjacency.eliminate_zeros()
+        adjacency.data[:] = 1
+        _, labels = connected_components(adjacency, directed=False)
+
+        # Largest components first, so they do not end up last in the pool
+        components = sorted(np.split(np.argsort(labels, kind='stable'), np.cumsum(np.bincount(labels))[:-1]),
+                            key=len, reverse=True)
+        tasks = []
+        for nodes in components:
+            approximate = self.approximate_threshold is not None and len(nodes) > self.approximate_threshold
+            tasks.append((metric, adjacency[nodes][:, nodes], self.solver, self.block_size,
+                          sample_count if approximate else None, self.seed, self.tol))
+
+        workers = max(1, min(self.max_workers, len(tasks)))
+        if multiprocessing.current_process().daemon:
+            workers = 1
+        values = np.zeros(graph.number_of_nodes())
+        if workers == 1:
+            for nodes, component_values in zip(components, map(_component_task, tasks)):
+                values[nodes] = component_values
+        else:
+            # Leaving the block terminates the pool, so a failing component or a timeout of the
+            # scheduler does not wait for the remaining components
+            with multiprocessing.get_context().Pool(workers) as pool:
+                for nodes, component_values in zip(components, pool.imap(_component_task, tasks)):
+                    values[nodes] = component_values
+        return graph.to_dict(values)
@@ -0,0 +1,397 @@
+import json
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import breadth_first_order, connected_components
+
+from centralities.current_flow import CurrentFlowEngine
+from centralities.disruption import DisruptionCalculator
+from centralities.paths import PathCentralityEngine
+from centralities.spectral import SpectralBackend
+from centralities.trophic import TrophicAnalyzer
+from graph.csr import CSRGraph
+
+
+class IncrementalCentralities:
+    """Class to keep the centrality measures of a growing citation graph up to date.
+
+    The first run computes every metric from scratch. Later runs take the new nodes and
+    edges and update the results instead of recomputing them:
+
+    - degree metrics are recomputed from the updated degree arrays, and core numbers are
+      maintained exactly one inserted edge at a time (Sariyüce et al., 2013);
+    - eigenvector centrality, PageRank and HITS restart their solvers from the previous values;
+    - betweenness, closeness, harmonic and forest closeness keep the raw per-node sums of
+      the BFS from every source. Only sources that reach a new edge see a different
+      search, so their old contributions are subtracted and their new ones added. When
+      more than max_affected_fraction of the nodes are affected everything is recomputed;
+    - current-flow centralities and trophic levels are defined per connected component and
+      are recomputed only on the components that received new nodes or edges;
+    - the disruption index is recomputed, which only takes a few sparse products.
+
+    The state, graph included, is persisted with save and restored with load, together
+    with the options its values were computed with.
+    """
+
+    def __init__(self, max_workers=1, max_affected_fraction=0.2, current_flow_threshold=None, trophic_method='linear'):
+        """
+        Parameters:
+        max_workers (int): Number of processes used by the shortest-path and current-flow engines.
+        max_affected_fraction (float): Largest fraction of BFS sources that is updated
+            incrementally; above it the shortest-path sums are recomputed from scratch.
+        current_flow_threshold (int, optional): Component size above which the current-flow centralities
+            are approximated, exact everywhere by default.
+        trophic_method (str): Method of the trophic levels, 'linear' or 'topological', see
+            CentralityCalculator.calculate_trophic_level.
+        """
+        self.max_workers = max_workers
+        self.max_affected_fraction = max_affected_fraction
+        self.current_flow_threshold = current_flow_threshold
+        self.trophic_method = trophic_method
+        self.path_engine = PathCentralityEngine(max_workers=max_workers)
+        self.graph = None
+        self.values = {}
+        self.core = None
+        self.path_sums = None
+        self.last_update = None
+
+    def initialize(self, graph):
+        """
+        Computes every metric of the graph from scratch.
+
+        Parameters:
+        graph (CSRGraph): The graph to analyze.
+
+        Returns:
+        dict: Dictionary of metric names with node dictionaries as values.
+        """
+        self.graph = graph.without_self_loops()
+        self.values = {}
+        core = nx.core_number(self.graph.to_networkx())
+        self.core = np.array([core[node] for node in self.graph.node_ids], dtype=np.int64)
+        self.path_sums = self.path_engine.fused_sums(self.graph)
+        self._update_degrees()
+        self._update_spectral(warm_start=False)
+        self._update_components(np.ones(self.graph.number_of_nodes(), dtype=bool))
+        self._update_distances()
+        self.values['disruption'] = self._array(DisruptionCalculator().calculate(self.graph))
+        n = self.graph.number_of_nodes()
+        self.last_update = {'new_nodes': n, 'new_edges': self.graph.number_of_edges(),
+                            'affected_sources': n, 'full_recompute': True}
+        return self.measures()
+
+    def refresh(self, graph):
+        """
+        Brings the state up to date with a newer version of the graph.
+
+        The new nodes and edges are found by comparing the graph with the state. When nodes
+        or edges were removed the update cannot be incremental and everything is recomputed.
+
+        Parameters:
+        graph (CSRGraph): The current graph.
+
+        Returns:
+        dict: Dictionary of metric names with node dictionaries as values.
+        """
+        if self.graph is None:
+            return self.initialize(graph)
+        graph = graph.without_self_loops()
+        old_ids = self.graph.node_ids
+        if not old_ids.isin(graph.node_ids).all():
+            return self.initialize(graph)
+
+        new_ids = graph.node_ids.difference(old_ids, sort=False)
+        ids = old_ids.append(new_ids)
+        edges = graph.adjacency.tocoo()
+        # Re-code the edges of the new graph with the ids of the state
+        position = ids.get_indexer(graph.node_ids)
+        new_codes = _edge_codes(position[edges.row], position[edges.col], len(ids))
+        old_edges = self.graph.adjacency.tocoo()
+        old_codes = _edge_codes(old_edges.row, old_edges.col, len(ids))
+        if not np.isin(old_codes, new_codes, assume_unique=True).all():
+            return self.initialize(graph)
+        added = np.setdiff1d(new_codes, old_codes, assume_unique=True)
+        return self._apply(new_ids, added // len(ids), added % len(ids))
+
+    def update(self, new_node_ids, sources, targets):
+        """
+        Adds new nodes and edges to the state and updates the metrics.
+
+        Edges with an endpoint that is neither in the graph nor among the new nodes are
+        dropped, as are self-loops and edges already in the graph.
+
+        Parameters:
+        new_node_ids (array-like): Identifiers of the new nodes.
+        sources (array-like): Source identifier of every new edge.
+        targets (array-like): Target identifier of every new edge.
+
+        Returns:
+        dict: Dictionary of metric names with node dictionaries as values.
+        """
+        new_ids = pd.Index(pd.unique(np.asarray(new_node_ids, dtype=object))).difference(self.graph.node_ids,
+                                                                                          sort=False)
+        ids = self.graph.node_ids.append(new_ids)
+        source_codes = ids.get_indexer(np.asarray(sources, dtype=object))
+        target_codes = ids.get_indexer(np.asarray(targets, dtype=object))
+        valid = (source_codes >= 0) & (target_codes >= 0) & (source_codes != target_codes)
+        codes = np.unique(_edge_codes(source_codes[valid], target_codes[valid], len(ids)))
+        old_edges = self.graph.adjacency.tocoo()
+        codes = np.setdiff1d(codes, _edge_codes(old_edges.row, old_edges.col, len(ids)), assume_unique=True)
+        return self._apply(new_ids, codes // len(ids), codes % len(ids))
+
+    def measures(self):
+        """
+        Returns the current metric values.
+
+        Returns:
+        dict: Dictionary of metric names with node dictionaries as values.
+        """
+        return {name: self.graph.to_dict(values) for name, values in self.values.items()}
+
+    def save(self, path):
+        """
+        Saves the graph, the metric values and the incremental state to an .npz file.
+
+        The node identifiers are stored as an array of their own type, so they must all be
+        strings or all numbers; other identifiers raise a ValueError, as they would not be
+        restored as the same nodes.
+
+        Parameters:
+        path (str): The path of the file.
+        """
+        node_ids = np.asarray(self.graph.node_ids.to_list())
+        if node_ids.dtype.kind not in 'Uiufb' or not pd.Index(node_ids.astype(object)).equals(self.graph.node_ids):
+            raise ValueError("Node identifiers must all be strings or all numbers to be saved, "
+                             f"got {self.graph.node_ids[:3].to_list()}")
+        adjacency = self.graph.adjacency
+        arrays = {f'metric__{name}': values for name, values in self.values.items()}
+        np.savez(path, node_ids=node_ids, indptr=adjacency.indptr,
+                 indices=adjacency.indices, core=self.core, path_sums=self.path_sums,
+                 options=json.dumps(self.options()), **arrays)
+
+    def options(self):
+        """
+        Returns the options the metric values depend on.
+
+        Returns:
+        dict: The current-flow threshold and the trophic level method.
+        """
+        return {'current_flow_threshold': self.current_flow_threshold, 'trophic_method': self.trophic_method}
+
+    @classmethod
+    def load(cls, path, max_workers=1, max_affected_fraction=0.2, current_flow_threshold=None, trophic_method='linear'):
+        """
+        Restores a state saved with save.
+
+        A state saved with other options is discarded, as its values would not match, and
+        the returned state is empty so that refresh starts from scratch.
+
+        Parameters:
+        path (str): The path of the file.
+        max_workers (int): Number of processes used by the shortest-path and current-flow engines.
+        max_affected_fraction (float): Largest fraction of BFS sources that is updated incrementally.
+        current_flow_threshold (int, optional): Component size above which the current-flow centralities
+            are approximated.
+        trophic_method (str): Method of the trophic levels.
+
+        Returns:
+        IncrementalCentralities: The restored state.
+        """
+        state = cls(max_workers, max_affected_fraction, current_flow_threshold, trophic_method)
+        with np.load(path) as data:
+            # States saved before the options were recorded used the defaults
+            saved = json.loads(str(data['options'])) if 'options' in data.files else {
+                'current_flow_threshold': None, 'trophic_method': 'linear'}
+            if saved != state.options():
+                return state
+            n = len(data['node_ids'])
+            adjacency = sparse.csr_matrix((np.ones(len(data['indices']), dtype=np.int8), data['indices'],
+                                           data['indptr']), shape=(n, n))
+            state.graph = CSRGraph(data['node_ids'].astype(object), adjacency)
+            state.core = data['core']
+            state.path_sums = data['path_sums']
+            state.values = {key[len('metric__'):]: data[key] for key in data.files if key.startswith('metric__')}
+        return state
+
+    def _apply(self, new_ids, sources, targets):
+        """
+        Applies a delta of new nodes and edges, both coded with the ids of the updated graph.
+
+        Parameters:
+        new_ids (pd.Index): Identifiers of the new nodes, appended after the existing ones.
+        sources (np.ndarray): Integer id of the source of every new edge.
+        targets (np.ndarray): Integer id of the target of every new edge.
+
+        Returns:
+        dict: Dictionary of metric names with node dictionaries as values.
+        """
+        old_graph = self.graph
+        n_old = old_graph.number_of_nodes()
+        n = n_old + len(new_ids)
+        old_edges = old_graph.adjacency.tocoo()
+        self.graph = CSRGraph.from_codes(old_graph.node_ids.append(new_ids), np.r_[old_edges.row, sources],
+                                         np.r_[old_edges.col, targets])
+
+        self._update_core_numbers(old_graph, n, sources, targets)
+        self._update_degrees()
+        self._update_spectral(warm_start=True)
+
+        # Components holding a new node or a new edge
+        _, labels = connected_components(self.graph.adjacency, directed=True, connection='weak')
+        touched = np.zeros(labels.max() + 1, dtype=bool)
+        touched[labels[np.r_[np.arange(n_old, n), sources, targets]]] = True
+        self._update_components(touched[labels])
+
+        # Sources reaching the citing node of a new edge, and the new nodes, search differently now
+        affected = np.zeros(n, dtype=bool)
+        reverse = self.graph.reverse()
+        for start in np.unique(sources):
+            if affected.sum() > self.max_affected_fraction * n:
+                break
+            if not affected[start]:
+                affected[breadth_first_order(reverse, start, directed=True, return_predecessors=False)] = True
+        affected[n_old:] = True
+        affected_sources = np.flatnonzero(affected)
+        full_recompute = len(affected_sources) > self.max_affected_fraction * n
+        if full_recompute:
+            self.path_sums = self.path_engine.fused_sums(self.graph)
+        else:
+            old_sources = affected_sources[affected_sources < n_old]
+            sums = np.zeros((4, n))
+            sums[:, :n_old] = self.path_sums - self.path_engine.fused_sums(old_graph, old_sources)
+            self.path_sums = sums + self.path_engine.fused_sums(self.graph, affected_sources)
+        self._update_distances()
+
+        self.values['disruption'] = self._array(DisruptionCalculator().calculate(self.graph))
+        self.last_update = {'new_nodes': len(new_ids), 'new_edges': len(sources),
+                            'affected_sources': len(affected_sources), 'full_recompute': full_recompute}
+        return self.measures()
+
+    def _update_degrees(self):
+        n = self.graph.number_of_nodes()
+        in_degree = self.graph.in_degree()
+        out_degree = self.graph.out_degree()
+        self.values['degree_centrality'] = (in_degree + out_degree) / (n - 1) if n > 1 else np.ones(n)
+        self.values['in_degree_centrality'] = in_degree
+        self.values['out_degree_centrality'] = out_degree
+        self.values['relative_in_degree_centrality'] = in_degree / n
+        self.values['core_number'] = self.core
+
+    def _update_core_numbers(self, old_graph, n, sources, targets):
+        """
+        Maintains the core numbers, with networkx's semantics for directed graphs, while the
+        new edges are inserted one at a time.
+
+        An insertion between u and v can only raise nodes with core number K = min(core[u],
+        core[v]) to K + 1, and only those connected to the lower endpoint through such nodes.
+        Starting there, the candidates with more than K neighbors of core number K or higher
+        are collected, and candidates that cannot keep K + 1 such neighbors are evicted.
+
+        Parameters:
+        old_graph (CSRGraph): The graph before the insertions.
+        n (int): Number of nodes after the insertions.
+        sources (np.ndarray): Integer id of the source of every new edge.
+        targets (np.ndarray): Integer id of the target of every new edge.
+        """
+        # networkx counts a reciprocated citation twice, so neighbors are kept with their multiplicity
+        undirected = (old_graph.adjacency.astype(np.int32) + old_graph.reverse().astype(np.int32)).tocsr()
+        indptr, indices, counts = undirected.indptr.tolist(), undirected.indices.tolist(), undirected.data.tolist()
+        n_old = len(indptr) - 1
+        added = {}
+        core = self.core.tolist() + [0] * (n - n_old)
+
+        def neighbors(w):
+            if w < n_old:
+                yield from zip(indices[indptr[w]:indptr[w + 1]], counts[indptr[w]:indptr[w + 1]])
+            yield from added.get(w, {}).items()
+
+        for u, v in zip(sources.tolist(), targets.tolist()):
+            added.setdefault(u, {})[v] = added.get(u, {}).get(v, 0) + 1
+            added.setdefault(v, {})[u] = added.get(v, {}).get(u, 0) + 1
+            K = min(core[u], core[v])
+            # Candidates and their number of neighbors with core number K or higher
+            degree = {}
+            stack = [w for w in (u, v) if core[w] == K]
+            for w in stack:
+                degree.setdefault(w, None)
+            while stack:
+                w = stack.pop()
+                degree[w] = sum(c for x, c in neighbors(w) if core[x] >= K)
+                if degree[w] <= K:
+                    continue
+                for x, _ in neighbors(w):
+                    if core[x] == K and x not in degree:
+                        degree[x] = None
+                        stack.append(x)
+
+            evicted = set()
+            queue = [w for w, d in degree.items() if d <= K]
+            while queue:
+                w = queue.pop()
+                if w in evicted:
+                    continue
+                evicted.add(w)
+                for x, c in neighbors(w):
+                    if x in degree and x not in evicted:
+                        degree[x] -= c
+                        if degree[x] <= K:
+                            queue.append(x)
+            for w in degree:
+                if w not in evicted:
+                    core[w] = K + 1
+        self.core = np.array(core, dtype=np.int64)
+
+    def _update_spectral(self, warm_start):
+        backend = SpectralBackend(self.graph)
+        previous = self.measures() if warm_start else {}
+        self.values['eigenvector_centrality'] = self._array(
+            backend.eigenvector_centrality(warm_start=previous.get('eigenvector_centrality')))
+        pagerank, _ = backend.pagerank(warm_start=previous.get('pagerank'))
+        self.values['pagerank'] = self._array(pagerank)
+        hubs, authorities = backend.hits(warm_start=previous.get('authority_centrality'))
+        self.values['hub_centrality'] = self._array(hubs)
+        self.values['authority_centrality'] = self._array(authorities)
+
+    def _update_components(self, mask):
+        """
+        Recomputes the per-component metrics on the nodes in mask, which must be a union of
+        connected components.
+
+        Parameters:
+        mask (np.ndarray): Boolean array selecting the nodes to recompute.
+        """
+        n = self.graph.number_of_nodes()
+        nodes = np.flatnonzero(mask)
+        subgraph = CSRGraph(self.graph.node_ids[nodes], self.graph.adjacency[nodes][:, nodes])
+        engine = CurrentFlowEngine(max_workers=self.max_workers, approximate_threshold=self.current_flow_threshold)
+        results = {
+            'current_flow_betweenness_centrality': engine.betweenness_centrality(subgraph),
+            'current_flow_closeness_centrality': engine.closeness_centrality(subgraph),
+            'trophic_level': self._trophic_levels(subgraph),
+        }
+        for name, result in results.items():
+            values = np.zeros(n)
+            previous = self.values.get(name, np.empty(0))
+            values[:len(previous)] = previous
+            values[nodes] = np.fromiter(result.values(), dtype=np.float64, count=len(nodes))
+            self.values[name] = values
+
+    def _trophic_levels(self, subgraph):
+        if self.trophic_method == 'linear':
+            return TrophicAnalyzer().trophic_levels(subgraph)
+        from centralities.calculator import CentralityCalculator
+
+        return CentralityCalculator(trophic_method=self.trophic_method).calculate_trophic_level(subgraph)
+
+    def _update_distances(self):
+        for name, result in self.path_engine.distance_centralities_from_sums(self.graph, self.path_sums).items():
+            self.values[name] = self._array(result)
+
+    def _array(self, result):
+        return np.fromiter(result.values(), dtype=np.float64, count=len(result))
+
+
+def _edge_codes(sources, targets, n):
+    return sources.astype(np.int64) * n + targets.astype(np.int64)
@@ -0,0 +1,353 @@
+import multiprocessing
+import os
+from collections import deque
+
+import numpy as np
+from scipy.sparse.csgraph import connected_components
+
+from graph.csr import CSRGraph
+
+# Adjacency of the current worker process as Python lists, set once by _init_worker
+_worker_indptr = None
+_worker_indices = None
+
+
+def _init_worker(indptr, indices):
+    global _worker_indptr, _worker_indices
+    # Python lists are much faster to index one element at a time than numpy arrays
+    _worker_indptr = indptr.tolist()
+    _worker_indices = indices.tolist()
+
+
+def _release_worker():
+    global _worker_indptr, _worker_indices
+    _worker_indptr = _worker_indices = None
+
+
+def _bfs(source, with_paths):
+    """
+    Runs a breadth-first search from one source over the worker adjacency.
+
+    Parameters:
+    source (int): Integer id of the source node.
+    with_paths (bool): Whether to also count shortest paths and record predecessors.
+
+    Returns:
+    tuple: The nodes in visiting order, their distances, and when with_paths is set
+    their shortest path counts and predecessors (dicts keyed by node id).
+    """
+    indptr, indices = _worker_indptr, _worker_indices
+    dist = {source: 0}
+    sigma = {source: 1} if with_paths else None
+    preds = {source: []} if with_paths else None
+    order = []
+    queue = deque([source])
+    while queue:
+        v = queue.popleft()
+        order.append(v)
+        next_dist = dist[v] + 1
+        for w in indices[indptr[v]:indptr[v + 1]]:
+            if w not in dist:
+                dist[w] = next_dist
+                queue.append(w)
+                if with_paths:
+                    sigma[w] = 0
+                    preds[w] = []
+            if with_paths and dist[w] == next_dist:
+                sigma[w] += sigma[v]
+                preds[w].append(v)
+    return order, dist, sigma, preds
+
+
+def _betweenness_chunk(sources):
+    """
+    Accumulates the Brandes dependencies of a chunk of sources.
+
+    Parameters:
+    sources (np.ndarray): Integer ids of the source nodes.
+
+    Returns:
+    np.ndarray: Unnormalized betweenness contributed by the sources.
+    """
+    betweenness = np.zeros(len(_worker_indptr) - 1)
+    for source in sources.tolist():
+        order, _, sigma, preds = _bfs(source, with_paths=True)
+        delta = dict.fromkeys(order, 0.0)
+        for w in reversed(order):
+            coefficient = (1.0 + delta[w]) / sigma[w]
+            for v in preds[w]:
+                delta[v] += sigma[v] * coefficient
+            if w != source:
+                betweenness[w] += delta[w]
+    return betweenness
+
+
+def _distance_chunk(sources):
+    """
+    Accumulates, for every node, the distances from a chunk of sources that reach it.
+
+    Parameters:
+    sources (np.ndarray): Integer ids of the source nodes.
+
+    Returns:
+    np.ndarray: Array of shape (3, n) holding the sum of distances, the number of
+    sources reaching each node (itself included) and the sum of reciprocal distances.
+    """
+    n = len(_worker_indptr) - 1
+    total_distance, reached, reciprocal = [0] * n, [0] * n, [0.0] * n
+    for source in sources.tolist():
+        _, dist, _, _ = _bfs(source, with_paths=False)
+        for u, d in dist.items():
+            total_distance[u] += d
+            reached[u] += 1
+            if d:
+                reciprocal[u] += 1.0 / d
+    return np.array([total_distance, reached, reciprocal], dtype=np.float64)
+
+
+def _fused_chunk(sources):
+    """
+    Runs one BFS per source and feeds it to the betweenness and distance accumulators.
+
+    Parameters:
+    sources (np.ndarray): Integer ids of the source nodes.
+
+    Returns:
+    np.ndarray: Array of shape (4, n) holding the unnormalized betweenness followed by
+    the three rows returned by _distance_chunk.
+    """
+    n = len(_worker_indptr) - 1
+    betweenness = [0.0] * n
+    total_distance, reached, reciprocal = [0] * n, [0] * n, [0.0] * n
+    for source in sources.tolist():
+        order, dist, sigma, preds = _bfs(source, with_paths=True)
+        delta = dict.fromkeys(order, 0.0)
+        for w in reversed(order):
+            coefficient = (1.0 + delta[w]) / sigma[w]
+            for v in preds[w]:
+                delta[v] += sigma[v] * coefficient
+            d = dist[w]
+            total_distance[w] += d
+            reached[w] += 1
+            if w != source:
+                betweenness[w] += delta[w]
+                reciprocal[w] += 1.0 / d
+    return np.array([betweenness, total_distance, reached, reciprocal], dtype=np.float64)
+
+
+class PathCentralityEngine:
+    """Class to compute shortest-path centralities by splitting the BFS sources across processes.
+
+    Every worker receives the CSR adjacency once, runs the BFS of its chunks of
+    sources and returns partial sums, which are added up and normalized the way
+    networkx does. The results are the dictionaries networkx would return.
+    """
+
+    def __init__(self, max_workers=None, chunks_per_worker=4):
+        """
+        Parameters:
+        max_workers (int, optional): Number of worker processes, the number of CPUs by default.
+            With 1, or inside a daemonic worker process, everything runs in the current process.
+        chunks_per_worker (int): Number of source chunks per worker, to balance uneven chunks.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunks_per_worker = chunks_per_worker
+
+    def betweenness_centrality(self, G):
+        """
+        Calculates the normalized betweenness centrality, as nx.betweenness_centrality.
+
+        Parameters:
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
+
+        Returns:
+        dict: Dictionary of nodes with betweenness centrality as values.
+        """
+        graph = self._as_csr(G)
+        n = graph.number_of_nodes()
+        betweenness = self.betweenness_sums(graph)
+        if n > 2:
+            betweenness = betweenness / ((n - 1) * (n - 2))
+        return graph.to_dict(betweenness)
+
+    def closeness_centrality(self, G):
+        """
+        Calculates the closeness centrality, as nx.closeness_centrality.
+
+        For directed graphs the incoming distances are used.
+
+        Parameters:
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
+
+        Returns:
+        dict: Dictionary of nodes with closeness centrality as values.
+        """
+        graph = self._as_csr(G)
+        sums = self.distance_sums(graph)
+        sizes = np.full(graph.number_of_nodes(), graph.number_of_nodes())
+        return graph.to_dict(self._closeness(sums, sizes))
+
+    def forest_closeness_centrality(self, G):
+        """
+        Calculates the closeness centrality within each weakly connected component.
+
+        Parameters:
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
+
+        Returns:
+        dict: Dictionary of nodes with forest closeness centrality as values.
+        """
+        graph = self._as_csr(G)
+        sums = self.distance_sums(graph)
+        _, labels = connected_components(graph.adjacency, directed=True, connection='weak')
+        sizes = np.bincount(labels)[labels]
+        return graph.to_dict(self._closeness(sums, sizes))
+
+    def harmonic_centrality(self, G):
+        """
+        Calculates the harmonic centrality, as nx.harmonic_centrality.
+
+        Parameters:
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
+
+        Returns:
+        dict: Dictionary of nodes with harmonic centrality as values.
+        """
+        graph = self._as_csr(G)
+        sums = self.distance_sums(graph)
+        return graph.to_dict(sums[2])
+
+    def distance_centralities(self, G):
+        """
+        Calculates betweenness, closeness, harmonic and forest closeness centrality together.
+
+        Each source is traversed once and the traversal feeds all four accumulators,
+        instead of running four separate all-pairs searches.
+
+        Parameters:
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
+
+        Returns:
+        dict: Dictionary of metric names with the node dictionaries of the four metrics as values.
+        """
+        graph = self._as_csr(G)
+        return self.distance_centralities_from_sums(graph, self.fused_sums(graph))
+
+    def distance_centralities_from_sums(self, graph, sums):
+        """
+        Normalizes the output of fused_sums into the four distance-based centralities.
+
+        Parameters:
+        graph (CSRGraph): The graph the sums were accumulated on.
+        sums (np.ndarray): Output of fused_sums over all sources.
+
+        Returns:
+        dict: Dictionary of metric names with the node dictionaries of the four metrics as values.
+        """
+        n = graph.number_of_nodes()
+        betweenness = sums[0] / ((n - 1) * (n - 2)) if n > 2 else sums[0]
+        _, labels = connected_components(graph.adjacency, directed=True, connection='weak')
+        return {
+            'betweenness_centrality': graph.to_dict(betweenness),
+            'closeness_centrality': graph.to_dict(self._closeness(sums[1:], np.full(n, n))),
+            'harmonic_centrality': graph.to_dict(sums[3]),
+            'forest_closeness_centrality': graph.to_dict(self._closeness(sums[1:], np.bincount(labels)[labels])),
+        }
+
+    def _closeness(self, sums, sizes):
+        """
+        Normalizes summed distances into closeness, scaled by the reachable fraction of sizes.
+
+        Parameters:
+        sums (np.ndarray): Output of _distance_chunk summed over all sources.
+        sizes (np.ndarray): Number of nodes each node's closeness is normalized against.
+
+        Returns:
+        np.ndarray: Closeness of every node.
+        """
+        total_distance, reached = sums[0], sums[1] - 1
+        closeness = np.zeros(len(total_distance))
+        valid = (total_distance > 0) & (sizes > 1)
+        closeness[valid] = (reached[valid] / total_distance[valid]) * (reached[valid] / (sizes[valid] - 1))
+        return closeness
+
+    def _as_csr(self, G):
+        return G if isinstance(G, CSRGraph) else CSRGraph.from_networkx(G)
+
+    def betweenness_sums(self, graph, sources=None):
+        """
+        Returns the unnormalized Brandes dependencies accumulated over the given sources.
+
+        Parameters:
+        graph (CSRGraph): The graph to analyze.
+        sources (np.ndarray, optional): Integer ids of the sources, all nodes by default.
+
+        Returns:
+        np.ndarray: Summed dependency of every node.
+        """
+        return self._run(_betweenness_chunk, graph, sources)
+
+    def distance_sums(self, graph, sources=None):
+        """
+        Returns the distance sums accumulated over the given sources.
+
+        Parameters:
+        graph (CSRGraph): The graph to analyze.
+        sources (np.ndarray, optional): Integer ids of the sources, all nodes by default.
+
+        Returns:
+        np.ndarray: Array of shape (3, n) holding the sum of distances, the number of
+        sources reaching each node (itself included) and the sum of reciprocal distances.
+        """
+        return self._run(_distance_chunk, graph, sources)
+
+    def fused_sums(self, graph, sources=None):
+        """
+        Returns the dependencies and distance sums accumulated over the given sources in one pass.
+
+        Parameters:
+        graph (CSRGraph): The graph to analyze.
+        sources (np.ndarray, optional): Integer ids of the sources, all nodes by default.
+
+        Returns:
+        np.ndarray: Array of shape (4, n), the output of betweenness_sums followed by the
+        rows of distance_sums.
+        """
+        return self._run(_fused_chunk, graph, sources)
+
+    def _run(self, kernel, graph, sources=None):
+        """
+        Runs a kernel over the sources of the graph and adds up the partial results.
+
+        Parameters:
+        kernel (callable): Module-level function taking an array of source ids.
+        graph (CSRGraph): The graph to analyze.
+        sources (np.ndarray, optional): Integer ids of the sources, all nodes by default.
+
+        Returns:
+        np.ndarray: Sum of the kernel outputs over all source chunks.
+        """
+        if sources is None:
+            sources = np.arange(graph.number_of_nodes())
+        sources = np.asarray(sources, dtype=np.int64)
+        workers = self.max_workers
+        if multiprocessing.current_process().daemon:
+            # Daemonic processes, e.g. CentralityScheduler workers, cannot start a pool
+            workers = 1
+        workers = max(1, min(workers, len(sources)))
+        indptr, indices = graph.indptr, graph.indices
+
+        if workers == 1:
+            _init_worker(indptr, indices)
+            try:
+                return kernel(sources)
+            finally:
+                # The list copies of the adjacency are several times its size
+                _release_worker()
+
+        # Strided chunks spread the expensive and the cheap sources evenly
+        n_chunks = min(len(sources), workers * self.chunks_per_worker)
+        chunks = [sources[i::n_chunks] for i in range(n_chunks)]
+        with multiprocessing.get_context().Pool(workers, initializer=_init_worker,
+                                                initargs=(indptr, indices)) as pool:
+            return sum(pool.imap_unordered(kernel, chunks))
@@ -0,0 +1,311 @@
+import importlib
+import importlib.util
+import inspect
+
+# Cost classes from cheapest to most expensive, by how the running time grows with the graph
+COST_CLASSES = ('linear', 'iterative', 'quadratic', 'cubic')
+
+# Entry point group under which installed packages register their MetricSpec objects
+PLUGIN_GROUP = 'graph_analysis_tool.metrics'
+
+
+class MetricSpec:
+    """Class describing a centrality calculator without importing it.
+
+    The entry point names the calculator as 'module:attribute'. The attribute is either a
+    function taking the graph, or a method 'Class.method', in which case the class is
+    instantiated once per registry, with the options of the registry its constructor
+    accepts. The module, and the heavy
+    libraries it needs, are only imported when the calculator is first loaded.
+    """
+
+    def __init__(self, name, entry_point, provides=None, dependencies=(), cost='linear', default=True,
+                 description='', parallel=False, graph='networkx', version=1, options=()):
+        """
+        Parameters:
+        name (str): Name of the calculator.
+        entry_point (str): The calculator as 'module:function' or 'module:Class.method'.
+        provides (tuple, optional): Names of the metrics the calculator returns, as keys of a
+            dictionary; the calculator returns the values of the single metric name by default.
+        dependencies (tuple): Top-level modules the calculator needs, checked without importing them.
+        cost (str): Cost class of the calculator, one of COST_CLASSES.
+        default (bool): Whether the pipeline computes the metrics when none are selected.
+        description (str): One-line description of the metrics.
+        parallel (bool): Whether the calculator spreads its own work over worker processes, in
+            which case it runs in the main process with the whole process budget rather than
+            in a worker of CentralityScheduler, where it could not start processes.
+        graph (str): Type of graph the calculator takes, 'networkx' for a networkx.DiGraph, converted
+            from a CSRGraph on first use, or 'csr' for a calculator also accepting a CSRGraph.
+        version (int): Version of the results, to bump whenever a change of the calculator alters
+            them, so that the results cached by earlier versions are not reused.
+        options (tuple): Names of the registry options the results depend on, e.g.
+            current_flow_threshold.
+        """
+        if cost not in COST_CLASSES:
+            raise ValueError(f"Unknown cost class of {name}: {cost}")
+        if graph not in ('networkx', 'csr'):
+            raise ValueError(f"Unknown graph type of {name}: {graph}")
+        self.name = name
+        self.entry_point = entry_point
+        self.provides = tuple(provides) if provides else (name,)
+        self.dependencies = tuple(dependencies)
+        self.cost = cost
+        self.default = default
+        self.description = description
+        self.parallel = parallel
+        self.graph = graph
+        self.version = version
+        self.options = tuple(options)
+
+    def __repr__(self):
+        return f"MetricSpec({self.name!r}, {self.entry_point!r}, cost={self.cost!r})"
+
+    def missing_dependencies(self):
+        """
+        Returns the dependencies that are not installed, without importing any of them.
+
+        Returns:
+        list: Names of the missing modules.
+        """
+        return [module for module in self.dependencies if importlib.util.find_spec(module) is None]
+
+
+class _NetworkxCalculator:
+    """Class wrapping a calculator that takes a networkx graph so that it also accepts a CSRGraph."""
+
+    def __init__(self, function):
+        self.function = function
+
+    def __call__(self, G):
+        # CSRGraph caches its conversion, so the calculators of a process share a single copy
+        if hasattr(G, 'to_networkx'):
+            G = G.to_networkx()
+        return self.function(G)
+
+
+class MetricRegistry:
+    """Class to select centrality calculators by name or cost and load only the selected ones.
+
+    The built-in calculators of CentralityCalculator are registered from BUILTIN_METRICS;
+    installed packages add their own by exposing a MetricSpec under the PLUGIN_GROUP entry
+    point group. A calculator providing several metrics is selected by its own name or by
+    any of its metrics.
+    """
+
+    def __init__(self, specs=None, plugins=True, options=None):
+        """
+        Parameters:
+        specs (list, optional): The specs to register, BUILTIN_METRICS by default.
+        plugins (bool): Whether to also register the specs of installed plugins.
+        options (dict, optional): Keyword arguments of the calculator classes, e.g. max_workers or
+            current_flow_threshold of CentralityCalculator; each class receives those its
+            constructor accepts, and the cached results are keyed by those they depend on.
+        """
+        self.options = dict(options or {})
+        self.specs = {}
+        self._instances = {}
+        for spec in BUILTIN_METRICS if specs is None else specs:
+            self.register(spec)
+        if plugins:
+            self.load_plugins()
+
+    def register(self, spec):
+        """
+        Adds a calculator, replacing one of the same name.
+
+        Parameters:
+        spec (MetricSpec): The calculator to add.
+        """
+        self.specs[spec.name] = spec
+
+    def load_plugins(self):
+        """
+        Registers the specs exposed by installed packages under PLUGIN_GROUP.
+
+        Returns:
+        list: Names of the plugin entry points that could not be loaded, with the error.
+        """
+        from importlib.metadata import entry_points
+
+        failed = []
+        for entry_point in entry_points(group=PLUGIN_GROUP):
+            try:
+                spec = entry_point.load()
+                if not isinstance(spec, MetricSpec):
+                    raise TypeError(f"expected a MetricSpec, got {type(spec).__name__}")
+                self.register(spec)
+            except Exception as e:
+                failed.append((entry_point.name, str(e)))
+        return failed
+
+    def metric_names(self, specs=None):
+        """
+        Returns the names of the metrics provided by the calculators.
+
+        Parameters:
+        specs (list, optional): The calculators, all registered ones by default.
+
+        Returns:
+        list: The metric names, in registration order.
+        """
+        specs = self.specs.values() if specs is None else specs
+        return [metric for spec in specs for metric in spec.provides]
+
+    def select(self, names=None, max_cost=None):
+        """
+        Selects calculators by name and cost.
+
+        Parameters:
+        names (list, optional): Names of calculators or of the metrics they provide, the
+            default calculators if None.
+        max_cost (str, optional): Most expensive cost class to keep, all by default.
+
+        Returns:
+        list: The selected specs, in registration order.
+        """
+        if names is None:
+            selected = [spec for spec in self.specs.values() if spec.default]
+        else:
+            names = set(names)
+            known = set(self.specs) | set(self.metric_names())
+            unknown = sorted(names - known)
+            if unknown:
+                raise ValueError(f"Unknown metrics: {', '.join(unknown)}")
+            selected = [spec for spec in self.specs.values()
+                        if spec.name in names or names.intersection(spec.provides)]
+        if max_cost is not None:
+            selected = [spec for spec in selected if COST_CLASSES.index(spec.cost) <= COST_CLASSES.index(max_cost)]
+        return selected
+
+    def load(self, spec):
+        """
+        Imports the calculator of a spec.
+
+        Parameters:
+        spec (MetricSpec): The calculator to load.
+
+        Returns:
+        callable: Function taking the graph, a networkx.DiGraph or a CSRGraph.
+        """
+        missing = spec.missing_dependencies()
+        if missing:
+            raise ImportError(f"{spec.name} requires the missing modules {', '.join(missing)}")
+        module_name, _, attribute = spec.entry_point.partition(':')
+        target = importlib.import_module(module_name)
+        class_name, _, method = attribute.rpartition('.')
+        if not class_name:
+            function = getattr(target, method)
+        else:
+            key = (module_name, class_name)
+            if key not in self._instances:
+                cls = getattr(target, class_name)
+                self._instances[key] = cls(**self.constructor_options(cls))
+            function = getattr(self._instances[key], method)
+        return function if spec.graph == 'csr' else _NetworkxCalculator(function)
+
+    def constructor_options(self, cls):
+        """
+        Returns the options of the registry accepted by the constructor of a calculator class.
+
+        Parameters:
+        cls (type): The calculator class.
+
+        Returns:
+        dict: The keyword arguments to instantiate cls with.
+        """
+        parameters = inspect.signature(cls).parameters
+        if any(parameter.kind == parameter.VAR_KEYWORD for parameter in parameters.values()):
+            return dict(self.options)
+        return {name: value for name, value in self.options.items() if name in parameters}
+
+    def parallel_names(self, specs):
+        """
+        Returns the names, as used by calculators, of the specs that run their own worker processes.
+
+        Parameters:
+        specs (list): The selected calculators.
+
+        Returns:
+        set: Names of the parallel calculators, for CentralityScheduler.run.
+        """
+        return {spec.provides if len(spec.provides) > 1 else spec.provides[0] for spec in specs if spec.parallel}
+
+    def params(self, specs):
+        """
+        Returns the parameters the metrics of the specs are computed with, to key cached results.
+
+        Parameters:
+        specs (list): The selected calculators.
+
+        Returns:
+        dict: Dictionary of metric names with the version of their calculator and the values
+        of the registry options it depends on.
+        """
+        params = {}
+        for spec in specs:
+            spec_params = {'version': spec.version, **{name: self.options.get(name) for name in spec.options}}
+            params.update((metric, spec_params) for metric in spec.provides)
+        return params
+
+    def calculators(self, specs):
+        """
+        Loads the calculators of the specs in the form taken by CentralityScheduler.
+
+        Parameters:
+        specs (list): The calculators to load.
+
+        Returns:
+        list: List of (name, function) pairs; a calculator providing several metrics is
+        named by the tuple of their names.
+        """
+        return [(spec.provides if len(spec.provides) > 1 else spec.provides[0], self.load(spec)) for spec in specs]
+
+
+def _builtin(name, method, cost, provides=None, dependencies=('networkx', 'numpy', 'scipy'), default=True,
+             description='', parallel=False, version=1, options=()):
+    # The methods of CentralityCalculator take a CSRGraph and convert it themselves where they need networkx
+    return MetricSpec(name, f'centralities.calculator:CentralityCalculator.{method}', provides, dependencies,
+                      cost, default, description, parallel, graph='csr', version=version, options=options)
+
+
+# Calculators of CentralityCalculator, in the order the pipeline runs them
+BUILTIN_METRICS = [
+    _builtin('degree_centrality', 'calculate_degree_centrality', 'linear',
+             description='Share of the other nodes a node is linked to.'),
+    _builtin('in_degree_centrality', 'calculate_in_degree_centrality', 'linear',
+             description='Number of citations of a judgment.'),
+    _builtin('core_number', 'calculate_core_number', 'linear',
+             description='Largest k of a k-core containing the node.'),
+    _builtin('relative_in_degree_centrality', 'calculate_relative_in_degree_centrality', 'linear',
+             description='Number of citations divided by the number of nodes.'),
+    _builtin('eigenvector_centrality', 'calculate_eigenvector_centrality', 'iterative',
+             description='Leading eigenvector of the adjacency matrix.'),
+    _builtin('pagerank', 'calculate_pagerank', 'iterative',
+             description='Stationary distribution of a random surfer with teleportation.'),
+    _builtin('current_flow_betweenness_centrality', 'calculate_current_flow_betweenness_centrality', 'cubic',
+             description='Betweenness of the electrical current between all pairs of nodes.', parallel=True,
+             options=('current_flow_threshold',)),
+    _builtin('trophic_level', 'calculate_trophic_level', 'iterative',
+             description='Position of a judgment in the citation hierarchy.', options=('trophic_method',)),
+    _builtin('current_flow_closeness_centrality', 'calculate_current_flow_closeness_centrality', 'cubic',
+             description='Inverse of the mean effective resistance to the other nodes.', parallel=True,
+             options=('current_flow_threshold',)),
+    _builtin('out_degree_centrality', 'calculate_out_degree_centrality', 'linear',
+             description='Number of references of a judgment.'),
+    _builtin('hits', 'calculate_hits', 'iterative', provides=('hub_centrality', 'authority_centrality'),
+             description='Hub and authority scores of HITS.'),
+    _builtin('disruption', 'calculate_disruption', 'linear',
+             description='Whether the citations of a judgment bypass its references.'),
+    # Pivot sampling trades accuracy for a runtime bounded by the sample size
+    _builtin('approximate_betweenness_centrality', 'calculate_approximate_betweenness_values', 'iterative',
+             default=False, description='Betweenness estimated from a sample of BFS pivots.', parallel=True,
+             options=('approx_sample_size', 'approx_epsilon', 'approx_seed')),
+    _builtin('approximate_closeness_centrality', 'calculate_approximate_closeness_values', 'iterative',
+             default=False, description='Closeness estimated from a sample of BFS pivots.', parallel=True,
+             options=('approx_sample_size', 'approx_epsilon', 'approx_seed')),
+    # Betweenness, closeness, harmonic and forest closeness share one BFS per node
+    _builtin('distance_centralities', 'calculate_distance_centralities', 'quadratic',
+             provides=('betweenness_centrality', 'closeness_centrality', 'harmonic_centrality',
+                       'forest_closeness_centrality'),
+             description='Shortest-path centralities from one breadth-first search per node.', parallel=True),
+]
@@ -0,0 +1,231 @@
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from utils.instrumentation import Tracer, get_tracer, set_tracer
+
+# Graph and calculators of the current worker process, set once by _init_worker
+_worker_graph = None
+_worker_graph_path = None
+_worker_calculators = None
+_worker_timeout = None
+_worker_tracing = None
+
+# Seconds a pooled metric may run past its timeout before its worker is considered stuck
+GRACE_PERIOD = 30
+
+
+def _init_worker(G, calculators, timeout, tracing=None, graph_path=None):
+    global _worker_graph, _worker_graph_path, _worker_calculators, _worker_timeout, _worker_tracing
+    _worker_graph = G
+    _worker_graph_path = graph_path
+    _worker_calculators = dict(calculators)
+    _worker_timeout = timeout
+    _worker_tracing = tracing
+
+
+def _init_pool_worker(*args):
+    # Workers of a ProcessPoolExecutor are not daemonic; marking them keeps the calculators from
+    # starting processes of their own, as they check for daemonic processes
+    multiprocessing.current_process().daemon = True
+    _init_worker(*args)
+
+
+def _graph():
+    # A worker handed the path of a stored graph opens it on its first task, mapping the shared arrays
+    global _worker_graph
+    if _worker_graph is None and _worker_graph_path is not None:
+        from graph.storage import GraphStorage
+
+        _worker_graph = GraphStorage.read(_worker_graph_path)
+    # The graph is handed over as is, the calculators needing networkx convert it on first use
+    return _worker_graph
+
+
+def _raise_timeout(signum, frame):
+    raise TimeoutError(f"exceeded the timeout of {_worker_timeout} seconds")
+
+
+def _run_metric(name):
+    """
+    Runs one calculator on the worker graph, isolating its errors.
+
+    Parameters:
+    name (str or tuple): Name of the calculator to run.
+
+    Returns:
+    tuple: The name, the metric values (None on failure), the error message (None on
+    success), the elapsed time in seconds and the records of the spans traced meanwhile.
+    """
+    # A tracer per metric collects its span and those of its components, whatever the process
+    tracer = None
+    if _worker_tracing is not None:
+        settings, graph_size = _worker_tracing
+        tracer = Tracer(**settings)
+        previous_tracer = set_tracer(tracer)
+        span = tracer.begin(', '.join(name) if isinstance(name, tuple) else name, 'metric', **graph_size)
+    # The timeout relies on SIGALRM, which is not available on every platform
+    use_alarm = _worker_timeout is not None and hasattr(signal, 'SIGALRM')
+    if use_alarm:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, _worker_timeout)
+    start_time = time.time()
+    values, error = None, None
+    try:
+        values = _worker_calculators[name](_graph())
+    except Exception as e:
+        error = str(e)
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+    elapsed = time.time() - start_time
+    if tracer is None:
+        return name, values, error, elapsed, []
+    tracer.end(span, failed=error is not None)
+    set_tracer(previous_tracer)
+    return name, values, error, elapsed, tracer.records
+
+
+class CentralityScheduler:
+    """Class to run independent centrality calculators concurrently in a process pool."""
+
+    def __init__(self, max_workers=None, timeout=None, logger=None, tracer=None):
+        """
+        Parameters:
+        max_workers (int, optional): Number of worker processes, the number of CPUs by default.
+            With 1 the calculators run one after another in the current process.
+        timeout (float, optional): Maximum number of seconds a single metric may run.
+        logger (logging.Logger, optional): Logger used to report progress.
+        tracer (Tracer, optional): Tracer receiving a span per calculator, with the size of the
+            graph, the tracer of the process by default.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger(__name__)
+        self.tracer = tracer
+
+    def run(self, G, calculators, on_result=None, graph_path=None, parallel=()):
+        """
+        Runs the calculators on the graph.
+
+        The graph is handed to every worker once when the pool starts rather than
+        with every task. A calculator that fails or times out is logged and left out
+        of the results without affecting the others. When a worker process dies, e.g.
+        killed for running out of memory, or stays stuck past the timeout in code the
+        timeout cannot interrupt, the pool is stopped and the calculators it had not
+        finished are logged as failed. Parallel calculators, which start worker
+        processes of their own, run one after another in the current process once the
+        pool is done, each with the whole process budget.
+
+        Parameters:
+        G (networkx.DiGraph or CSRGraph): The graph to analyze. A CSRGraph is passed to the
+            calculators as is; only those needing networkx convert it, once per process.
+        calculators (list): List of (name, function) pairs, each function taking the graph.
+            A calculator computing several metrics at once is named by a tuple of metric
+            names and returns a dictionary keyed by those names.
+        on_result (callable, optional): Called with the name and values of every metric as soon as
+            its calculator finishes, e.g. to checkpoint it.
+        graph_path (str, optional): Directory of a copy of G stored with GraphStorage; the worker
+            processes then open it themselves instead of receiving G from this process.
+        parallel (iterable): Names of the calculators to run in the current process, see
+            MetricRegistry.parallel_names.
+
+        Returns:
+        dict: Dictionary of metric names with the calculator results as values, in the
+        order of calculators.
+        """
+        names = [name for name, _ in calculators]
+        results = {}
+        start_time = time.time()
+        tracer = self.tracer or get_tracer()
+        tracing = None
+        if tracer.enabled:
+            tracing = (tracer.settings(), {'nodes': G.number_of_nodes(), 'edges': G.number_of_edges()})
+
+        parallel = set(parallel)
+        pooled = [name for name in names if name not in parallel]
+        processes = min(self.max_workers, len(pooled))
+        if processes > 1:
+            initargs = (None if graph_path else G, calculators, self.timeout, tracing, graph_path)
+            self._collect(self._pooled(processes, pooled, initargs), results, start_time, tracer, on_result)
+        in_process = names if processes <= 1 else [name for name in names if name in parallel]
+        if in_process:
+            _init_worker(G, calculators, self.timeout, tracing)
+            try:
+                self._collect(map(_run_metric, in_process), results, start_time, tracer, on_result)
+            finally:
+                _init_worker(None, [], None)
+
+        measures = {}
+        for name in names:
+            if name not in results:
+                continue
+            if isinstance(name, tuple):
+                measures.update((metric, results[name][metric]) for metric in name)
+            else:
+                measures[name] = results[name]
+        return measures
+
+    def _pooled(self, processes, names, initargs):
+        """
+        Runs calculators in a process pool, yielding their outcomes as they finish.
+
+        Parameters:
+        processes (int): Number of worker processes.
+        names (list): Names of the calculators to run.
+        initargs (tuple): Arguments of _init_worker in every worker.
+
+        Returns:
+        generator: The outcomes in the form returned by _run_metric.
+        """
+        start_time = time.time()
+        executor = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context(),
+                                       initializer=_init_pool_worker, initargs=initargs)
+        futures = {executor.submit(_run_metric, name): name for name in names}
+        pending = set(futures)
+        # Every started metric ends within its timeout, so a timeout and a grace period without
+        # any metric finishing means the running ones are stuck
+        deadline = None if self.timeout is None else self.timeout + GRACE_PERIOD
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=deadline, return_when=FIRST_COMPLETED)
+                if not done:
+                    self._terminate(executor)
+                    for future in pending:
+                        yield (futures[future], None, f"no result within {deadline} seconds, worker stopped",
+                               time.time() - start_time, [])
+                    return
+                for future in done:
+                    try:
+                        yield future.result()
+                    except Exception as e:
+                        # A dead worker breaks the pool, failing every metric it had not returned yet
+                        yield futures[future], None, f"worker process failed: {e}", time.time() - start_time, []
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _terminate(executor):
+        if hasattr(executor, 'terminate_workers'):
+            executor.terminate_workers()
+            return
+        for process in list(executor._processes.values()):
+            process.terminate()
+
+    def _collect(self, outcomes, results, start_time, tracer, on_result):
+        for name, values, error, elapsed, records in outcomes:
+            tracer.extend(records)
+            label = ', '.join(name) if isinstance(name, tuple) else name
+            if error is not None:
+                self.logger.error(f"Failed to calculate {label}: {error}")
+                continue
+            results[name] = values
+            self.logger.info(f"Finished calculating {label} in {elapsed:.2f} seconds "
+                             f"(Elapsed time: {time.time() - start_time:.2f} seconds)")
+            if on_result is not None:
+                for metric in name if isinstance(name, tuple) else (name,):
+                    on_result(metric, values[metric] if isinstance(name, tuple) else values)
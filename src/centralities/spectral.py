@@ -0,0 +1,166 @@
+import networkx as nx
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import ArpackError, eigs, svds
+
+from graph.csr import CSRGraph
+
+
+class SpectralBackend:
+    """Class to run the eigenvector-based centralities on one shared sparse adjacency.
+
+    The adjacency is converted to a floating point CSR matrix once; eigenvector
+    centrality, PageRank and HITS all run on it. Every solver accepts a warm start,
+    a dictionary of nodes with the values of a previous run, which speeds up
+    convergence when the graph changed only slightly.
+    """
+
+    def __init__(self, G):
+        """
+        Parameters:
+        G (networkx.DiGraph or CSRGraph): The graph to analyze.
+        """
+        self.graph = G if isinstance(G, CSRGraph) else CSRGraph.from_networkx(G)
+        self.adjacency = self.graph.adjacency.astype(np.float64)
+        self._hits = None
+
+    def eigenvector_centrality(self, max_iter=None, tol=0, warm_start=None):
+        """
+        Calculates the eigenvector centrality with ARPACK, as nx.eigenvector_centrality_numpy.
+
+        ARPACK starts from the warm start or, by default, from a uniform vector, so the
+        result is reproducible even when the graph is not strongly connected and the
+        leading eigenvector is not unique.
+
+        Parameters:
+        max_iter (int, optional): Maximum number of Arnoldi update iterations.
+        tol (float): Relative accuracy of the eigenvalue, 0 for machine precision.
+        warm_start (dict, optional): Dictionary of nodes with the values of a previous run.
+
+        Returns:
+        dict: Dictionary of nodes with eigenvector centrality as values.
+        """
+        n = self.graph.number_of_nodes()
+        if n == 0:
+            return {}
+        if self.adjacency.nnz == 0:
+            return self.graph.to_dict(np.zeros(n))
+        if n < 3:
+            # ARPACK needs at least three nodes for one eigenvector
+            eigenvalues, eigenvectors = np.linalg.eig(self.adjacency.T.toarray())
+            eigenvector = eigenvectors[:, np.argmax(eigenvalues.real)]
+        else:
+            v0 = self._initial_vector(warm_start, fill=1.0 / np.sqrt(n))
+            try:
+                _, eigenvector = eigs(self.adjacency.T, k=1, which='LR', maxiter=max_iter, tol=tol, v0=v0)
+            except ArpackError:
+                if warm_start is None:
+                    raise
+                # The warm start can lie in the null space of A^T after new nodes were added
+                _, eigenvector = eigs(self.adjacency.T, k=1, which='LR', maxiter=max_iter, tol=tol,
+                                      v0=np.full(n, 1.0 / np.sqrt(n)))
+        largest = eigenvector.flatten().real
+        norm = np.sign(largest.sum()) * np.linalg.norm(largest)
+        return self.graph.to_dict(largest / norm)
+
+    def pagerank(self, alpha=0.85, max_iter=100, tol=1.0e-6, warm_start=None, warm_start_tol=1.0e-6):
+        """
+        Calculates the PageRank by power iteration, as nx.pagerank.
+
+        Parameters:
+        alpha (float): Damping parameter.
+        max_iter (int): Maximum number of iterations.
+        tol (float): Convergence tolerance, per node, on the l1 change between iterations.
+        warm_start (dict, optional): Dictionary of nodes with the values of a previous run.
+        warm_start_tol (float): Convergence tolerance on the total l1 change, used instead of tol
+            with a warm start. The per-node rule of networkx allows an l1 change of n * tol, which
+            a previous solution already meets, so it would stop after one iteration.
+
+        Returns:
+        tuple: Dictionary of nodes with PageRank as values, and a dictionary of convergence
+        diagnostics with the number of iterations and the l1 residual of every iteration.
+        """
+        n = self.graph.number_of_nodes()
+        if n == 0:
+            return {}, {'iterations': 0, 'residuals': []}
+        out_weight = np.asarray(self.adjacency.sum(axis=1)).ravel()
+        is_dangling = out_weight == 0
+        scale = np.divide(1.0, out_weight, out=np.zeros(n), where=~is_dangling)
+        transition = sparse.diags(scale) @ self.adjacency
+
+        p = np.repeat(1.0 / n, n)
+        x = self._initial_vector(warm_start, fill=1.0 / n)
+        x = x / x.sum()
+        threshold = warm_start_tol if warm_start else n * tol
+        residuals = []
+        for iteration in range(1, max_iter + 1):
+            x_last = x
+            x = alpha * (x @ transition + x[is_dangling].sum() * p) + (1 - alpha) * p
+            residuals.append(float(np.absolute(x - x_last).sum()))
+            if residuals[-1] < threshold:
+                return self.graph.to_dict(x), {'iterations': iteration, 'residuals': residuals}
+        raise nx.PowerIterationFailedConvergence(max_iter)
+
+    def hits(self, max_iter=100, tol=1.0e-8, warm_start=None):
+        """
+        Calculates the hub and authority scores in a single pass, as nx.hits.
+
+        The result is cached, so asking for hubs and authorities separately only runs
+        the decomposition once.
+
+        Parameters:
+        max_iter (int): Maximum number of Arnoldi update iterations.
+        tol (float): Tolerance for the singular values.
+        warm_start (dict, optional): Dictionary of nodes with the authority values of a previous run.
+
+        Returns:
+        tuple: Two dictionaries of nodes with the hub and the authority scores as values.
+        """
+        if self._hits is not None and warm_start is None:
+            return self._hits
+        n = self.graph.number_of_nodes()
+        if n == 0:
+            return {}, {}
+        if self.adjacency.nnz == 0:
+            # Without citations there are neither hubs nor authorities
+            self._hits = (self.graph.to_dict(np.zeros(n)), self.graph.to_dict(np.zeros(n)))
+            return self._hits
+        if n < 2:
+            # svds needs at least two nodes for one singular vector
+            _, _, vt = np.linalg.svd(self.adjacency.toarray())
+            vt = vt[:1]
+        else:
+            v0 = self._initial_vector(warm_start, fill=1.0 / n)
+            try:
+                _, _, vt = svds(self.adjacency, k=1, v0=v0, maxiter=max_iter, tol=tol)
+            except ArpackError:
+                if warm_start is None:
+                    raise
+                # The warm start can lie in the null space of A^T A after new nodes were added
+                _, _, vt = svds(self.adjacency, k=1, v0=np.full(n, 1.0 / n), maxiter=max_iter, tol=tol)
+        # With a repeated leading singular value the vector may mix signs across components
+        authorities = np.abs(vt.flatten().real)
+        hubs = self.adjacency @ authorities
+        hubs = hubs / hubs.sum() if hubs.any() else hubs
+        authorities = authorities / authorities.sum() if authorities.any() else authorities
+        self._hits = (self.graph.to_dict(hubs), self.graph.to_dict(authorities))
+        return self._hits
+
+    def _initial_vector(self, warm_start, fill):
+        """
+        Aligns a warm start with the nodes of the graph.
+
+        Parameters:
+        warm_start (dict or None): Dictionary of nodes with the values of a previous run.
+        fill (float): Value of the nodes missing from the warm start, and of every node
+            without a warm start.
+
+        Returns:
+        np.ndarray: Starting vector of the solver.
+        """
+        n = self.graph.number_of_nodes()
+        if not warm_start:
+            return np.full(n, fill)
+        x = np.array([warm_start.get(node, fill) for node in self.graph.node_ids], dtype=np.float64)
+        x = np.nan_to_num(np.abs(x), nan=fill)
+        return x if x.any() else np.full(n, fill)
@@ -0,0 +1,171 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from centralities.incremental import IncrementalCentralities
+from graph.csr import CSRGraph
+
+# Format of the judgment dates in the HUDOC metadata, e.g. 26/01/2000 00:00:00
+DATE_FORMAT = '%d/%m/%Y %H:%M:%S'
+
+
+class SnapshotEngine:
+    """Class to compute the centralities of the citation graph as of a series of dates.
+
+    Nodes are sorted by date once and every edge is dated by the later of its two
+    endpoints, the moment both judgments exist. The sweep then moves forward through
+    the cutoffs, feeding each snapshot only the nodes and edges dated since the
+    previous one into an IncrementalCentralities state, so degree counts accumulate,
+    the iterative solvers start from the previous snapshot and only the affected
+    shortest-path sources are searched again.
+
+    Dates are parsed with an explicit format, as a day-first date such as 01/02/2011
+    is otherwise read month-first. A date that does not match the format raises an
+    error. Nodes without a date cannot be placed in time and are left out, together
+    with their edges, with a warning giving their number.
+    """
+
+    def __init__(self, date_col='judgementdate', id_col='ecli', source_col='source', target_col='target',
+                 max_workers=1, max_affected_fraction=0.2, date_format=DATE_FORMAT):
+        """
+        Parameters:
+        date_col (str): The column of the nodes DataFrame holding the judgment dates.
+        id_col (str): The column of the nodes DataFrame holding the node identifiers.
+        source_col (str): The column name for sources in the edges DataFrame.
+        target_col (str): The column name for targets in the edges DataFrame.
+        max_workers (int): Number of processes used by the shortest-path and current-flow engines.
+        max_affected_fraction (float): Largest fraction of BFS sources that is updated incrementally.
+        date_format (str): The strftime format of the dates, 'ISO8601' for ISO dates.
+        """
+        self.date_col = date_col
+        self.id_col = id_col
+        self.source_col = source_col
+        self.target_col = target_col
+        self.max_workers = max_workers
+        self.max_affected_fraction = max_affected_fraction
+        self.date_format = date_format
+
+    def parse_dates(self, nodes_df):
+        """
+        Parses the judgment dates of the nodes.
+
+        Parameters:
+        nodes_df (pd.DataFrame): DataFrame containing node data.
+
+        Returns:
+        pd.Series: The dates, NaT for the nodes without a date. A ValueError is raised when
+        a date does not match date_format.
+        """
+        values = nodes_df[self.date_col]
+        dates = pd.to_datetime(values, format=self.date_format, errors='coerce')
+        present = values.notna() & (values.astype(str).str.strip() != '')
+        invalid = dates.isna() & present
+        if invalid.any():
+            examples = ', '.join(repr(value) for value in values[invalid].unique()[:3])
+            raise ValueError(f"{int(invalid.sum())} values of {self.date_col} do not match the format "
+                             f"{self.date_format!r}, e.g. {examples}")
+        missing = int(dates.isna().sum())
+        if missing:
+            warnings.warn(f"{missing} nodes without {self.date_col} are left out of the snapshots", stacklevel=3)
+        return dates
+
+    def yearly_cutoffs(self, nodes_df=None, dates=None):
+        """
+        Returns the last day of every year from the earliest to the latest judgment.
+
+        Parameters:
+        nodes_df (pd.DataFrame, optional): DataFrame containing node data.
+        dates (pd.Series, optional): The dates returned by parse_dates, instead of nodes_df.
+
+        Returns:
+        pd.DatetimeIndex: The cutoff dates.
+        """
+        dates = (self.parse_dates(nodes_df) if dates is None else dates).dropna()
+        if dates.empty:
+            return pd.DatetimeIndex([])
+        return pd.to_datetime([f'{year}-12-31' for year in range(dates.min().year, dates.max().year + 1)])
+
+    def run(self, nodes_df, edges_df, cutoffs=None, metrics=None):
+        """
+        Computes the centralities of every snapshot.
+
+        Parameters:
+        nodes_df (pd.DataFrame): DataFrame containing node data.
+        edges_df (pd.DataFrame): DataFrame containing edge data.
+        cutoffs (array-like, optional): Dates of the snapshots, every year end by default. A
+            snapshot holds the judgments dated up to and including its cutoff.
+        metrics (list, optional): Metrics to keep in the output, all by default.
+
+        Returns:
+        pd.DataFrame: Long-format table with one row per snapshot, node and metric and the
+        columns 'snapshot', id_col, 'metric' and 'value'. The identifier and metric columns
+        are categorical.
+        """
+        dates = self.parse_dates(nodes_df)
+        cutoffs = self.yearly_cutoffs(dates=dates) if cutoffs is None else pd.DatetimeIndex(pd.to_datetime(cutoffs))
+        cutoffs = cutoffs.sort_values()
+
+        # Sort the nodes and the edges by date once
+        nodes = pd.DataFrame({'id': nodes_df[self.id_col].to_numpy(), 'date': dates.to_numpy()})
+        nodes = nodes.dropna(subset=['date']).drop_duplicates('id').sort_values('date', kind='stable')
+        node_ids = pd.Index(nodes['id'])
+        node_dates = nodes['date'].to_numpy()
+
+        sources = node_ids.get_indexer(edges_df[self.source_col].to_numpy())
+        targets = node_ids.get_indexer(edges_df[self.target_col].to_numpy())
+        valid = (sources >= 0) & (targets >= 0) & (sources != targets)
+        sources, targets = sources[valid], targets[valid]
+        # Nodes are in date order, so the later endpoint has the larger id
+        edge_order = np.argsort(np.maximum(sources, targets), kind='stable')
+        sources, targets = sources[edge_order], targets[edge_order]
+        edge_nodes = np.maximum(sources, targets)
+
+        state = IncrementalCentralities(self.max_workers, self.max_affected_fraction)
+        categories = pd.CategoricalDtype(node_ids)
+        tables = []
+        n_seen, m_seen = 0, 0
+        for cutoff in cutoffs:
+            n_now = int(np.searchsorted(node_dates, np.datetime64(cutoff), side='right'))
+            if n_now == 0:
+                continue
+            m_now = int(np.searchsorted(edge_nodes, n_now))
+            if state.graph is None:
+                state.initialize(CSRGraph.from_codes(node_ids[:n_now], sources[:m_now], targets[:m_now]))
+            elif n_now > n_seen:
+                state.update(node_ids[n_seen:n_now], node_ids[sources[m_seen:m_now]],
+                             node_ids[targets[m_seen:m_now]])
+            n_seen, m_seen = n_now, m_now
+            tables.append(self._snapshot_table(cutoff, state, categories, metrics))
+
+        if not tables:
+            return pd.DataFrame({'snapshot': pd.Series(dtype='datetime64[ns]'),
+                                 self.id_col: pd.Series(dtype=categories),
+                                 'metric': pd.Series(dtype='category'), 'value': pd.Series(dtype=np.float64)})
+        table = pd.concat(tables, ignore_index=True)
+        table['metric'] = table['metric'].astype('category')
+        return table
+
+    def _snapshot_table(self, cutoff, state, categories, metrics):
+        """
+        Turns the metric values of one snapshot into long-format rows.
+
+        Parameters:
+        cutoff (pd.Timestamp): Date of the snapshot.
+        state (IncrementalCentralities): The state after the snapshot.
+        categories (pd.CategoricalDtype): Categorical type of the node identifiers.
+        metrics (list or None): Metrics to keep, all when None.
+
+        Returns:
+        pd.DataFrame: The rows of the snapshot.
+        """
+        names = [name for name in state.values if metrics is None or name in metrics]
+        n = state.graph.number_of_nodes()
+        ids = pd.Categorical(state.graph.node_ids, dtype=categories)
+        return pd.DataFrame({
+            'snapshot': np.full(n * len(names), np.datetime64(cutoff, 'ns')),
+            self.id_col: pd.Categorical.from_codes(np.tile(ids.codes, len(names)), dtype=categories),
+            'metric': np.repeat(names, n),
+            'value': np.concatenate([np.asarray(state.values[name], dtype=np.float64) for name in names])
+            if names else np.empty(0),
+        })
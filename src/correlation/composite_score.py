@@ -14,3 +14,24 @@ class CompositeScoreCalculator:
         """
         data_df['composite_score'] = data_df[measures].mean(axis=1)
         return data_df
+
+    def create_weighted_composite_score(self, data_df, measures, weights, column='composite_score'):
+        """
+        Creates a composite score as a weighted sum of rank-normalized centrality measures, as
+        found by CompositeSearch. A negative weight counts the measure in reverse rank order.
+
+        Parameters:
+        data_df (pd.DataFrame): DataFrame containing centrality measures.
+        measures (list): List of columns representing centrality measures.
+        weights (list): Weight of every measure.
+        column (str): Name of the composite score column.
+
+        Returns:
+        pd.DataFrame: DataFrame with an added composite score column.
+        """
+        ranks = data_df[list(measures)].rank(pct=True).fillna(0.5)
+        score = 0
+        for measure, weight in zip(measures, weights):
+            score = score + (weight * ranks[measure] if weight >= 0 else -weight * (1.0 - ranks[measure]))
+        data_df[column] = score
+        return data_df
@@ -0,0 +1,226 @@
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from correlation.kendall import KendallCorrelation
+
+
+class CompositeSearch:
+    """Class to search the weighted combinations of centralities that best track a ground truth.
+
+    Every centrality is rank-normalized once and standardized, which turns the screening
+    score of a composite into closed-form algebra on two precomputed quantities: the
+    vector c of rank correlations of the centralities with the ground truth and their
+    correlation matrix S. A composite with weights w has the rank correlation
+    w.c / sqrt(w S w), so all candidates of a batch of subsets are scored by a few matrix
+    products.
+
+    Centralities are oriented by the sign of their correlation and combined with
+    positive weights from a grid on the simplex, plus the least-squares weights inv(S) c
+    of the subset when these are positive. No weighting of a subset can exceed its
+    multiple correlation sqrt(c inv(S) c), so subsets are visited in decreasing order of
+    that bound and the search stops once the bound falls below the candidates kept so
+    far. Every subset is kept with its best weighting only, so the leaderboard lists
+    distinct subsets rather than weight variants of one. The best candidates are finally
+    rescored with Kendall's tau-b against the ground truth itself.
+    """
+
+    def __init__(self, max_size=3, weight_steps=10, top=20, rescore=100, batch_size=4096, max_workers=1):
+        """
+        Parameters:
+        max_size (int): Largest number of centralities in a composite.
+        weight_steps (int): Resolution of the weight grid; weights are multiples of 1 / weight_steps.
+        top (int): Number of composites in the leaderboard of every ground truth.
+        rescore (int): Number of best screened composites rescored with Kendall's tau-b.
+        batch_size (int): Number of subsets scored at once.
+        max_workers (int, optional): Number of processes of the Kendall rescoring, the number of CPUs if None.
+        """
+        self.max_size = max_size
+        self.weight_steps = weight_steps
+        self.top = top
+        self.rescore = max(rescore, top)
+        self.batch_size = batch_size
+        self.kendall = KendallCorrelation(max_workers=max_workers)
+
+    def leaderboard(self, data_df, centrality_columns, ground_truths):
+        """
+        Ranks the composites of the centralities against every ground truth.
+
+        Parameters:
+        data_df (pd.DataFrame): The data frame containing the centralities and ground truths.
+        centrality_columns (list): Columns of the centralities to combine.
+        ground_truths (list): Columns of the ground truths.
+
+        Returns:
+        pd.DataFrame: One row per composite with the columns 'ground_truth', 'rank', 'size',
+        'measures', 'weights', 'kendall_tau', 'screening_score' and 'bound', best composites
+        first within every ground truth. The weights sum to 1 in absolute value and carry the
+        direction of every centrality.
+        """
+        centrality_columns = list(centrality_columns)
+        tables = [self._ground_truth_leaderboard(data_df, centrality_columns, ground_truth)
+                  for ground_truth in ground_truths]
+        return pd.concat(tables, ignore_index=True)
+
+    def _ground_truth_leaderboard(self, data_df, centrality_columns, ground_truth):
+        truth = pd.to_numeric(data_df[ground_truth], errors='coerce')
+        rows = truth.notna().to_numpy()
+        ranks = self.rank_normalize(data_df.loc[rows, centrality_columns])
+        truth = truth[rows].rank(pct=True).to_numpy()
+
+        # Constant centralities carry no information and make S singular
+        spread = ranks.std(axis=0)
+        usable = np.flatnonzero(spread > 0)
+        if not len(usable) or truth.std() == 0:
+            return self._table(ground_truth, [])
+        standardized = (ranks[:, usable] - ranks[:, usable].mean(axis=0)) / spread[usable]
+        standardized_truth = (truth - truth.mean()) / truth.std()
+        n = len(truth)
+        correlations = standardized.T @ standardized_truth / n
+        orientation = np.where(correlations < 0, -1.0, 1.0)
+        # Oriented columns all correlate non-negatively with the ground truth
+        c = correlations * orientation
+        S = (standardized.T @ standardized / n) * np.outer(orientation, orientation)
+
+        candidates = self._search(c, S)
+        best = sorted(candidates, key=lambda candidate: -candidate[2])[:self.rescore]
+        oriented = np.where(orientation < 0, 1.0 - ranks[:, usable], ranks[:, usable])
+        # Rounding keeps ties of the ranks tied in the weighted sums
+        composites = pd.DataFrame({k: np.round(oriented[:, subset] @ weights, 12)
+                                   for k, (subset, weights, _, _) in enumerate(best)})
+        composites['truth'] = truth
+        taus = self.kendall.correlations_with(composites, list(range(len(best))), 'truth').to_numpy()[:-1]
+
+        order = sorted(range(len(best)), key=lambda k: -np.nan_to_num(taus[k], nan=-np.inf))[:self.top]
+        entries = []
+        for k in order:
+            subset, weights, score, bound = best[k]
+            # Plain Python numbers, which the Excel export and the run directory write as numbers
+            entries.append((tuple(str(centrality_columns[usable[i]]) for i in subset),
+                            tuple(np.round(weights * orientation[subset], 6).tolist()), float(taus[k]),
+                            float(score), float(bound)))
+        return self._table(ground_truth, entries)
+
+    def _search(self, c, S):
+        """
+        Scores the composites of every subset of up to max_size centralities, visiting the
+        subsets in decreasing order of their bound and stopping when the bound cannot beat
+        the kept candidates.
+
+        Parameters:
+        c (np.ndarray): Oriented rank correlations of the centralities with the ground truth.
+        S (np.ndarray): Oriented rank correlation matrix of the centralities.
+
+        Returns:
+        list: Tuples of subset indices, weights, screening score and bound, one per subset
+        with the weights of its best screening score.
+        """
+        candidates = []
+        kept_scores = np.empty(0)
+        for size in range(1, min(self.max_size, len(c)) + 1):
+            subsets = np.array(list(combinations(range(len(c)), size)), dtype=np.int64)
+            c_sub = c[subsets]
+            S_sub = S[subsets[:, :, None], subsets[:, None, :]]
+            # Least-squares weights and the multiple correlation they reach
+            optimal = np.einsum('mij,mj->mi', np.linalg.pinv(S_sub, hermitian=True), c_sub)
+            bounds = np.sqrt(np.clip(np.einsum('mi,mi->m', optimal, c_sub), 0, None))
+            order = np.argsort(-bounds, kind='stable')
+            grid = self._weight_grid(size)
+
+            for start in range(0, len(order), self.batch_size):
+                chunk = order[start:start + self.batch_size]
+                threshold = kept_scores.min() if len(kept_scores) >= self.rescore else -np.inf
+                chunk = chunk[bounds[chunk] > threshold]
+                if not len(chunk):
+                    # The remaining subsets have even lower bounds
+                    break
+                weights = np.broadcast_to(grid, (len(chunk),) + grid.shape)
+                positive = np.all(optimal[chunk] > 0, axis=1)
+                if size > 1 and positive.any():
+                    least_squares = np.where(positive[:, None], optimal[chunk], 1.0)
+                    least_squares = least_squares / least_squares.sum(axis=1, keepdims=True)
+                    weights = np.concatenate([weights, least_squares[:, None, :]], axis=1)
+                scores = self._scores(weights, c_sub[chunk], S_sub[chunk])
+                if weights.shape[1] > len(grid):
+                    # Only subsets with positive least-squares weights have that extra candidate
+                    scores[~positive, -1] = -np.inf
+
+                # Keep the best weighting of the subsets that can enter the rescored set
+                best_weighting = scores.argmax(axis=1)
+                best_scores = scores[np.arange(len(chunk)), best_weighting]
+                kept = np.argsort(-best_scores, kind='stable')[:self.rescore]
+                for m in kept:
+                    candidates.append((subsets[chunk[m]], weights[m, best_weighting[m]], float(best_scores[m]),
+                                       float(bounds[chunk[m]])))
+                kept_scores = np.sort(np.concatenate([kept_scores, best_scores[kept]]))[::-1][:self.rescore]
+        return candidates
+
+    def _scores(self, weights, c_sub, S_sub):
+        """
+        Computes the rank correlation of weighted composites with the ground truth.
+
+        Parameters:
+        weights (np.ndarray): Array of shape (subsets, candidates, size) of weights.
+        c_sub (np.ndarray): Array of shape (subsets, size) of correlations with the ground truth.
+        S_sub (np.ndarray): Array of shape (subsets, size, size) of correlation matrices.
+
+        Returns:
+        np.ndarray: Array of shape (subsets, candidates) of correlations.
+        """
+        numerator = np.einsum('mgi,mi->mg', weights, c_sub)
+        variance = np.einsum('mgi,mij,mgj->mg', weights, S_sub, weights)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = numerator / np.sqrt(variance)
+        return np.where(variance > 0, scores, -np.inf)
+
+    def _weight_grid(self, size):
+        """
+        Returns the weights on the simplex that are positive multiples of 1 / weight_steps.
+
+        Parameters:
+        size (int): Number of weights.
+
+        Returns:
+        np.ndarray: Array of shape (candidates, size) of weights summing to 1; the equal
+        weighting comes first when weight_steps does not allow it exactly.
+        """
+        if size == 1:
+            return np.ones((1, 1))
+        steps = max(self.weight_steps, size)
+        # Compositions of steps into size positive parts, from the positions of size - 1 cuts
+        cuts = np.array(list(combinations(range(1, steps), size - 1)), dtype=np.int64)
+        parts = np.diff(np.column_stack([np.zeros(len(cuts), dtype=np.int64), cuts,
+                                         np.full(len(cuts), steps)]), axis=1)
+        grid = parts / steps
+        equal = np.full((1, size), 1.0 / size)
+        if not np.any(np.all(np.isclose(grid, equal), axis=1)):
+            grid = np.vstack([equal, grid])
+        return grid
+
+    def rank_normalize(self, data_df):
+        """
+        Replaces every column by its average ranks scaled to (0, 1]; missing values get the
+        middle rank, so they do not move a composite either way.
+
+        Parameters:
+        data_df (pd.DataFrame): Columns to normalize.
+
+        Returns:
+        np.ndarray: Array of shape (rows, columns) of normalized ranks.
+        """
+        ranks = data_df.apply(pd.to_numeric, errors='coerce').rank(pct=True)
+        return ranks.fillna(0.5).to_numpy(dtype=np.float64)
+
+    def _table(self, ground_truth, entries):
+        measures, weights, taus, scores, bounds = zip(*entries) if entries else ([], [], [], [], [])
+        return pd.DataFrame({
+            'ground_truth': ground_truth,
+            'rank': np.arange(1, len(entries) + 1),
+            'size': [len(m) for m in measures],
+            'measures': list(measures),
+            'weights': list(weights),
+            'kendall_tau': np.asarray(taus, dtype=np.float64),
+            'screening_score': np.asarray(scores, dtype=np.float64),
+            'bound': np.asarray(bounds, dtype=np.float64),
+        })
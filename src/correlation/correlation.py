@@ -1,8 +1,24 @@
 import pandas as pd
 
+from correlation.kendall import KendallCorrelation
+
 class CorrelationAnalyzer:
     """Class to perform correlation analysis."""
 
+    def __init__(self, max_workers=1, n_resamples=0, confidence_level=0.95, seed=None):
+        """
+        Parameters:
+        max_workers (int, optional): Number of processes sharing the column pairs, the number of CPUs if None.
+        n_resamples (int): Number of bootstrap resamples and permutations of the ground truth
+            correlations; 0 reports the point estimates only.
+        confidence_level (float): Coverage of the bootstrap confidence intervals.
+        seed (int, optional): Seed of the resamples, for reproducible intervals and p-values.
+        """
+        self.kendall = KendallCorrelation(max_workers=max_workers)
+        self.n_resamples = n_resamples
+        self.confidence_level = confidence_level
+        self.seed = seed
+
     def compute_correlations(self, data_df, columns):
         """
         Computes Kendall correlation matrix for specified columns in the DataFrame.
@@ -14,7 +30,7 @@ class CorrelationAnalyzer:
         Returns:
         pd.DataFrame: Correlation matrix.
         """
-        return data_df[columns].corr(method='kendall')
+        return self.kendall.matrix(data_df, columns)
     
     def compute_importance_correlations(self, data_df, centrality_columns):
         """
@@ -25,9 +41,10 @@ class CorrelationAnalyzer:
         centrality_columns (list): List of centrality columns.
 
         Returns:
-        pd.Series: Correlation values.
+        pd.Series or pd.DataFrame: Correlation values, or in resampling mode the table of
+        compute_resampled_correlations.
         """
-        return data_df[centrality_columns + ['importance']].corr(method='kendall')['importance']
+        return self._correlations_with(data_df, centrality_columns, 'importance')
 
     def compute_court_branch_correlations(self, data_df, centrality_columns):
         """
@@ -38,7 +55,46 @@ class CorrelationAnalyzer:
         centrality_columns (list): List of centrality columns.
 
         Returns:
-        pd.Series: Correlation values.
+        pd.Series or pd.DataFrame: Correlation values, or in resampling mode the table of
+        compute_resampled_correlations.
+        """
+        data_df = data_df.assign(court_branch_numeric=self.encode_court_branch(data_df['court_branch']))
+        return self._correlations_with(data_df, centrality_columns, 'court_branch_numeric')
+
+    @staticmethod
+    def encode_court_branch(court_branch):
+        """
+        Encodes the court branches as integer codes, in order of first appearance.
+
+        Parameters:
+        court_branch (pd.Series): The court branch of every judgment.
+
+        Returns:
+        pd.Series: The codes, NaN where the court branch is missing.
+        """
+        codes = pd.factorize(court_branch)[0].astype(float)
+        codes[codes < 0] = float('nan')
+        return pd.Series(codes, index=court_branch.index)
+
+    def compute_resampled_correlations(self, data_df, centrality_columns, ground_truth, n_resamples=None):
+        """
+        Computes the correlation between a ground truth column and centrality measures, with
+        bootstrap confidence intervals and permutation p-values.
+
+        Parameters:
+        data_df (pd.DataFrame): The data frame containing the data.
+        centrality_columns (list): List of centrality columns.
+        ground_truth (str): The ground truth column.
+        n_resamples (int, optional): Number of resamples, n_resamples of the analyzer by default.
+
+        Returns:
+        pd.DataFrame: Columns 'tau', 'ci_low', 'ci_high' and 'p_value', indexed by centrality.
         """
-        data_df['court_branch_numeric'] = pd.factorize(data_df['court_branch'])[0]
-        return data_df[centrality_columns + ['court_branch_numeric']].corr(method='kendall')['court_branch_numeric']
+        return self.kendall.resampled_correlations_with(
+            data_df, centrality_columns, ground_truth, n_resamples=n_resamples or self.n_resamples or 1000,
+            confidence_level=self.confidence_level, seed=self.seed)
+
+    def _correlations_with(self, data_df, centrality_columns, ground_truth):
+        if self.n_resamples:
+            return self.compute_resampled_correlations(data_df, centrality_columns, ground_truth)
+        return self.kendall.correlations_with(data_df, centrality_columns, ground_truth)
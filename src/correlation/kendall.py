@@ -0,0 +1,474 @@
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+
+# Dense ranks and missing-value masks of the current worker process, set once by _init_worker
+_worker_ranks = None
+_worker_missing = None
+
+# Largest number of levels, invalid entries included, of the variable whose discordant pairs
+# _tau_b_rows counts level by level; past it scipy's merge sort is faster
+LEVEL_COUNTING_LIMIT = 12
+
+
+def _init_worker(ranks, missing):
+    global _worker_ranks, _worker_missing
+    _worker_ranks = ranks
+    _worker_missing = missing
+
+
+def _count_inversions(values, n_values):
+    """
+    Counts the pairs i < j with values[i] > values[j] by a bottom-up merge sort.
+
+    All merges of one level run as a single row-wise sort: every pair of adjacent
+    sorted blocks becomes one row, with the right block's entries tagged by the low
+    bit so that equal values keep the left entries first. The merged position of the
+    right entries then tells how many left entries are not greater than each of them.
+
+    Parameters:
+    values (np.ndarray): Non-negative integers, or a 2D array whose rows are counted separately.
+    n_values (int): Upper bound (exclusive) of the values.
+
+    Returns:
+    int or np.ndarray: Number of inversions, per row for a 2D array.
+    """
+    rows_in = np.atleast_2d(values)
+    batch, n = rows_in.shape
+    size = 1 << max(0, (n - 1).bit_length())
+    dtype = np.int32 if 2 * n_values + 1 < np.iinfo(np.int32).max else np.int64
+    # Padding with a value above all others adds no inversions
+    current = np.full((batch, size), n_values, dtype=dtype)
+    current[:, :n] = rows_in
+    inversions = np.zeros(batch, dtype=np.int64)
+    width = 1
+    while width < size:
+        rows = size // (2 * width)
+        keys = current.reshape(batch, rows, 2, width) << 1
+        keys[:, :, 1, :] |= 1
+        merged = np.sort(keys.reshape(batch, rows, 2 * width), axis=-1)
+        right_positions = (merged & 1).sum(axis=1, dtype=np.int64) @ np.arange(2 * width)
+        left_not_greater = right_positions - rows * (width * (width - 1) // 2)
+        inversions += rows * width * width - left_not_greater
+        current = (merged >> 1).reshape(batch, size)
+        width *= 2
+    return int(inversions[0]) if np.ndim(values) == 1 else inversions
+
+
+def _tied_pairs(ranks, n_values):
+    counts = np.bincount(ranks, minlength=n_values).astype(np.int64)
+    return int((counts * (counts - 1) // 2).sum())
+
+
+def _tied_pairs_rows(sorted_rows):
+    """
+    Counts the tied pairs of every row of a row-wise sorted array.
+
+    Parameters:
+    sorted_rows (np.ndarray): 2D array with every row sorted.
+
+    Returns:
+    np.ndarray: Number of pairs of equal entries per row.
+    """
+    batch, n = sorted_rows.shape
+    positions = np.arange(n)
+    # Every entry is tied with the entries between the start of its run and itself
+    run_starts = np.zeros((batch, n), dtype=np.int64)
+    run_starts[:, 1:] = np.where(sorted_rows[:, 1:] != sorted_rows[:, :-1], positions[1:], 0)
+    np.maximum.accumulate(run_starts, axis=1, out=run_starts)
+    return (positions - run_starts).sum(axis=1)
+
+
+def _tau_b(x, y):
+    """
+    Computes Kendall's tau-b of two rank arrays with Knight's algorithm.
+
+    Parameters:
+    x (np.ndarray): Dense integer ranks of the first variable.
+    y (np.ndarray): Dense integer ranks of the second variable.
+
+    Returns:
+    float: Kendall's tau-b, NaN when either variable is constant or there are fewer
+    than two observations.
+    """
+    n = len(x)
+    if n < 2:
+        return np.nan
+    x_values, y_values = int(x.max()) + 1, int(y.max()) + 1
+    # Sorting on (x, y) leaves y in the order whose inversions are the discordant pairs
+    keys = np.sort(x.astype(np.int64) * y_values + y)
+    discordant = _count_inversions(keys % y_values, y_values)
+
+    total = n * (n - 1) // 2
+    x_ties = _tied_pairs(x, x_values)
+    y_ties = _tied_pairs(y, y_values)
+    # Runs of equal keys are the pairs tied on both variables
+    joint_counts = np.diff(np.flatnonzero(np.r_[True, keys[1:] != keys[:-1], True]))
+    joint_ties = int((joint_counts * (joint_counts - 1) // 2).sum())
+    if x_ties == total or y_ties == total:
+        return np.nan
+    concordant_minus_discordant = total - x_ties - y_ties + joint_ties - 2 * discordant
+    return concordant_minus_discordant / np.sqrt(float(total - x_ties)) / np.sqrt(float(total - y_ties))
+
+
+def _pair_tau(i, j, ranks, missing, min_periods):
+    valid = ~(missing[i] | missing[j])
+    n_valid = int(valid.sum())
+    if n_valid < min_periods:
+        return np.nan
+    if i == j:
+        return 1.0
+    if n_valid == len(valid):
+        return _tau_b(ranks[i], ranks[j])
+    return _tau_b(ranks[i][valid], ranks[j][valid])
+
+
+def _count_inversions_by_level(values, n_values):
+    """
+    Counts the pairs i < j with values[i] > values[j] of every row, one value at a time.
+
+    For every value v, the entries equal to v are preceded by a running count of the
+    entries above v; this takes O(n) per value, so it beats the merge sort of
+    _count_inversions for values with a handful of levels.
+
+    Parameters:
+    values (np.ndarray): 2D array of non-negative integers below n_values.
+    n_values (int): Upper bound (exclusive) of the values.
+
+    Returns:
+    np.ndarray: Number of inversions per row.
+    """
+    inversions = np.zeros(len(values), dtype=np.int64)
+    count_dtype = np.int32 if values.shape[1] < np.iinfo(np.int32).max else np.int64
+    # The largest value has nothing above it
+    for v in range(n_values - 1):
+        above = np.cumsum(values > v, axis=1, dtype=count_dtype)
+        inversions += np.where(values == v, above, 0).sum(axis=1, dtype=np.int64)
+    return inversions
+
+
+def _tied_pairs_counts(values, n_values):
+    """
+    Counts the tied pairs of every row of an unsorted array of small integers.
+
+    Parameters:
+    values (np.ndarray): 2D array of non-negative integers below n_values.
+    n_values (int): Upper bound (exclusive) of the values.
+
+    Returns:
+    np.ndarray: Number of pairs of equal entries per row.
+    """
+    offsets = np.arange(len(values), dtype=np.int64)[:, None] * n_values
+    counts = np.bincount((values + offsets).ravel(), minlength=len(values) * n_values).reshape(len(values), -1)
+    counts = counts.astype(np.int64)
+    return (counts * (counts - 1) // 2).sum(axis=1)
+
+
+def _tau_b_rows(x, y, invalid, min_periods):
+    """
+    Computes Kendall's tau-b of every row of two rank arrays at once, ignoring invalid entries.
+
+    Invalid entries are moved above all valid ranks on both variables, so they are
+    concordant with every valid entry and tied with each other; the discordant count is
+    unaffected and their ties are subtracted again. The rows are sorted on both variables,
+    the one with fewer levels last, and the discordant pairs are its inversions, counted
+    level by level. When both variables have more levels than LEVEL_COUNTING_LIMIT allows,
+    scipy.stats.kendalltau is faster and computes every row instead.
+
+    Parameters:
+    x (np.ndarray): 2D array of integer ranks of the first variable.
+    y (np.ndarray): 2D array of integer ranks of the second variable.
+    invalid (np.ndarray): 2D boolean array of the entries to ignore.
+    min_periods (int): Minimum number of valid entries of a row.
+
+    Returns:
+    np.ndarray: Kendall's tau-b per row, NaN when a variable is constant or the row has too
+    few valid entries.
+    """
+    x_values, y_values = int(x.max()) + 1, int(y.max()) + 1
+    # Discordance is symmetric, so the variable with fewer levels is the one counted
+    if x_values < y_values:
+        x, y, x_values, y_values = y, x, y_values, x_values
+    if y_values + 1 > LEVEL_COUNTING_LIMIT:
+        return _tau_b_rows_scipy(x, y, invalid, min_periods)
+    x = np.where(invalid, x_values, x).astype(np.int64)
+    y = np.where(invalid, y_values, y).astype(np.int64)
+    base = y_values + 1
+    keys = np.sort(x * base + y, axis=1)
+    discordant = _count_inversions_by_level(keys % base, base)
+
+    n_invalid = invalid.sum(axis=1, dtype=np.int64)
+    n_valid = x.shape[1] - n_invalid
+    invalid_pairs = n_invalid * (n_invalid - 1) // 2
+    total = n_valid * (n_valid - 1) // 2
+    x_ties = _tied_pairs_counts(x, x_values + 1) - invalid_pairs
+    y_ties = _tied_pairs_counts(y, base) - invalid_pairs
+    joint_ties = _tied_pairs_rows(keys) - invalid_pairs
+
+    undefined = (n_valid < max(min_periods, 2)) | (x_ties == total) | (y_ties == total)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tau = ((total - x_ties - y_ties + joint_ties - 2 * discordant)
+               / np.sqrt((total - x_ties).astype(np.float64)) / np.sqrt((total - y_ties).astype(np.float64)))
+    tau[undefined] = np.nan
+    return tau
+
+
+def _tau_b_rows_scipy(x, y, invalid, min_periods):
+    """
+    Computes Kendall's tau-b of every row with scipy.stats.kendalltau, see _tau_b_rows.
+
+    Returns:
+    np.ndarray: Kendall's tau-b per row.
+    """
+    from scipy.stats import kendalltau
+
+    tau = np.full(len(x), np.nan)
+    for k in range(len(x)):
+        valid = ~invalid[k]
+        x_valid, y_valid = x[k][valid], y[k][valid]
+        if len(x_valid) < max(min_periods, 2) or x_valid.min() == x_valid.max() or y_valid.min() == y_valid.max():
+            continue
+        tau[k] = kendalltau(x_valid, y_valid).statistic
+    return tau
+
+
+def _resampled_taus(indices, permute, target, ranks, missing, min_periods):
+    """
+    Computes the Kendall correlation of every column with the target for a batch of resamples.
+
+    Parameters:
+    indices (np.ndarray): Array of shape (resamples, rows) of row indices.
+    permute (bool): Reorder only the target by the indices, for a permutation test,
+        instead of resampling whole rows, for a bootstrap.
+    target (int): Index of the target among the ranked columns.
+    ranks (np.ndarray): Dense ranks from KendallCorrelation._rank_columns.
+    missing (np.ndarray): Missing-value mask from KendallCorrelation._rank_columns.
+    min_periods (int): Minimum number of complete observations for a correlation.
+
+    Returns:
+    np.ndarray: Array of shape (columns, resamples), without the target itself.
+    """
+    y, y_missing = ranks[target][indices], missing[target][indices]
+    taus = []
+    for i in range(len(ranks)):
+        if i == target:
+            continue
+        if permute:
+            x = np.broadcast_to(ranks[i], indices.shape)
+            x_missing = np.broadcast_to(missing[i], indices.shape)
+        else:
+            x, x_missing = ranks[i][indices], missing[i][indices]
+        taus.append(_tau_b_rows(x, y, x_missing | y_missing, min_periods))
+    return np.array(taus).reshape(len(ranks) - 1, len(indices))
+
+
+def _draw_indices(seed, n_resamples, n_rows, permute):
+    rng = np.random.default_rng(seed)
+    if permute:
+        return rng.permuted(np.tile(np.arange(n_rows), (n_resamples, 1)), axis=1)
+    return rng.integers(0, n_rows, size=(n_resamples, n_rows))
+
+
+def _resample_batch(task):
+    seed, n_resamples, permute, target, min_periods = task
+    indices = _draw_indices(seed, n_resamples, _worker_ranks.shape[1], permute)
+    return permute, _resampled_taus(indices, permute, target, _worker_ranks, _worker_missing, min_periods)
+
+
+def _pair_chunk(task):
+    pairs, min_periods = task
+    return [(i, j, _pair_tau(i, j, _worker_ranks, _worker_missing, min_periods)) for i, j in pairs]
+
+
+class KendallCorrelation:
+    """Class to compute Kendall tau-b correlations between many columns.
+
+    Every column is ranked once; each pair then only sorts the combined ranks and counts
+    the discordant pairs with a vectorized merge sort (Knight, 1966), which is
+    O(n log n). Missing values are dropped pairwise, as in DataFrame.corr. Column pairs
+    are spread over a process pool that receives the ranks once.
+    """
+
+    def __init__(self, max_workers=1, min_periods=1, chunks_per_worker=4, batch_elements=1 << 22):
+        """
+        Parameters:
+        max_workers (int, optional): Number of worker processes, the number of CPUs if None.
+        min_periods (int): Minimum number of complete observations for a correlation.
+        chunks_per_worker (int): Number of pair chunks per worker, to balance uneven chunks.
+        batch_elements (int): Number of resampled entries (resamples times rows) evaluated
+            at once, which bounds the memory of a resampling batch.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.min_periods = min_periods
+        self.chunks_per_worker = chunks_per_worker
+        self.batch_elements = batch_elements
+
+    def matrix(self, data_df, columns=None):
+        """
+        Computes the Kendall correlation matrix, as data_df[columns].corr(method='kendall').
+
+        Parameters:
+        data_df (pd.DataFrame): The data frame containing the data.
+        columns (list, optional): Columns to correlate, all by default.
+
+        Returns:
+        pd.DataFrame: Correlation matrix.
+        """
+        columns = list(data_df.columns if columns is None else columns)
+        ranks, missing = self._rank_columns(data_df, columns)
+        pairs = [(i, j) for i in range(len(columns)) for j in range(i, len(columns))]
+        result = np.full((len(columns), len(columns)), np.nan)
+        for i, j, tau in self._run(pairs, ranks, missing):
+            result[i, j] = result[j, i] = tau
+        return pd.DataFrame(result, index=columns, columns=columns)
+
+    def correlations_with(self, data_df, columns, target):
+        """
+        Computes the Kendall correlation of every column with one target column, as
+        data_df[columns + [target]].corr(method='kendall')[target], without the other pairs.
+
+        Parameters:
+        data_df (pd.DataFrame): The data frame containing the data.
+        columns (list): Columns to correlate with the target.
+        target (str): The target column.
+
+        Returns:
+        pd.Series: Correlation values, indexed by column and ending with the target itself.
+        """
+        names = list(columns) + [target]
+        ranks, missing = self._rank_columns(data_df, names)
+        last = len(names) - 1
+        result = np.full(len(names), np.nan)
+        for i, _, tau in self._run([(i, last) for i in range(len(names))], ranks, missing):
+            result[i] = tau
+        return pd.Series(result, index=names, name=target)
+
+    def resampled_correlations_with(self, data_df, columns, target, n_resamples=1000, confidence_level=0.95,
+                                    seed=None):
+        """
+        Computes the Kendall correlation of every column with a target column, together with
+        a percentile bootstrap confidence interval and a two-sided permutation p-value.
+
+        The resamples are drawn in batches of row-index matrices, each from its own child of
+        the seed, and every batch is evaluated for all columns at once; the batches are
+        spread over the process pool. The results therefore only depend on the seed, not on
+        the number of workers.
+
+        With 1e5 rows, a worker computes a resampled tau in about 9 ms against a target with
+        4 levels, such as importance, and 13 ms with 12 levels, where a scipy.stats.kendalltau
+        loop takes 15 ms; when both variables have more levels, the taus are computed with
+        scipy at its speed.
+
+        Parameters:
+        data_df (pd.DataFrame): The data frame containing the data.
+        columns (list): Columns to correlate with the target.
+        target (str): The target column.
+        n_resamples (int): Number of bootstrap resamples and of permutations.
+        confidence_level (float): Coverage of the confidence interval.
+        seed (int, optional): Seed of the resamples.
+
+        Returns:
+        pd.DataFrame: Columns 'tau', 'ci_low', 'ci_high' and 'p_value', indexed by column.
+        """
+        columns = list(columns)
+        names = columns + [target]
+        ranks, missing = self._rank_columns(data_df, names)
+        last = len(columns)
+        observed = np.array([_pair_tau(i, last, ranks, missing, self.min_periods) for i in range(last)])
+
+        batch_size = max(1, min(n_resamples, self.batch_elements // max(1, ranks.shape[1])))
+        sizes = [min(batch_size, n_resamples - start) for start in range(0, n_resamples, batch_size)]
+        seeds = np.random.SeedSequence(seed).spawn(2 * len(sizes))
+        tasks = [(seeds[2 * k + permute], size, bool(permute), last, self.min_periods)
+                 for k, size in enumerate(sizes) for permute in (0, 1)]
+        bootstrap, permutation = [], []
+        if ranks.shape[1]:
+            for permute, taus in self._map(_resample_batch, tasks, ranks, missing):
+                (permutation if permute else bootstrap).append(taus)
+        bootstrap = np.concatenate(bootstrap, axis=1) if bootstrap else np.empty((last, 0))
+        permutation = np.concatenate(permutation, axis=1) if permutation else np.empty((last, 0))
+
+        alpha = (1 - confidence_level) / 2
+        ci_low, ci_high = np.full(last, np.nan), np.full(last, np.nan)
+        p_value = np.full(last, np.nan)
+        for i in range(last):
+            samples = bootstrap[i][~np.isnan(bootstrap[i])]
+            if len(samples):
+                ci_low[i], ci_high[i] = np.quantile(samples, [alpha, 1 - alpha])
+            null = permutation[i][~np.isnan(permutation[i])]
+            if not np.isnan(observed[i]):
+                # The observed statistic counts as one of the permutations
+                extreme = np.count_nonzero(np.abs(null) >= np.abs(observed[i]) - 1e-12)
+                p_value[i] = (extreme + 1) / (len(null) + 1)
+        return pd.DataFrame({'tau': observed, 'ci_low': ci_low, 'ci_high': ci_high, 'p_value': p_value},
+                            index=pd.Index(columns))
+
+    def tau(self, x, y):
+        """
+        Computes Kendall's tau-b of two arrays, ignoring pairs with a missing value.
+
+        Parameters:
+        x (array-like): First variable.
+        y (array-like): Second variable.
+
+        Returns:
+        float: Kendall's tau-b.
+        """
+        ranks, missing = self._rank_columns(pd.DataFrame({'x': x, 'y': y}), ['x', 'y'])
+        return _pair_tau(0, 1, ranks, missing, self.min_periods)
+
+    def _rank_columns(self, data_df, columns):
+        """
+        Ranks every column once.
+
+        Parameters:
+        data_df (pd.DataFrame): The data frame containing the data.
+        columns (list): Columns to rank.
+
+        Returns:
+        tuple: Array of shape (columns, rows) of dense integer ranks starting at 0, with 0
+        for missing values, and the boolean array of missing values.
+        """
+        values = data_df[columns].to_numpy(dtype=np.float64).T
+        missing = np.isnan(values)
+        ranks = np.zeros(values.shape, dtype=np.int64)
+        for k, column in enumerate(values):
+            _, ranks[k, ~missing[k]] = np.unique(column[~missing[k]], return_inverse=True)
+        return ranks, missing
+
+    def _run(self, pairs, ranks, missing):
+        # Strided chunks mix the diagonal and the pairs with missing values
+        n_chunks = max(1, min(len(pairs), self._workers(len(pairs)) * self.chunks_per_worker))
+        tasks = [(pairs[k::n_chunks], self.min_periods) for k in range(n_chunks)]
+        return [result for chunk in self._map(_pair_chunk, tasks, ranks, missing) for result in chunk]
+
+    def _workers(self, n_tasks):
+        if multiprocessing.current_process().daemon:
+            return 1
+        return max(1, min(self.max_workers, n_tasks))
+
+    def _map(self, function, tasks, ranks, missing):
+        """
+        Applies a task function to every task, in a process pool sharing the ranks.
+
+        Parameters:
+        function (callable): Module-level function reading the worker ranks.
+        tasks (list): Arguments of the function calls.
+        ranks (np.ndarray): Dense ranks from _rank_columns.
+        missing (np.ndarray): Missing-value mask from _rank_columns.
+
+        Returns:
+        list: The results, in the order of the tasks.
+        """
+        workers = self._workers(len(tasks))
+        if workers == 1:
+            _init_worker(ranks, missing)
+            try:
+                return [function(task) for task in tasks]
+            finally:
+                _init_worker(None, None)
+        with multiprocessing.get_context().Pool(workers, initializer=_init_worker,
+                                                initargs=(ranks, missing)) as pool:
+            return pool.map(function, tasks)
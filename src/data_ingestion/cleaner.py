@@ -15,26 +15,36 @@ class DataCleaner:
         """
         return nodes_df[nodes_df['doctypebranch'] != 'COMMUNICATEDCASES']
 
-    def filter_targets(self, edges_df, valid_targets, source_col='ecli', target_col='references'):
+    def filter_targets(self, edges_df, valid_targets, source_col='ecli', target_col='references',
+                       drop_duplicates=False, drop_self_loops=False):
         """
         Filters the targets in the edges DataFrame to include only valid targets.
 
+        The reference lists are exploded into one row per edge and the targets are
+        matched against valid_targets through categorical codes, so no Python loop
+        runs per row.
+
         Parameters:
         edges_df (pd.DataFrame): DataFrame containing edge data.
         valid_targets (set): Set of valid target identifiers.
         source_col (str): The column name for sources in the edges DataFrame.
         target_col (str): The column name for targets in the edges DataFrame.
+        drop_duplicates (bool): Whether to keep only the first occurrence of each edge.
+        drop_self_loops (bool): Whether to drop edges whose source is also their target.
 
         Returns:
         pd.DataFrame: Filtered DataFrame with valid targets.
         """
-        filtered_edges = []
-        for index, row in edges_df.iterrows():
-            source = row[source_col]
-            targets = row[target_col]
-            filtered_targets = [target for target in targets if target in valid_targets]
-            if filtered_targets:
-                for target in filtered_targets:
-                    filtered_edges.append((source, target))
-        
-        return pd.DataFrame(filtered_edges, columns=['source', 'target'])
+        exploded = edges_df[[source_col, target_col]].explode(target_col)
+        targets = pd.Categorical(exploded[target_col], categories=pd.Index(list(valid_targets)).unique())
+        mask = targets.codes >= 0
+        if drop_self_loops:
+            mask &= (exploded[source_col] != exploded[target_col]).to_numpy()
+
+        filtered_edges = pd.DataFrame({
+            'source': exploded[source_col].to_numpy()[mask],
+            'target': exploded[target_col].to_numpy()[mask],
+        })
+        if drop_duplicates:
+            filtered_edges = filtered_edges.drop_duplicates(ignore_index=True)
+        return filtered_edges
@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+
+# Low-cardinality node columns stored as categoricals; importance is ordered, 1 being the highest level
+CATEGORICAL_COLUMNS = ('doctype', 'doctypebranch', 'languageisocode', 'originatingbody', 'importance')
+
+# Long text and list columns that no analysis step reads, only loaded when requested
+BULKY_COLUMNS = ('article', 'conclusion', 'docname', 'extractedappno', 'scl', 'appno', 'parties',
+                 'representedby', 'separateopinion', 'kpthesaurus', 'typedescription', 'respondent', 'issue')
+
+# ECLI:<country>:<court>:<year>:<ordinal>, e.g. ECLI:CE:ECHR:2000:0126JUD003098596
+ECLI_PATTERN = r'^ECLI:([A-Z]{2}):([A-Z0-9]{1,7}):(\d{4}):(.+)$'
+
+
+class NodeTable:
+    """Class to hold the node attributes in a compact form.
+
+    Low-cardinality columns are stored as categoricals. The ECLIs are interned: every
+    distinct ECLI is kept once in ``eclis`` and rows refer to it through the integer
+    ``ecli_id`` column, next to the court and year parsed from it. The bulky text
+    columns are left out of the table and read from their source, typically the
+    memory-mapped Arrow artifact of the cleaned nodes, only when requested.
+    """
+
+    def __init__(self, frame, eclis, loader=None, bulky_columns=(), id_col='ecli'):
+        """
+        Parameters:
+        frame (pd.DataFrame): The compact node attributes, one row per node.
+        eclis (pd.Index): The distinct ECLIs, indexed by ecli_id.
+        loader (callable, optional): Function taking a list of columns and returning them as a
+            DataFrame aligned to the rows of frame.
+        bulky_columns (tuple): The columns left out of frame that loader can return.
+        id_col (str): The column of frame holding the node identifiers.
+        """
+        self.frame = frame
+        self.eclis = eclis
+        self.loader = loader
+        self.bulky_columns = tuple(bulky_columns)
+        self.id_col = id_col
+
+    @classmethod
+    def from_frame(cls, nodes_df, loader=None, id_col='ecli', bulky_columns=BULKY_COLUMNS):
+        """
+        Builds a compact table from a DataFrame of node attributes.
+
+        Parameters:
+        nodes_df (pd.DataFrame): DataFrame containing node data; an already compact frame is
+            accepted, e.g. one loaded back from an Arrow file.
+        loader (callable, optional): Function returning bulky columns aligned to the rows of
+            nodes_df; without it the bulky columns of nodes_df are kept in the table.
+        id_col (str): The column name for node identifiers.
+        bulky_columns (tuple): Columns to leave out when a loader is given.
+
+        Returns:
+        NodeTable: The compact table.
+        """
+        bulky = [column for column in nodes_df.columns if column in bulky_columns] if loader else []
+        frame = nodes_df.drop(columns=bulky).reset_index(drop=True)
+        for column in CATEGORICAL_COLUMNS:
+            if column in frame.columns and not isinstance(frame[column].dtype, pd.CategoricalDtype):
+                frame[column] = pd.Categorical(frame[column], ordered=column == 'importance')
+
+        codes, eclis = pd.factorize(frame[id_col].to_numpy(dtype=object))
+        eclis = pd.Index(eclis, dtype=object)
+        frame['ecli_id'] = codes.astype(np.int32)
+        frame['ecli_court'], frame['ecli_year'] = cls.parse_eclis(eclis, codes)
+        return cls(frame, eclis, loader, [column for column in bulky if column != id_col], id_col)
+
+    @classmethod
+    def from_store(cls, store, key, name='nodes', id_col='ecli', bulky_columns=BULKY_COLUMNS):
+        """
+        Loads a compact table from an artifact of the cleaned nodes, without reading its bulky columns.
+
+        Parameters:
+        store (ArtifactStore): The store holding the artifact.
+        key (str): Key of the artifact.
+        name (str): Name of the artifact.
+        id_col (str): The column name for node identifiers.
+        bulky_columns (tuple): Columns left to be loaded on request.
+
+        Returns:
+        NodeTable: The compact table, loading its bulky columns from the artifact.
+        """
+        columns = store.columns(name, key)
+        nodes_df = store.load(name, key, columns=[column for column in columns
+                                                  if column not in bulky_columns or column == id_col])
+        table = cls.from_frame(nodes_df, id_col=id_col)
+        table.attach(store, key, name, bulky_columns)
+        return table
+
+    def attach(self, store, key, name='nodes', bulky_columns=BULKY_COLUMNS):
+        """
+        Loads the bulky columns on request from an artifact of the cleaned nodes with the same rows.
+
+        Parameters:
+        store (ArtifactStore): The store holding the artifact.
+        key (str): Key of the artifact.
+        name (str): Name of the artifact.
+        bulky_columns (tuple): Columns of the artifact to load on request.
+        """
+        self.bulky_columns = tuple(column for column in store.columns(name, key)
+                                   if column in bulky_columns and column != self.id_col)
+        self.loader = lambda columns: store.load(name, key, columns=list(columns))
+
+    @staticmethod
+    def parse_eclis(eclis, codes=None):
+        """
+        Extracts the court and year of ECLIs.
+
+        Parameters:
+        eclis (pd.Index): The distinct ECLIs to parse.
+        codes (np.ndarray, optional): Positions in eclis of the rows to return, all ECLIs by default.
+
+        Returns:
+        tuple: The court as a categorical and the year as a nullable integer array, missing
+        for identifiers that are not well-formed ECLIs.
+        """
+        # Only the distinct ECLIs are parsed, the rows take their components by position
+        parts = pd.Series(eclis, dtype=object).str.extract(ECLI_PATTERN)
+        courts = pd.Categorical(parts[1])
+        years = pd.array(pd.to_numeric(parts[2]), dtype='Int16')
+        if codes is None:
+            return courts, years
+        return courts.take(codes, allow_fill=True), years.take(codes, allow_fill=True)
+
+    def encode(self, values):
+        """
+        Maps ECLIs to their interned integer ids.
+
+        Parameters:
+        values (array-like): The ECLIs to encode.
+
+        Returns:
+        np.ndarray: The ecli_id of every value, -1 for ECLIs missing from the table.
+        """
+        return self.eclis.get_indexer(np.asarray(values, dtype=object)).astype(np.int32)
+
+    def load_columns(self, columns=None):
+        """
+        Loads bulky columns left out of the table.
+
+        Parameters:
+        columns (list, optional): Columns to load, all bulky columns by default.
+
+        Returns:
+        pd.DataFrame: The columns, aligned to the rows of the table.
+        """
+        columns = list(self.bulky_columns if columns is None else columns)
+        unknown = [column for column in columns if column not in self.bulky_columns]
+        if unknown:
+            raise KeyError(f"Not a bulky column of the node table: {', '.join(unknown)}")
+        if not columns:
+            return pd.DataFrame(index=self.frame.index)
+        return self.loader(columns).reset_index(drop=True)
+
+    @staticmethod
+    def memory_report(nodes_df, top=5):
+        """
+        Summarizes the memory held by a DataFrame of node attributes.
+
+        Parameters:
+        nodes_df (pd.DataFrame): The DataFrame to measure, strings included.
+        top (int): Number of largest columns listed.
+
+        Returns:
+        str: The total size and the largest columns in megabytes.
+        """
+        usage = nodes_df.memory_usage(deep=True, index=False).sort_values(ascending=False)
+        largest = ', '.join(f"{column} {size / 1e6:.1f}" for column, size in usage.head(top).items())
+        return f"{usage.sum() / 1e6:.1f} MB in {len(usage)} columns (largest, in MB: {largest})"
@@ -18,6 +18,83 @@ class FileReader:
             data = json.load(f)
         return pd.DataFrame(data)
 
+    def iter_json(self, file_path, columns=None, chunksize=10000, dtypes=None, block_size=1 << 20):
+        """
+        Streams a JSON array or NDJSON file as DataFrame chunks.
+
+        The file is read block by block and decoded one record at a time, so the
+        full document is never held in memory. Only the requested columns are kept.
+
+        Parameters:
+        file_path (str): Path to the JSON or NDJSON file.
+        columns (list, optional): Columns to keep, all by default.
+        chunksize (int): Number of records per chunk.
+        dtypes (dict, optional): Column dtypes to cast each chunk to.
+        block_size (int): Number of characters read from the file at a time.
+
+        Yields:
+        pd.DataFrame: DataFrame containing the next chunk of records.
+        """
+        records = []
+        for record in self._iter_json_records(file_path, block_size):
+            if columns is not None:
+                record = {column: record.get(column) for column in columns}
+            records.append(record)
+            if len(records) >= chunksize:
+                yield self._to_chunk(records, columns, dtypes)
+                records = []
+        if records:
+            yield self._to_chunk(records, columns, dtypes)
+
+    def _to_chunk(self, records, columns, dtypes):
+        chunk = pd.DataFrame.from_records(records, columns=columns)
+        if dtypes:
+            chunk = chunk.astype(dtypes)
+        return chunk
+
+    def _iter_json_records(self, file_path, block_size):
+        """
+        Decodes the top-level records of a JSON array or NDJSON file incrementally.
+
+        Parameters:
+        file_path (str): Path to the JSON or NDJSON file.
+        block_size (int): Number of characters read from the file at a time.
+
+        Yields:
+        dict: The next record of the file.
+        """
+        decoder = json.JSONDecoder()
+        with open(file_path, 'r') as f:
+            buffer, pos, eof = '', 0, False
+            in_array = None
+            while True:
+                # Skip whitespace and the separators between records
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos == len(buffer):
+                    if eof:
+                        return
+                    buffer, pos = f.read(block_size), 0
+                    eof = not buffer
+                    continue
+                if in_array is None:
+                    in_array = buffer[pos] == '['
+                    if in_array:
+                        pos += 1
+                        continue
+                if in_array and buffer[pos] == ']':
+                    return
+                try:
+                    record, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # The record is cut off by the end of the block, read more of the file
+                    block = f.read(block_size)
+                    if not block:
+                        raise
+                    buffer, pos = buffer[pos:] + block, 0
+                    continue
+                yield record
+
     def read_csv(self, file_path):
         """
         Reads a CSV file and returns a DataFrame.
@@ -1,23 +1,97 @@
 import networkx as nx
 
+from graph.csr import CSRGraph
+from graph.storage import GraphStorage
+
 class GraphBuilder:
     """Class to build a graph from nodes and edges."""
 
-    def create_graph(self, nodes_df, edges_df):
+    def create_graph(self, nodes_df, edges_df, node_attributes=None, id_col='ecli'):
         """
         Creates a graph using networkx from nodes and edges DataFrame.
 
+        Every attribute copied onto the nodes becomes a Python object per node, so only
+        the attributes the caller needs should be requested on large graphs.
+
         Parameters:
         nodes_df (pd.DataFrame): DataFrame containing node data.
         edges_df (pd.DataFrame): DataFrame containing edge data.
+        node_attributes (list, optional): Columns copied onto the graph nodes, all columns by
+            default; an empty list adds the bare nodes.
+        id_col (str): The column name for node identifiers.
 
         Returns:
         networkx.DiGraph: Directed graph constructed from nodes and edges.
         """
         G = nx.DiGraph()
-        for _, row in nodes_df.iterrows():
-            G.add_node(row['ecli'], **row.to_dict())
-        for _, row in edges_df.iterrows():
-            G.add_edge(row['source'], row['target'])
+        columns = list(nodes_df.columns) if node_attributes is None else list(node_attributes)
+        if columns:
+            G.add_nodes_from(zip(nodes_df[id_col], nodes_df[columns].to_dict('records')))
+        else:
+            G.add_nodes_from(nodes_df[id_col])
+        G.add_edges_from(zip(edges_df['source'], edges_df['target']))
         return G
 
+    def create_csr_graph(self, nodes_df, edges_df, id_col='ecli', source_col='source', target_col='target'):
+        """
+        Creates a CSR graph from nodes and edges DataFrame in one vectorized pass.
+
+        ECLIs are factorized to integer ids once and the node attributes are kept in
+        nodes_df instead of being copied onto every node. Use CSRGraph.to_networkx for
+        metrics that still need a networkx graph.
+
+        Parameters:
+        nodes_df (pd.DataFrame): DataFrame containing node data.
+        edges_df (pd.DataFrame): DataFrame containing edge data.
+        id_col (str): The column name for node identifiers in the nodes DataFrame.
+        source_col (str): The column name for sources in the edges DataFrame.
+        target_col (str): The column name for targets in the edges DataFrame.
+
+        Returns:
+        CSRGraph: Directed graph constructed from nodes and edges.
+        """
+        return CSRGraph.from_edges(nodes_df[id_col].to_numpy(), edges_df[source_col].to_numpy(),
+                                   edges_df[target_col].to_numpy(), nodes_df=nodes_df, id_col=id_col)
+
+    def create_csr_graph_from_chunks(self, nodes_df, edge_chunks, id_col='ecli', source_col='source',
+                                     target_col='target'):
+        """
+        Creates a CSR graph from nodes DataFrame and an iterable of edge chunks.
+
+        Parameters:
+        nodes_df (pd.DataFrame): DataFrame containing node data.
+        edge_chunks (iterable): DataFrames containing edge data, e.g. from FileReader.iter_json.
+        id_col (str): The column name for node identifiers in the nodes DataFrame.
+        source_col (str): The column name for sources in the edge chunks.
+        target_col (str): The column name for targets in the edge chunks.
+
+        Returns:
+        CSRGraph: Directed graph constructed from nodes and edges.
+        """
+        return CSRGraph.from_edge_chunks(nodes_df[id_col].to_numpy(), edge_chunks, source_col, target_col,
+                                         nodes_df=nodes_df, id_col=id_col)
+
+    def create_stored_csr_graph(self, nodes_df, edges_df, path, id_col='ecli', source_col='source',
+                                target_col='target'):
+        """
+        Opens the graph stored at path, building it from nodes and edges DataFrame and storing it first if missing.
+
+        The graph is written once in the memory-mappable format of GraphStorage; every later
+        call, in this or any other process, maps the stored arrays instead of rebuilding them.
+        The stored graph must have been built from the same nodes and edges, e.g. by deriving
+        path from a fingerprint of the raw inputs.
+
+        Parameters:
+        nodes_df (pd.DataFrame): DataFrame containing node data.
+        edges_df (pd.DataFrame): DataFrame containing edge data.
+        path (str): The directory of the stored graph.
+        id_col (str): The column name for node identifiers in the nodes DataFrame.
+        source_col (str): The column name for sources in the edges DataFrame.
+        target_col (str): The column name for targets in the edges DataFrame.
+
+        Returns:
+        CSRGraph: The graph, its arrays memory-mapped from path.
+        """
+        if not GraphStorage.exists(path):
+            GraphStorage.write(self.create_csr_graph(nodes_df, edges_df, id_col, source_col, target_col), path)
+        return GraphStorage.read(path, nodes_df)
@@ -0,0 +1,282 @@
+import networkx as nx
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class CSRGraph:
+    """Directed graph stored as a compressed sparse row adjacency matrix.
+
+    Nodes are identified by integer ids ``0..n-1``; ``node_ids`` maps those ids
+    back to the original identifiers (ECLIs). Row ``u`` of the adjacency holds
+    the targets cited by ``u``. Node attributes stay in ``nodes_df`` instead of
+    being copied onto every node.
+    """
+
+    def __init__(self, node_ids, adjacency, nodes_df=None, id_col='ecli'):
+        """
+        Parameters:
+        node_ids (array-like): Identifier of every node, indexed by integer id.
+        adjacency (scipy.sparse matrix): Square adjacency matrix, rows are sources.
+        nodes_df (pd.DataFrame, optional): DataFrame holding the node attributes.
+        id_col (str): The column of nodes_df holding the node identifiers.
+        """
+        self._node_ids = node_ids
+        self.adjacency = sparse.csr_matrix(adjacency)
+        self.nodes_df = nodes_df
+        self.id_col = id_col
+        self._reverse = None
+        self._nx_graph = None
+
+    @classmethod
+    def from_edges(cls, node_ids, sources, targets, nodes_df=None, id_col='ecli'):
+        """
+        Builds a graph from parallel arrays of edge endpoints in one vectorized pass.
+
+        Identifiers are factorized once. Endpoints missing from node_ids are appended
+        in the order they first appear, which is the order networkx would add them.
+        Duplicate edges are collapsed.
+
+        Parameters:
+        node_ids (array-like): Identifiers of the known nodes.
+        sources (array-like): Source identifier of every edge.
+        targets (array-like): Target identifier of every edge.
+        nodes_df (pd.DataFrame, optional): DataFrame holding the node attributes.
+        id_col (str): The column of nodes_df holding the node identifiers.
+
+        Returns:
+        CSRGraph: The constructed graph.
+        """
+        node_ids = np.asarray(node_ids, dtype=object)
+        endpoints = np.column_stack([np.asarray(sources, dtype=object),
+                                     np.asarray(targets, dtype=object)]).ravel()
+        codes, uniques = pd.factorize(np.concatenate([node_ids, endpoints]))
+        edge_codes = codes[len(node_ids):].astype(np.int32)
+        return cls.from_codes(uniques, edge_codes[0::2], edge_codes[1::2], nodes_df, id_col)
+
+    @classmethod
+    def from_codes(cls, node_ids, sources, targets, nodes_df=None, id_col='ecli'):
+        """
+        Builds a graph from integer-coded edge endpoints.
+
+        Parameters:
+        node_ids (array-like): Identifier of every node, indexed by integer id.
+        sources (np.ndarray): Integer id of the source of every edge.
+        targets (np.ndarray): Integer id of the target of every edge.
+        nodes_df (pd.DataFrame, optional): DataFrame holding the node attributes.
+        id_col (str): The column of nodes_df holding the node identifiers.
+
+        Returns:
+        CSRGraph: The constructed graph.
+        """
+        n = len(node_ids)
+        data = np.ones(len(sources), dtype=np.int8)
+        adjacency = sparse.csr_matrix((data, (sources, targets)), shape=(n, n))
+        adjacency.sum_duplicates()
+        adjacency.data[:] = 1
+        return cls(node_ids, adjacency, nodes_df, id_col)
+
+    @classmethod
+    def from_edge_chunks(cls, node_ids, edge_chunks, source_col='source', target_col='target',
+                         nodes_df=None, id_col='ecli'):
+        """
+        Builds a graph from an iterable of edge DataFrame chunks.
+
+        Each chunk is reduced to integer codes right away, so only the coded edge
+        arrays are kept in memory while the chunks are consumed.
+
+        Parameters:
+        node_ids (array-like): Identifiers of the known nodes.
+        edge_chunks (iterable): DataFrames containing edge data.
+        source_col (str): The column name for sources in the edge chunks.
+        target_col (str): The column name for targets in the edge chunks.
+        nodes_df (pd.DataFrame, optional): DataFrame holding the node attributes.
+        id_col (str): The column of nodes_df holding the node identifiers.
+
+        Returns:
+        CSRGraph: The constructed graph.
+        """
+        known = pd.Index(pd.unique(np.asarray(node_ids, dtype=object)))
+        extra = pd.Index([], dtype=object)
+        codes = []
+        for chunk in edge_chunks:
+            endpoints = np.column_stack([chunk[source_col].to_numpy(dtype=object),
+                                         chunk[target_col].to_numpy(dtype=object)]).ravel()
+            chunk_codes = known.get_indexer(endpoints)
+            missing = chunk_codes < 0
+            if missing.any():
+                # Endpoints that are not known nodes get ids after the known ones
+                new = pd.Index(pd.unique(endpoints[missing])).difference(extra, sort=False)
+                extra = extra.append(new)
+                chunk_codes[missing] = len(known) + extra.get_indexer(endpoints[missing])
+            codes.append(chunk_codes.astype(np.int32))
+        codes = np.concatenate(codes) if codes else np.empty(0, dtype=np.int32)
+        return cls.from_codes(known.append(extra), codes[0::2], codes[1::2], nodes_df, id_col)
+
+    @classmethod
+    def from_networkx(cls, G):
+        """
+        Builds a graph from a networkx graph, keeping its node order.
+
+        Undirected graphs are stored with both edge directions.
+
+        Parameters:
+        G (networkx.Graph or networkx.DiGraph): The graph to convert.
+
+        Returns:
+        CSRGraph: The converted graph.
+        """
+        nodelist = list(G)
+        adjacency = nx.to_scipy_sparse_array(G, nodelist=nodelist, weight=None,
+                                             dtype=np.int8, format='csr')
+        graph = cls(nodelist, adjacency)
+        graph._nx_graph = G
+        return graph
+
+    @classmethod
+    def load(cls, path, nodes_df=None, mmap_mode='r'):
+        """
+        Opens a graph saved with save, mapping its arrays instead of reading them.
+
+        Parameters:
+        path (str): The directory of the graph.
+        nodes_df (pd.DataFrame, optional): DataFrame holding the node attributes.
+        mmap_mode (str, optional): Mode in which the arrays are memory-mapped, None to read them.
+
+        Returns:
+        CSRGraph: The stored graph.
+        """
+        from graph.storage import GraphStorage
+
+        return GraphStorage.read(path, nodes_df, mmap_mode)
+
+    def save(self, path):
+        """
+        Saves the graph in the memory-mappable format of GraphStorage.
+
+        Parameters:
+        path (str): The directory of the graph.
+
+        Returns:
+        str: The directory of the graph.
+        """
+        from graph.storage import GraphStorage
+
+        return GraphStorage.write(self, path)
+
+    @property
+    def node_ids(self):
+        """pd.Index: Identifier of every node, indexed by integer id, built on first use."""
+        # A graph opened from disk keeps its memory-mapped identifiers until they are needed
+        if not isinstance(self._node_ids, pd.Index):
+            self._node_ids = pd.Index(self._node_ids)
+        return self._node_ids
+
+    @property
+    def indptr(self):
+        """np.ndarray: Offsets of each node's targets in ``indices``."""
+        return self.adjacency.indptr
+
+    @property
+    def indices(self):
+        """np.ndarray: Concatenated target ids of all nodes."""
+        return self.adjacency.indices
+
+    def number_of_nodes(self):
+        return self.adjacency.shape[0]
+
+    def number_of_edges(self):
+        return self.adjacency.nnz
+
+    def reverse(self):
+        """
+        Returns the adjacency of the reversed graph, whose rows hold the citing nodes.
+
+        Returns:
+        scipy.sparse.csr_matrix: The transposed adjacency matrix, cached after the first call.
+        """
+        if self._reverse is None:
+            self._reverse = self.adjacency.transpose().tocsr()
+        return self._reverse
+
+    def out_degree(self):
+        return np.diff(self.adjacency.indptr)
+
+    def in_degree(self):
+        return np.diff(self.reverse().indptr)
+
+    def successors(self, node):
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def predecessors(self, node):
+        reverse = self.reverse()
+        return reverse.indices[reverse.indptr[node]:reverse.indptr[node + 1]]
+
+    def without_self_loops(self):
+        """
+        Returns a copy of the graph with self-loops removed.
+
+        Returns:
+        CSRGraph: The graph without self-loops.
+        """
+        adjacency = self.adjacency.tolil()
+        adjacency.setdiag(0)
+        adjacency = adjacency.tocsr()
+        adjacency.eliminate_zeros()
+        return CSRGraph(self.node_ids, adjacency, self.nodes_df, self.id_col)
+
+    def to_dict(self, values):
+        """
+        Maps an array aligned to the integer ids back to the node identifiers.
+
+        Parameters:
+        values (array-like): One value per node.
+
+        Returns:
+        dict: Dictionary of node identifiers with their values.
+        """
+        return dict(zip(self.node_ids, np.asarray(values).tolist()))
+
+    def node_attributes(self, columns=None):
+        """
+        Returns the node attributes aligned to the integer ids.
+
+        Nodes that only appear as edge endpoints get missing values.
+
+        Parameters:
+        columns (list, optional): Attribute columns to return, all by default.
+
+        Returns:
+        pd.DataFrame: DataFrame of node attributes indexed by node identifier.
+        """
+        if self.nodes_df is None:
+            return pd.DataFrame(index=self.node_ids)
+        attributes = self.nodes_df.drop_duplicates(self.id_col).set_index(self.id_col)
+        if columns is not None:
+            attributes = attributes[columns]
+        return attributes.reindex(self.node_ids)
+
+    def to_networkx(self, with_attributes=False):
+        """
+        Converts the graph to a networkx DiGraph, for metrics that still need networkx.
+
+        The conversion is done on first use and cached.
+
+        Parameters:
+        with_attributes (bool): Whether to copy the node attributes onto the graph nodes.
+
+        Returns:
+        networkx.DiGraph: The equivalent networkx graph.
+        """
+        if self._nx_graph is None or with_attributes:
+            G = nx.DiGraph()
+            G.add_nodes_from(self.node_ids)
+            if with_attributes and self.nodes_df is not None:
+                G.add_nodes_from(zip(self.nodes_df[self.id_col], self.nodes_df.to_dict('records')))
+            coo = self.adjacency.tocoo()
+            ids = self.node_ids.to_numpy()
+            G.add_edges_from(zip(ids[coo.row], ids[coo.col]))
+            if not with_attributes:
+                self._nx_graph = G
+            return G
+        return self._nx_graph
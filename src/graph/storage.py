@@ -0,0 +1,163 @@
+import datetime
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from graph.csr import CSRGraph
+
+GRAPHS_DIR = 'data/processed/cache/graphs'
+
+# Version of the stored graphs, bumped whenever the files, their meaning or the way GraphBuilder
+# builds the graph change; it is part of the graph directory, so older graphs are not reused
+FORMAT_VERSION = 1
+
+
+class GraphStorage:
+    """Class to store CSR graphs as memory-mappable binary files.
+
+    A stored graph is a directory holding one .npy file per array, the CSR offsets
+    (indptr.npy), targets (indices.npy) and edge values (data.npy) and the node
+    identifiers as a fixed-width array (node_ids.npy), next to a meta.json file with
+    the format version and the size of the graph. Loading maps the arrays read-only
+    instead of reading them, so opening a graph takes milliseconds whatever its size,
+    and every process opening it, be it a metric worker, a notebook or a plotter,
+    shares the same physical pages through the page cache.
+    """
+
+    META = 'meta.json'
+    ARRAYS = ('indptr', 'indices', 'data', 'node_ids')
+
+    def __init__(self, root=GRAPHS_DIR):
+        """
+        Parameters:
+        root (str): Directory in which the graphs are stored.
+        """
+        self.root = root
+
+    def path(self, key):
+        """
+        Returns the directory of a stored graph.
+
+        Parameters:
+        key (str): Key of the graph, e.g. a fingerprint of the raw inputs it was built from.
+
+        Returns:
+        str: Path of the graph directory, for the current FORMAT_VERSION.
+        """
+        return os.path.join(self.root, f'graph-{key[:16]}-v{FORMAT_VERSION}')
+
+    @classmethod
+    def exists(cls, path):
+        return os.path.exists(os.path.join(path, cls.META))
+
+    @classmethod
+    def write(cls, graph, path):
+        """
+        Writes a graph to a directory.
+
+        The files are written to a temporary directory renamed into place, so a process
+        opening the graph never sees a partial one. When another process stored the
+        graph first, its copy is kept.
+
+        Parameters:
+        graph (CSRGraph): The graph to write; its node attributes are not stored.
+        path (str): The directory of the graph.
+
+        Returns:
+        str: The directory of the graph.
+        """
+        adjacency = graph.adjacency
+        if not adjacency.has_canonical_format:
+            adjacency = adjacency.copy()
+            adjacency.sum_duplicates()
+        node_ids = graph.node_ids
+        # Identifiers are stored as fixed-width strings, which can be mapped unlike Python objects
+        node_ids = node_ids.to_numpy() if pd.api.types.is_numeric_dtype(node_ids) else node_ids.to_numpy(dtype=str)
+        arrays = {'indptr': adjacency.indptr, 'indices': adjacency.indices, 'data': adjacency.data,
+                  'node_ids': node_ids}
+        meta = {
+            'format': FORMAT_VERSION,
+            'nodes': graph.number_of_nodes(),
+            'edges': graph.number_of_edges(),
+            'id_col': graph.id_col,
+            'dtypes': {name: array.dtype.str for name, array in arrays.items()},
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        }
+
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(dir=parent, suffix='.tmp')
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_path, f'{name}.npy'), np.ascontiguousarray(array))
+            # The metadata is written last, a directory without it is incomplete
+            with open(os.path.join(tmp_path, cls.META), 'w') as f:
+                json.dump(meta, f, indent=2)
+            try:
+                os.replace(tmp_path, path)
+            except OSError:
+                if not cls.exists(path):
+                    raise
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        return path
+
+    @classmethod
+    def read(cls, path, nodes_df=None, mmap_mode='r'):
+        """
+        Opens a graph written by write.
+
+        Parameters:
+        path (str): The directory of the graph.
+        nodes_df (pd.DataFrame, optional): DataFrame holding the node attributes.
+        mmap_mode (str, optional): Mode in which the arrays are memory-mapped, 'r' for read-only
+            pages shared between processes; None reads them into memory.
+
+        Returns:
+        CSRGraph: The graph, with the node identifiers converted on first use.
+        """
+        with open(os.path.join(path, cls.META)) as f:
+            meta = json.load(f)
+        if meta.get('format') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported graph format {meta.get('format')} in {path}, expected {FORMAT_VERSION}")
+        arrays = {}
+        for name in cls.ARRAYS:
+            file_path = os.path.join(path, f'{name}.npy')
+            # numpy cannot map an empty array
+            empty = (meta['edges'] if name in ('indices', 'data') else meta['nodes']) == 0
+            arrays[name] = np.load(file_path, mmap_mode=None if empty else mmap_mode)
+        n = meta['nodes']
+        adjacency = sparse.csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']), shape=(n, n), copy=False)
+        return CSRGraph(arrays['node_ids'], adjacency, nodes_df, meta['id_col'])
+
+    def save(self, key, graph):
+        """
+        Stores a graph under a key.
+
+        Parameters:
+        key (str): Key of the graph.
+        graph (CSRGraph): The graph to store.
+
+        Returns:
+        str: The directory of the graph.
+        """
+        return self.write(graph, self.path(key))
+
+    def load(self, key, nodes_df=None, mmap_mode='r'):
+        """
+        Opens the graph stored under a key.
+
+        Parameters:
+        key (str): Key of the graph.
+        nodes_df (pd.DataFrame, optional): DataFrame holding the node attributes.
+        mmap_mode (str, optional): Mode in which the arrays are memory-mapped.
+
+        Returns:
+        CSRGraph: The stored graph.
+        """
+        return self.read(self.path(key), nodes_df, mmap_mode)
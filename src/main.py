@@ -1,110 +1,261 @@
+import argparse
+import inspect
+import json
 import sys
 import os
-import time
-import networkx as nx
-import pandas as pd
-
-
 
 # Add the src directory to the path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
-from data_ingestion.reader import FileReader
-from data_ingestion.cleaner import DataCleaner
-from graph.builder import GraphBuilder
-from centralities.calculator import CentralityCalculator
-from correlation.correlation import CorrelationAnalyzer
-from correlation.composite_score import CompositeScoreCalculator
-from correlation.regression import RegressionModel
-from visualization.plot import PlotGenerator
-from visualization.error_bar import ErrorBarPlotter
+# Only lightweight modules are imported here; every step imports the libraries it needs
+# when it runs, so that a job computing a few cheap metrics does not pay for the others
+from centralities.registry import COST_CLASSES, MetricRegistry
+from utils.instrumentation import Tracer, set_tracer
 from utils.logger import setup_logger
+from utils.run_directory import RUNS_DIR, RunDirectory
 from utils.timer import Timer
 
-def main():
-    """Main function to orchestrate the graph analysis tool workflow."""
+NODES_PATH = 'data/raw/nodes_p1.json'
+EDGES_PATH = 'data/raw/edges_p1.json'
+OUTPUT_DIR = 'data/processed'
+PLOTS_DIR = 'plots'
+INCREMENTAL_STATE_PATH = 'data/processed/incremental_state.npz'
+
+# Stages after ingestion and graph construction, which always run; export only runs when selected
+STAGES = ('centralities', 'correlation', 'composite', 'visualization', 'export')
+DEFAULT_STAGES = ('centralities', 'correlation', 'composite', 'visualization')
+
+
+def run(nodes_path=NODES_PATH, edges_path=EDGES_PATH, output_dir=OUTPUT_DIR, plots_dir=PLOTS_DIR, runs_dir=RUNS_DIR,
+        run_dir=None, resume=False, stages=None, metrics=None, max_cost=None, export_excel=False, max_workers=None,
+        metric_timeout=None, current_flow_threshold=None, trophic_method='linear', approx_sample_size=None,
+        approx_epsilon=0.05, approx_seed=0, incremental=False, n_resamples=0, seed=0, trace_memory=False,
+        profile=None):
+    """
+    Runs the graph analysis tool workflow, checkpointing every metric and stage to a run directory.
+
+    Parameters:
+    nodes_path (str): Path of the raw nodes JSON file.
+    edges_path (str): Path of the raw edges JSON file.
+    output_dir (str): Directory of the Excel outputs.
+    plots_dir (str): Directory of the correlation plots.
+    runs_dir (str): Directory in which a new run directory is created.
+    run_dir (str, optional): Run directory to use instead of a new one.
+    resume (bool): Whether to skip the metrics and stages that run_dir already holds.
+    stages (list, optional): Stages to run among STAGES, DEFAULT_STAGES by default.
+    metrics (list, optional): Names of the metrics or calculators of the registry to compute, the
+        default calculators if None.
+    max_cost (str, optional): Most expensive cost class of the computed metrics, one of
+        centralities.registry.COST_CLASSES.
+    export_excel (bool): Whether to also export the processed nodes and edges to Excel at the end.
+    max_workers (int, optional): Number of processes computing centralities, the number of CPUs by default.
+    metric_timeout (float, optional): Maximum number of seconds a single centrality may run.
+    current_flow_threshold (int, optional): Component size above which the current-flow centralities
+        are approximated, exact everywhere by default.
+    trophic_method (str): Method of the trophic levels, 'linear' or 'topological', see
+        CentralityCalculator.calculate_trophic_level.
+    approx_sample_size (int, optional): Number of pivots of the approximate betweenness and closeness
+        centralities, derived from approx_epsilon by default.
+    approx_epsilon (float): Target bound on the absolute error of the approximate centralities.
+    approx_seed (int, optional): Seed of the pivot sample of the approximate centralities.
+    incremental (bool): Whether to update the centralities of the previous run with the new nodes and
+        edges instead of recomputing them, keeping the state in INCREMENTAL_STATE_PATH. The selected
+        metrics that the state does not maintain are left out with a warning.
+    n_resamples (int): Number of bootstrap resamples and permutations behind the confidence intervals
+        and p-values of the ground truth correlations, 0 for point estimates only.
+    seed (int, optional): Seed of the resamples.
+    trace_memory (bool): Whether to trace the Python allocations of every stage and metric with tracemalloc.
+    profile (list, optional): Names of the stages and metrics to profile with cProfile.
+
+    Returns:
+    str: Path of the run directory.
+    """
+    stages = list(DEFAULT_STAGES if stages is None else stages)
+    if export_excel and 'export' not in stages:
+        stages.append('export')
+    unknown = sorted(set(stages) - set(STAGES))
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(unknown)}")
+    config = {'nodes_path': nodes_path, 'edges_path': edges_path, 'output_dir': output_dir, 'plots_dir': plots_dir,
+              'stages': stages, 'metrics': metrics, 'max_cost': max_cost, 'max_workers': max_workers,
+              'metric_timeout': metric_timeout, 'current_flow_threshold': current_flow_threshold,
+              'trophic_method': trophic_method, 'approx_sample_size': approx_sample_size,
+              'approx_epsilon': approx_epsilon, 'approx_seed': approx_seed, 'incremental': incremental, 'n_resamples': n_resamples,
+              'seed': seed, 'trace_memory': trace_memory, 'profile': profile}
+
     logger = setup_logger()
-    timer = Timer(logger)
-    
+    if run_dir is None:
+        run_directory = RunDirectory.create(runs_dir)
+    else:
+        os.makedirs(run_dir, exist_ok=True)
+        run_directory = RunDirectory(run_dir)
+        if not resume and run_directory.manifest['stages']:
+            raise ValueError(f"{run_dir} already holds a run, resume it or choose another directory")
+    logger.info(f"Run directory: {run_directory.path}")
+
+    # Every stage, metric and large component is recorded as a span of the run's trace
+    tracer = Tracer(logger=logger, trace_memory=trace_memory, profile=profile,
+                    profile_dir=os.path.join(run_directory.path, 'profiles') if profile else None)
+    set_tracer(tracer)
+    timer = Timer(logger, tracer)
+
     # Step 1: Data Ingestion and Preprocessing
     logger.info("Step 1: Data Ingestion and Preprocessing")
-    timer.start()
-    file_reader = FileReader()
-    nodes_df = file_reader.read_json('data/raw/nodes_p1.json')
-    edges_df = file_reader.read_json('data/raw/edges_p1.json')
-    timer.stop("Data Ingestion and Preprocessing")
+    timer.start("Data Ingestion and Preprocessing")
+    import pandas as pd
+    from data_ingestion.node_table import NodeTable
+    from data_ingestion.store import ArtifactStore
+
+    store = ArtifactStore()
+    raw_key = store.fingerprint(nodes_path, edges_path)
+    run_directory.start(config, raw_key)
+
+    if run_directory.stage_done('ingestion'):
+        logger.info("Resuming with the cleaned nodes and edges of the run directory")
+        frames = run_directory.load_stage('ingestion')
+        node_table = NodeTable.from_frame(frames['nodes'])
+        if store.exists('nodes', raw_key):
+            node_table.attach(store, raw_key)
+        edges_df = frames['edges']
+    elif store.exists('nodes', raw_key) and store.exists('edges', raw_key):
+        logger.info("Raw inputs unchanged, loading cleaned nodes and edges from the artifact store")
+        node_table = NodeTable.from_store(store, raw_key)
+        edges_df = store.load('edges', raw_key)
+    else:
+        from data_ingestion.cleaner import DataCleaner
+        from data_ingestion.reader import FileReader
+
+        file_reader = FileReader()
+        data_cleaner = DataCleaner()
+
+        # Stream the raw files chunk by chunk so the full JSON documents are never held in memory
+        nodes_df = pd.concat(
+            (data_cleaner.remove_communicated_cases(chunk) for chunk in file_reader.iter_json(nodes_path)),
+            ignore_index=True,
+        )
+        p1_eclis = set(nodes_df['ecli'])
+        edges_df = pd.concat(
+            (data_cleaner.filter_targets(chunk, p1_eclis, drop_self_loops=True)
+             for chunk in file_reader.iter_json(edges_path, columns=['ecli', 'references'])),
+            ignore_index=True,
+        )
+        store.save('nodes', raw_key, nodes_df)
+        store.save('edges', raw_key, edges_df)
+        logger.info(f"Cleaned nodes: {NodeTable.memory_report(nodes_df)}")
+        del nodes_df, p1_eclis
+        # The bulky text columns stay in the memory-mapped artifact until they are requested
+        node_table = NodeTable.from_store(store, raw_key)
+    nodes_df = node_table.frame
+    logger.info(f"Compact node table: {NodeTable.memory_report(nodes_df)}, "
+                f"{len(node_table.bulky_columns)} bulky columns loaded on request")
+    if not run_directory.stage_done('ingestion'):
+        run_directory.complete_stage('ingestion', {'nodes': nodes_df, 'edges': edges_df})
+    timer.stop("Data Ingestion and Preprocessing", nodes=len(nodes_df), edges=len(edges_df))
 
-    # Print the contents and columns of nodes_df to debug the KeyError
     logger.debug("Nodes DataFrame:")
     logger.debug(nodes_df.head())
     logger.debug(nodes_df.columns)
 
-    # Print the contents and columns of edges_df to debug the KeyError
     logger.debug("Edges DataFrame:")
     logger.debug(edges_df.head())
     logger.debug(edges_df.columns)
 
-    data_cleaner = DataCleaner()
-    nodes_df = data_cleaner.remove_communicated_cases(nodes_df)
-    p1_eclis = set(nodes_df['ecli'])  # Adjusted to use the correct key
-    edges_df = data_cleaner.filter_targets(edges_df, p1_eclis)  # Adjusted to use the correct key
-
-    # Save processed data
-    nodes_df.to_excel('data/processed/processed_nodes.xlsx', index=False)
-    edges_df.to_excel('data/processed/processed_edges.xlsx', index=False)
-
-    # Step 2: Graph Construction
-    logger.info("Step 2: Graph Construction")
-    timer.start()
-    graph_builder = GraphBuilder()
-    G = graph_builder.create_graph(nodes_df, edges_df)
-    timer.stop("Graph Construction")
-
-    # Remove self-loops
-    G.remove_edges_from(nx.selfloop_edges(G))
-
-    # Step 3: Centrality Calculation
-    logger.info("Step 3: Centrality Calculation")
-    
-    centrality_calculator = CentralityCalculator()
-    centrality_measures = {}
-    start_time = time.time()
-    
-    
-    def log_time_and_progress(message):
-        elapsed_time = time.time() - start_time
-        logger.info(f"{message} (Elapsed time: {elapsed_time:.2f} seconds)")
-    
-    calculators = [
-        ('degree_centrality', centrality_calculator.calculate_degree_centrality),
-        ('in_degree_centrality', centrality_calculator.calculate_in_degree_centrality),
-        ('core_number', centrality_calculator.calculate_core_number),
-        ('relative_in_degree_centrality', centrality_calculator.calculate_relative_in_degree_centrality),
-        ('eigenvector_centrality', centrality_calculator.calculate_eigenvector_centrality),
-        ('pagerank', centrality_calculator.calculate_pagerank),
-        ('current_flow_betweenness_centrality', centrality_calculator.calculate_current_flow_betweenness_centrality),
-        ('forest_closeness_centrality', centrality_calculator.calculate_forest_closeness_centrality),
-        ('trophic_level', centrality_calculator.calculate_trophic_level),
-        ('betweenness_centrality', centrality_calculator.calculate_betweenness_centrality),
-        ('current_flow_closeness_centrality', centrality_calculator.calculate_current_flow_closeness_centrality),
-        ('out_degree_centrality', centrality_calculator.calculate_out_degree_centrality),
-        ('hub_centrality', centrality_calculator.calculate_hub_centrality),
-        ('authority_centrality', centrality_calculator.calculate_authority_centrality),
-        ('harmonic_centrality', centrality_calculator.calculate_harmonic_centrality),
-        ('disruption', centrality_calculator.calculate_disruption),
-        ('closeness_centrality', centrality_calculator.calculate_closeness_centrality)
-    ]
-
-    for name, func in calculators:
+    # The graph is only built when centralities are left to compute
+    if 'centralities' in stages and not run_directory.stage_done('centralities'):
+        # Step 2: Graph Construction
+        logger.info("Step 2: Graph Construction")
+        timer.start("Graph Construction")
+        from graph.builder import GraphBuilder
+        from graph.storage import GraphStorage
+
+        # The graph is stored once per input and memory-mapped by later runs and the metric workers
+        graph_path = GraphStorage().path(raw_key)
+        if GraphStorage.exists(graph_path):
+            logger.info(f"Raw inputs unchanged, opening the stored graph in {graph_path}")
         try:
-            logger.info(f"Calculating {name}...")
-            measure_values = func(G)
-            centrality_measures[name] = measure_values
-            log_time_and_progress(f"Finished calculating {name}")
-        except Exception as e:
-            logger.error(f"Failed to calculate {name}: {e}")
-
-    logger.info("All centrality calculations completed")
+            csr_graph = GraphBuilder().create_stored_csr_graph(nodes_df, edges_df, graph_path)
+        except OSError as e:
+            logger.error(f"Failed to store the graph, keeping it in memory: {e}")
+            graph_path = None
+            csr_graph = GraphBuilder().create_csr_graph(nodes_df, edges_df)
+        timer.stop("Graph Construction", nodes=csr_graph.number_of_nodes(), edges=csr_graph.number_of_edges())
+
+        # Step 3: Centrality Calculation
+        logger.info("Step 3: Centrality Calculation")
+        timer.start("Centrality Calculation")
+        # Only the modules of the selected calculators are imported
+        registry = MetricRegistry(options={'max_workers': max_workers,
+                                           'current_flow_threshold': current_flow_threshold,
+                                           'trophic_method': trophic_method,
+                                           'approx_sample_size': approx_sample_size,
+                                           'approx_epsilon': approx_epsilon, 'approx_seed': approx_seed})
+        specs = registry.select(metrics, max_cost)
+        if incremental:
+            from centralities.incremental import IncrementalCentralities
+
+            state_options = {'max_workers': max_workers or 1, 'current_flow_threshold': current_flow_threshold,
+                             'trophic_method': trophic_method}
+            if os.path.exists(INCREMENTAL_STATE_PATH):
+                incremental_state = IncrementalCentralities.load(INCREMENTAL_STATE_PATH, **state_options)
+            else:
+                incremental_state = IncrementalCentralities(**state_options)
+            incremental_measures = incremental_state.refresh(csr_graph)
+            incremental_state.save(INCREMENTAL_STATE_PATH)
+            logger.info(f"Updated the centralities incrementally: {incremental_state.last_update}")
+            # The state maintains a fixed set of metrics, of which only the selected ones are kept
+            selected = [metric for spec in specs for metric in spec.provides]
+            unavailable = [metric for metric in selected if metric not in incremental_measures]
+            if unavailable:
+                logger.warning(f"Not maintained incrementally, left out: {', '.join(unavailable)}")
+            centrality_measures = {metric: incremental_measures[metric] for metric in selected
+                                   if metric in incremental_measures}
+            for metric, values in centrality_measures.items():
+                run_directory.save_metric(metric, values)
+        else:
+            from centralities.cache import CentralityCache
+            from centralities.scheduler import CentralityScheduler
+
+            calculators = registry.calculators(specs)
+            # Cached results are keyed by the calculator version and the options they depend on
+            metric_params = registry.params(specs)
+            metric_names = [metric for name, _ in calculators
+                            for metric in (name if isinstance(name, tuple) else (name,))]
+
+            # Metrics checkpointed by the interrupted run, then those of any previous run on the same graph
+            checkpointed = run_directory.load_metrics(metric_names)
+            if checkpointed:
+                logger.info(f"Resuming with {len(checkpointed)} centrality measures of the run directory")
+            metric_cache = CentralityCache()
+            cached_measures = metric_cache.load_measures(
+                csr_graph, [metric for metric in metric_names if metric not in checkpointed],
+                metric_params=metric_params)
+            if cached_measures:
+                logger.info(f"Loaded {len(cached_measures)} centrality measures from the cache")
+            for metric, values in cached_measures.items():
+                run_directory.save_metric(metric, values)
+            available = {**checkpointed, **cached_measures}
+            pending = [(name, calculator) for name, calculator in calculators
+                       if not all(metric in available for metric in (name if isinstance(name, tuple) else (name,)))]
+
+            scheduler = CentralityScheduler(max_workers=max_workers, timeout=metric_timeout, logger=logger,
+                                            tracer=tracer)
+            computed_measures = {}
+            if pending:
+                computed_measures = scheduler.run(csr_graph, pending, on_result=run_directory.save_metric,
+                                                  graph_path=graph_path, parallel=registry.parallel_names(specs))
+            try:
+                metric_cache.save_measures(csr_graph, computed_measures, metric_params=metric_params)
+            except Exception as e:
+                logger.error(f"Failed to cache the centrality measures: {e}")
+            available.update(computed_measures)
+            centrality_measures = {metric: available[metric] for metric in metric_names if metric in available}
+
+        run_directory.complete_stage('centralities', metrics=list(centrality_measures))
+        logger.info("All centrality calculations completed")
+        timer.stop("Centrality Calculation", metrics=len(centrality_measures))
+    else:
+        centrality_measures = run_directory.load_metrics()
+        logger.info(f"Loaded {len(centrality_measures)} centrality measures of the run directory")
 
     # Adding the centrality measures to the nodes DataFrame
     for measure_name, measure_values in centrality_measures.items():
@@ -114,84 +265,214 @@ def main():
         except Exception as e:
             logger.error(f"Failed to map {measure_name} to nodes DataFrame: {e}")
 
-    # Save the updated DataFrame
-    nodes_df.to_excel('data/processed/processed_nodes.xlsx', index=False)
-    logger.info("Saved the processed nodes DataFrame to Excel")
-
-    # Correlation analysis
-    correlation_analyzer = CorrelationAnalyzer()
-    centrality_columns = [col for col in nodes_df.columns if col not in ['ecli', 'court_branch', 'importance']]
-    
+    # Save the centrality columns next to the cleaned nodes
     try:
-        correlation_matrix = correlation_analyzer.compute_correlations(nodes_df, centrality_columns)
-        correlation_matrix.to_excel('data/processed/correlation_matrix.xlsx')
-        logger.info("Correlation matrix computed and saved.")
+        store.save('centralities', raw_key, nodes_df[['ecli'] + list(centrality_measures)])
+        logger.info("Saved the centrality measures to the artifact store")
     except Exception as e:
-        logger.error(f"Failed to compute correlation matrix: {e}")
+        logger.error(f"Failed to save the centrality measures: {e}")
 
-    # Correlation with importance
-    try:
-        importance_correlations = correlation_analyzer.compute_importance_correlations(nodes_df, centrality_columns)
-        importance_correlations.to_excel('data/processed/importance_correlations.xlsx')
-        logger.info("Importance correlations computed and saved.")
-    except Exception as e:
-        logger.error(f"Failed to compute importance correlations: {e}")
+    centrality_columns = [column for column in centrality_measures if column in nodes_df.columns]
+    os.makedirs(output_dir, exist_ok=True)
 
-    # Correlation with court branch
-    try:
-        court_branch_correlations = correlation_analyzer.compute_court_branch_correlations(nodes_df, centrality_columns)
-        court_branch_correlations.to_excel('data/processed/court_branch_correlations.xlsx')
-        logger.info("Court branch correlations computed and saved.")
-    except Exception as e:
-        logger.error(f"Failed to compute court branch correlations: {e}")
+    # Step 4: Correlation analysis
+    if 'correlation' in stages and not run_directory.stage_done('correlation'):
+        logger.info("Step 4: Correlation Analysis")
+        timer.start("Correlation Analysis")
+        from correlation.correlation import CorrelationAnalyzer
 
-    # Select numeric columns for regression analysis
-    numeric_df = nodes_df.select_dtypes(include=[float, int])
+        correlation_analyzer = CorrelationAnalyzer(max_workers=max_workers, n_resamples=n_resamples, seed=seed)
+        correlations = {}
+        try:
+            correlations['correlation_matrix'] = correlation_analyzer.compute_correlations(nodes_df,
+                                                                                           centrality_columns)
+            correlations['correlation_matrix'].to_excel(os.path.join(output_dir, 'correlation_matrix.xlsx'))
+            logger.info("Correlation matrix computed and saved.")
+        except Exception as e:
+            logger.error(f"Failed to compute correlation matrix: {e}")
 
-    # Check if the target column 'importance' is numeric
-    if 'importance' not in numeric_df.columns:
+        # Correlation with importance
         try:
-            numeric_df['importance'] = pd.to_numeric(nodes_df['importance'], errors='coerce')
+            correlations['importance_correlations'] = correlation_analyzer.compute_importance_correlations(
+                nodes_df, centrality_columns)
+            correlations['importance_correlations'].to_excel(os.path.join(output_dir, 'importance_correlations.xlsx'))
+            logger.info("Importance correlations computed and saved.")
         except Exception as e:
-            logger.error(f"Failed to convert 'importance' to numeric: {e}")
-            return
+            logger.error(f"Failed to compute importance correlations: {e}")
 
-    # Drop rows with NaN values in the target column
-    numeric_df = numeric_df.dropna(subset=['importance'])
+        # Correlation with court branch
+        try:
+            correlations['court_branch_correlations'] = correlation_analyzer.compute_court_branch_correlations(
+                nodes_df, centrality_columns)
+            correlations['court_branch_correlations'].to_excel(
+                os.path.join(output_dir, 'court_branch_correlations.xlsx'))
+            logger.info("Court branch correlations computed and saved.")
+        except Exception as e:
+            logger.error(f"Failed to compute court branch correlations: {e}")
 
-    # Save the processed nodes data
-    try:
-        nodes_df.to_excel('data/processed/processed_nodes.xlsx', index=False)
-        logger.info("Processed nodes data saved.")
-    except Exception as e:
-        logger.error(f"Failed to save processed nodes data: {e}")
+        run_directory.complete_stage('correlation', {name: pd.DataFrame(table) for name, table in correlations.items()})
+        timer.stop("Correlation Analysis")
 
-    end_time = time.time()
-    logger.info(f"Execution completed in {end_time - start_time:.2f} seconds.")
+    # Composite scores: search the best weighted combinations of centralities per ground truth
+    if 'composite' in stages and not run_directory.stage_done('composite'):
+        timer.start("Composite Score Search")
+        from correlation.composite_score import CompositeScoreCalculator
+        from correlation.composite_search import CompositeSearch
+        from correlation.correlation import CorrelationAnalyzer
 
-    # TODO - Implement composite score
-    # composite_calculator = CompositeScoreCalculator()
-    # nodes_df = composite_calculator.create_composite_score(nodes_df, centrality_columns)
+        frames = {}
+        try:
+            ground_truths = [col for col in ['importance'] if col in nodes_df.columns]
+            if 'court_branch' in nodes_df.columns:
+                nodes_df['court_branch_numeric'] = CorrelationAnalyzer.encode_court_branch(nodes_df['court_branch'])
+                ground_truths.append('court_branch_numeric')
+            composite_leaderboard = CompositeSearch(max_workers=max_workers).leaderboard(
+                nodes_df, centrality_columns, ground_truths)
+            composite_leaderboard.to_excel(os.path.join(output_dir, 'composite_leaderboard.xlsx'), index=False)
+            frames['leaderboard'] = composite_leaderboard
+            logger.info("Composite score leaderboard computed and saved.")
+
+            best = composite_leaderboard[composite_leaderboard['ground_truth'] == 'importance'].head(1)
+            if not best.empty:
+                composite_calculator = CompositeScoreCalculator()
+                nodes_df = composite_calculator.create_weighted_composite_score(
+                    nodes_df, list(best['measures'].iloc[0]), list(best['weights'].iloc[0]))
+                frames['composite_score'] = nodes_df[['ecli', 'composite_score']]
+        except Exception as e:
+            logger.error(f"Failed to search composite scores: {e}")
+        run_directory.complete_stage('composite', frames)
+        timer.stop("Composite Score Search")
+    elif run_directory.stage_done('composite'):
+        composite_score = run_directory.load_stage('composite').get('composite_score')
+        if composite_score is not None:
+            nodes_df = nodes_df.merge(composite_score, on='ecli', how='left')
 
     # Step 5: Visualization
-    logger.info("Step 5: Visualization")
-
-    if not os.path.exists('plots'):
-        os.makedirs('plots')
-        
-    plot_generator = PlotGenerator()
-
-    for centrality in centrality_columns:
+    if 'visualization' in stages and not run_directory.stage_done('visualization'):
+        logger.info("Step 5: Visualization")
+        timer.start("Visualization")
+        from visualization.batch import BatchPlotRenderer
+
+        plots = [(centrality, ground_truth, os.path.join(plots_dir, f'{centrality}_vs_{ground_truth}.png'))
+                 for centrality in centrality_columns for ground_truth in ['importance', 'court_branch']]
+        plot_results = BatchPlotRenderer(max_workers=max_workers).render(nodes_df, plots)
+        for output_path, status in plot_results.items():
+            if status not in ('rendered', 'skipped'):
+                logger.error(f"Failed to plot {output_path}: {status}")
+        rendered = sum(status == 'rendered' for status in plot_results.values())
+        skipped = sum(status == 'skipped' for status in plot_results.values())
+        logger.info(f"Rendered {rendered} plots, skipped {skipped} unchanged plots")
+        run_directory.complete_stage('visualization', rendered=rendered, skipped=skipped)
+        timer.stop("Visualization", rendered=rendered, skipped=skipped)
+
+    # Step 6: Optional Excel export
+    if 'export' in stages and not run_directory.stage_done('export'):
         try:
-            importance_output_path = f'plots/{centrality}_vs_importance.png'
-            plot_generator.plot_correlation(nodes_df, centrality, 'importance', importance_output_path)
-
-            branch_output_path = f'plots/{centrality}_vs_court_branch.png'
-            plot_generator.plot_correlation(nodes_df, centrality, 'court_branch', branch_output_path)
-
+            export_df = pd.concat([nodes_df, node_table.load_columns()], axis=1)
+            export_df.to_excel(os.path.join(output_dir, 'processed_nodes.xlsx'), index=False)
+            edges_df.to_excel(os.path.join(output_dir, 'processed_edges.xlsx'), index=False)
+            run_directory.complete_stage('export')
+            logger.info("Processed nodes and edges exported to Excel.")
         except Exception as e:
-            logger.error(f"Failed to plot correlation for {centrality}: {e}")
+            logger.error(f"Failed to export processed data to Excel: {e}")
+
+    try:
+        logger.info(f"Trace of the run saved to {tracer.save(directory=run_directory.path)}")
+    except Exception as e:
+        logger.error(f"Failed to save the trace of the run: {e}")
+    set_tracer(None)
+    return run_directory.path
+
+
+def build_parser():
+    """
+    Builds the command line parser of the tool. Options left out are absent from the parsed
+    namespace, so that they do not override the configuration file or the resumed run.
+
+    Returns:
+    argparse.ArgumentParser: The parser.
+    """
+    parser = argparse.ArgumentParser(prog='graph_analysis_tool', argument_default=argparse.SUPPRESS,
+                                     description='Compute centralities of a legal citation network and compare '
+                                                 'them with ground truths.')
+    parser.add_argument('--config', help='JSON file of options, keyed by the parameter names of main.run.')
+    parser.add_argument('--nodes', dest='nodes_path', help=f'Raw nodes JSON file (default {NODES_PATH}).')
+    parser.add_argument('--edges', dest='edges_path', help=f'Raw edges JSON file (default {EDGES_PATH}).')
+    parser.add_argument('--output-dir', help=f'Directory of the Excel outputs (default {OUTPUT_DIR}).')
+    parser.add_argument('--plots-dir', help=f'Directory of the plots (default {PLOTS_DIR}).')
+    parser.add_argument('--runs-dir', help=f'Directory of the run directories (default {RUNS_DIR}).')
+    parser.add_argument('--run-dir', help='Run directory to use, a new one in the runs directory by default.')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue the run in --run-dir, or the latest run, skipping what it completed.')
+    parser.add_argument('--stages', nargs='+', choices=STAGES,
+                        help=f"Stages to run (default {' '.join(DEFAULT_STAGES)}).")
+    parser.add_argument('--metrics', nargs='+', help='Metrics or calculators to compute, see --list-metrics.')
+    parser.add_argument('--max-cost', choices=COST_CLASSES, help='Most expensive cost class of the metrics.')
+    parser.add_argument('--list-metrics', action='store_true', help='List the available metrics and exit.')
+    parser.add_argument('--export-excel', action='store_true', help='Also export the processed nodes and edges.')
+    parser.add_argument('--workers', dest='max_workers', type=int, help='Number of processes (default all CPUs).')
+    parser.add_argument('--metric-timeout', type=float, help='Maximum number of seconds of a single metric.')
+    parser.add_argument('--current-flow-threshold', type=int,
+                        help='Component size above which the current-flow centralities are approximated.')
+    parser.add_argument('--trophic-method', choices=['linear', 'topological'],
+                        help='Method of the trophic levels (default linear).')
+    parser.add_argument('--approx-sample-size', type=int,
+                        help='Pivots of the approximate betweenness and closeness centralities.')
+    parser.add_argument('--approx-epsilon', type=float,
+                        help='Target absolute error of the approximate centralities when no sample size is given '
+                             '(default 0.05).')
+    parser.add_argument('--approx-seed', type=int, help='Seed of the pivots of the approximate centralities.')
+    parser.add_argument('--incremental', action='store_true', help='Update the centralities of the previous run.')
+    parser.add_argument('--resamples', dest='n_resamples', type=int,
+                        help='Bootstrap resamples and permutations of the ground truth correlations.')
+    parser.add_argument('--seed', type=int, help='Seed of the resamples.')
+    parser.add_argument('--trace-memory', action='store_true', help='Trace the allocations of every span.')
+    parser.add_argument('--profile', nargs='+', help='Names of the stages and metrics to profile.')
+    return parser
+
+
+def main(argv=None):
+    """
+    Main function to orchestrate the graph analysis tool workflow from the command line.
+
+    Options are taken, by increasing priority, from the defaults of run, the run being
+    resumed, the configuration file and the command line.
+
+    Parameters:
+    argv (list, optional): Command line arguments, sys.argv by default.
+
+    Returns:
+    int: Exit status.
+    """
+    parser = build_parser()
+    options = vars(parser.parse_args(argv))
+
+    if options.pop('list_metrics', False):
+        for spec in MetricRegistry().specs.values():
+            print(f"{spec.name:<38} {spec.cost:<10} {', '.join(spec.provides)}")
+        return 0
+
+    config = {}
+    config_path = options.pop('config', None)
+    if config_path is not None:
+        with open(config_path) as f:
+            config = json.load(f)
+        valid = set(inspect.signature(run).parameters) - {'resume'}
+        unknown = sorted(set(config) - valid)
+        if unknown:
+            parser.error(f"unknown options in {config_path}: {', '.join(unknown)}")
+
+    resume = options.pop('resume', False)
+    if resume:
+        run_dir = options.get('run_dir') or config.get('run_dir') or RunDirectory.latest(
+            options.get('runs_dir') or config.get('runs_dir') or RUNS_DIR)
+        if run_dir is None or not os.path.exists(os.path.join(run_dir, RunDirectory.MANIFEST)):
+            parser.error("no run to resume")
+        config = {**RunDirectory(run_dir).manifest['config'], **config, 'run_dir': run_dir}
+
+    run(**{**config, **options}, resume=resume)
+    return 0
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,497 @@
+import cProfile
+import itertools
+import json
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Not available on Windows, where the peak RSS is not reported
+    resource = None
+
+TRACES_DIR = 'data/processed/traces'
+
+# Number of functions and stacks kept in the record of a profiled span
+PROFILE_TOP = 25
+SAMPLES_TOP = 50
+
+# Tracer of the current process, used by code that is not handed one
+_current_tracer = None
+
+# Span numbers, shared by the tracers of a process so that merged spans keep distinct identifiers
+_span_numbers = itertools.count()
+
+
+def current_rss():
+    """
+    Returns the resident set size of the process in bytes, None where it cannot be read.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss():
+    """
+    Returns the peak resident set size of the process in bytes, None where it is not reported.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def get_tracer():
+    """
+    Returns the tracer of the current process, a disabled one if none was set.
+
+    Returns:
+    Tracer: The tracer spans should be recorded on.
+    """
+    return _current_tracer if _current_tracer is not None else _DISABLED
+
+
+def set_tracer(tracer):
+    """
+    Sets the tracer of the current process.
+
+    Parameters:
+    tracer (Tracer, optional): The tracer, None to disable tracing.
+
+    Returns:
+    Tracer: The previous tracer, None if none was set.
+    """
+    global _current_tracer
+    previous = _current_tracer
+    _current_tracer = tracer
+    return previous
+
+
+class _StackSampler:
+    """Class to sample the Python stack of one thread at a fixed interval from a background thread."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the sampling.
+
+        Returns:
+        collections.Counter: Number of samples per stack, in the collapsed format of flame
+        graphs: frames from the outermost to the innermost, separated by semicolons.
+        """
+        self._stop.set()
+        self._thread.join()
+        return self.counts
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+
+class Span:
+    """Class holding the measurements of one traced section of code."""
+
+    def __init__(self, span_id, parent, name, category, args):
+        """
+        Parameters:
+        span_id (str): Identifier of the span, unique across processes.
+        parent (str, optional): Identifier of the enclosing span.
+        name (str): Name of the span.
+        category (str): Level of the span, e.g. 'stage', 'metric' or 'component'.
+        args (dict): Attributes of the span, such as the size of the graph it works on.
+        """
+        self.id = span_id
+        self.parent = parent
+        self.name = name
+        self.category = category
+        self.args = dict(args)
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+        self.start = None
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.rss_start_bytes = None
+        self.rss_end_bytes = None
+        self.peak_rss_bytes = None
+        self.peak_rss_growth_bytes = None
+        self.traced_delta_bytes = None
+        self.traced_peak_bytes = None
+        self.profile = None
+        self.samples = None
+        self._start_wall = None
+        self._start_cpu = None
+        self._start_peak_rss = None
+        self._start_traced = None
+        self._traced_peak = 0
+        self._profiler = None
+        self._sampler = None
+
+    def to_dict(self):
+        """
+        Returns the measurements of the span.
+
+        Returns:
+        dict: The identifiers, name, category, process and thread, start time (seconds since
+        the epoch) and measurements of the span, with its attributes under 'args'.
+        """
+        return {
+            'id': self.id,
+            'parent': self.parent,
+            'name': self.name,
+            'category': self.category,
+            'pid': self.pid,
+            'tid': self.tid,
+            'start': self.start,
+            'wall_seconds': self.wall_seconds,
+            'cpu_seconds': self.cpu_seconds,
+            'rss_start_bytes': self.rss_start_bytes,
+            'rss_end_bytes': self.rss_end_bytes,
+            'peak_rss_bytes': self.peak_rss_bytes,
+            'peak_rss_growth_bytes': self.peak_rss_growth_bytes,
+            'traced_delta_bytes': self.traced_delta_bytes,
+            'traced_peak_bytes': self.traced_peak_bytes,
+            'profile': self.profile,
+            'samples': self.samples,
+            'args': self.args,
+        }
+
+
+class Tracer:
+    """Class to record nested spans of a run (stage, metric, component) and their resource usage.
+
+    Every span measures its wall time, the CPU time of the process, the resident set size
+    at its start and end and how much it raised the peak RSS of the process. With
+    trace_memory, it also records the change of the memory traced by tracemalloc and the
+    peak above its start, at the cost of slowing down allocations while tracing.
+
+    Spans listed in profile are profiled, with cProfile or by sampling the stack of their
+    thread every sampling_interval seconds; the hottest functions or stacks are kept in
+    the span and the full profile is written to profile_dir when given. Only one cProfile
+    can run at a time, so profiled spans nested in a profiled span are only timed.
+
+    Spans measured in other processes, e.g. by the workers of a pool, are added with
+    extend. The run is written as a Chrome trace, which chrome://tracing and Perfetto
+    open, with all measurements in the arguments of the events.
+    """
+
+    def __init__(self, logger=None, enabled=True, trace_memory=False, profile=None, profiler='cprofile',
+                 sampling_interval=0.005, profile_dir=None):
+        """
+        Parameters:
+        logger (logging.Logger, optional): Logger receiving the measurements of every closed span at debug level.
+        enabled (bool): Whether spans are measured and recorded at all.
+        trace_memory (bool): Whether to record the Python allocations of every span with tracemalloc.
+        profile (bool or collection, optional): True to profile every span, or the names of the spans to profile.
+        profiler (str): 'cprofile' for deterministic profiling, 'sampling' for stack sampling.
+        sampling_interval (float): Seconds between two stack samples.
+        profile_dir (str, optional): Directory receiving the profiles, as .prof files of cProfile
+            or collapsed stacks of the sampler.
+        """
+        if profiler not in ('cprofile', 'sampling'):
+            raise ValueError(f"Unknown profiler: {profiler}")
+        self.logger = logger or logging.getLogger(__name__)
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.profile = profile
+        self.profiler = profiler
+        self.sampling_interval = sampling_interval
+        self.profile_dir = profile_dir
+        self.records = []
+        self.origin = time.time()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._profiling = False
+        self._started_tracemalloc = False
+        self._open_traced = 0
+
+    def settings(self):
+        """
+        Returns the settings of the tracer, to create an equivalent tracer in another process.
+
+        Returns:
+        dict: Keyword arguments of Tracer, without the logger.
+        """
+        return {'enabled': self.enabled, 'trace_memory': self.trace_memory, 'profile': self.profile,
+                'profiler': self.profiler, 'sampling_interval': self.sampling_interval,
+                'profile_dir': self.profile_dir}
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def current(self):
+        """
+        Returns the innermost open span of the current thread.
+
+        Returns:
+        Span: The span, None outside of any span.
+        """
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name, category='stage', profile=None, **args):
+        """
+        Records the enclosed code as a span.
+
+        Parameters:
+        name (str): Name of the span.
+        category (str): Level of the span, e.g. 'stage', 'metric' or 'component'.
+        profile (bool, optional): Whether to profile the span, as set by the tracer if None.
+        **args: Attributes of the span, such as the size of the graph it works on.
+
+        Returns:
+        Span: The open span, whose args can still be extended.
+        """
+        span = self.begin(name, category, profile, **args)
+        try:
+            yield span
+        finally:
+            self.end(span)
+
+    def begin(self, name, category='stage', profile=None, **args):
+        """
+        Opens a span nested in the innermost open span of the current thread; it must be closed with end.
+
+        Parameters:
+        name (str): Name of the span.
+        category (str): Level of the span, e.g. 'stage', 'metric' or 'component'.
+        profile (bool, optional): Whether to profile the span, as set by the tracer if None.
+        **args: Attributes of the span.
+
+        Returns:
+        Span: The open span.
+        """
+        parent = self.current()
+        span = Span(f"{os.getpid()}:{next(_span_numbers)}", parent.id if parent else None, name, category, args)
+        if not self.enabled:
+            return span
+
+        if self.trace_memory:
+            with self._lock:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    self._started_tracemalloc = True
+                self._open_traced += 1
+            span._start_traced = self._update_traced_peaks()
+        span.rss_start_bytes = current_rss()
+        span._start_peak_rss = peak_rss()
+        self._stack().append(span)
+
+        if profile is None:
+            profile = self.profile is True or (self.profile not in (None, False) and name in self.profile)
+        if profile:
+            self._start_profile(span)
+        span.start = time.time()
+        span._start_cpu = time.process_time()
+        span._start_wall = time.perf_counter()
+        return span
+
+    def end(self, span, name=None, **args):
+        """
+        Closes a span and records its measurements.
+
+        Parameters:
+        span (Span): The span returned by begin.
+        name (str, optional): New name of the span, e.g. once the task is known.
+        **args: Attributes added to the span.
+
+        Returns:
+        Span: The closed span.
+        """
+        if name is not None:
+            span.name = name
+        span.args.update(args)
+        if not self.enabled or span._start_wall is None or span.wall_seconds is not None:
+            return span
+
+        span.wall_seconds = time.perf_counter() - span._start_wall
+        span.cpu_seconds = time.process_time() - span._start_cpu
+        self._stop_profile(span)
+        span.rss_end_bytes = current_rss()
+        span.peak_rss_bytes = peak_rss()
+        if span.peak_rss_bytes is not None and span._start_peak_rss is not None:
+            span.peak_rss_growth_bytes = span.peak_rss_bytes - span._start_peak_rss
+        stack = self._stack()
+        if span in stack:
+            stack.remove(span)
+
+        if span._start_traced is not None:
+            traced = self._update_traced_peaks(span)
+            span.traced_delta_bytes = traced - span._start_traced
+            span.traced_peak_bytes = max(span._traced_peak - span._start_traced, 0)
+            with self._lock:
+                self._open_traced -= 1
+                if not self._open_traced and self._started_tracemalloc:
+                    tracemalloc.stop()
+                    self._started_tracemalloc = False
+
+        record = span.to_dict()
+        with self._lock:
+            self.records.append(record)
+        self.logger.debug(f"Span {span.name}: {span.wall_seconds:.3f} s wall, {span.cpu_seconds:.3f} s CPU")
+        return span
+
+    def _update_traced_peaks(self, closing=None):
+        """
+        Folds the tracemalloc peak since the last span boundary into every open span and
+        resets it, so that nested spans each get their own peak.
+
+        Parameters:
+        closing (Span, optional): Span being closed, already off the stack.
+
+        Returns:
+        int: The memory currently traced, in bytes.
+        """
+        current, peak = tracemalloc.get_traced_memory()
+        for open_span in self._stack() + ([closing] if closing is not None else []):
+            open_span._traced_peak = max(open_span._traced_peak, peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def _start_profile(self, span):
+        if self.profiler == 'sampling':
+            span._sampler = _StackSampler(threading.get_ident(), self.sampling_interval)
+            span._sampler.start()
+            return
+        if self._profiling:
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler, e.g. of an enclosing tracer, is already active
+            return
+        span._profiler = profiler
+        self._profiling = True
+
+    def _stop_profile(self, span):
+        if span._sampler is not None:
+            counts = span._sampler.stop()
+            span._sampler = None
+            span.samples = dict(counts.most_common(SAMPLES_TOP))
+            path = self._profile_path(span, 'folded')
+            if path is not None:
+                with open(path, 'w') as f:
+                    f.writelines(f"{stack} {count}\n" for stack, count in counts.most_common())
+        if span._profiler is None:
+            return
+        profiler = span._profiler
+        profiler.disable()
+        span._profiler = None
+        self._profiling = False
+
+        stats = pstats.Stats(profiler)
+        stats.sort_stats('cumulative')
+        span.profile = []
+        for function in stats.fcn_list[:PROFILE_TOP]:
+            _, calls, own_time, cumulative_time, _ = stats.stats[function]
+            span.profile.append({'function': pstats.func_std_string(function), 'calls': calls,
+                                 'own_seconds': own_time, 'cumulative_seconds': cumulative_time})
+        path = self._profile_path(span, 'prof')
+        if path is not None:
+            profiler.dump_stats(path)
+
+    def _profile_path(self, span, extension):
+        if self.profile_dir is None:
+            return None
+        os.makedirs(self.profile_dir, exist_ok=True)
+        name = re.sub(r'[^\w.-]+', '_', span.name)
+        return os.path.join(self.profile_dir, f"{span.id.replace(':', '-')}_{name}.{extension}")
+
+    def extend(self, records):
+        """
+        Adds spans recorded by another tracer, e.g. in a worker process. Spans without a
+        parent are nested in the innermost open span of the current thread.
+
+        Parameters:
+        records (list): Span records, as returned by Span.to_dict.
+        """
+        parent = self.current()
+        with self._lock:
+            for record in records:
+                if record['parent'] is None and parent is not None:
+                    record = dict(record, parent=parent.id)
+                self.records.append(record)
+
+    def to_chrome_trace(self):
+        """
+        Converts the recorded spans to the Chrome trace event format.
+
+        Returns:
+        dict: The trace, with one complete event per span, timed in microseconds since the
+        tracer was created, and the measurements of the span as arguments.
+        """
+        events = []
+        main_pid = os.getpid()
+        for pid in sorted({record['pid'] for record in self.records}):
+            events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+                           'args': {'name': 'main' if pid == main_pid else f'worker {pid}'}})
+        for record in sorted(self.records, key=lambda record: record['start']):
+            args = {key: value for key, value in record.items()
+                    if key not in ('name', 'category', 'pid', 'tid', 'start', 'args') and value is not None}
+            args.update(record['args'])
+            events.append({
+                'name': record['name'],
+                'cat': record['category'],
+                'ph': 'X',
+                'ts': (record['start'] - self.origin) * 1e6,
+                'dur': record['wall_seconds'] * 1e6,
+                'pid': record['pid'],
+                'tid': record['tid'],
+                'args': args,
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms',
+                'otherData': {'origin': self.origin, 'trace_memory': self.trace_memory}}
+
+    def save(self, path=None, directory=TRACES_DIR):
+        """
+        Writes the recorded spans as a Chrome trace.
+
+        Parameters:
+        path (str, optional): Path of the JSON file, a file named after the creation time of
+            the tracer in directory by default.
+        directory (str): Directory of the trace when no path is given.
+
+        Returns:
+        str: Path of the written file.
+        """
+        if path is None:
+            path = os.path.join(directory, time.strftime('trace-%Y%m%d-%H%M%S', time.localtime(self.origin)) + '.json')
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            # Numpy scalars among the span attributes
+            json.dump(self.to_chrome_trace(), f, default=lambda value: value.item() if hasattr(value, 'item')
+                      else str(value))
+        return path
+
+
+_DISABLED = Tracer(enabled=False)
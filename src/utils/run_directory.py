@@ -0,0 +1,196 @@
+import datetime
+import json
+import os
+import tempfile
+
+RUNS_DIR = 'data/runs'
+
+
+class RunDirectory:
+    """Class to checkpoint a pipeline run so that a killed run can resume where it stopped.
+
+    A run directory holds a JSON manifest and uncompressed Arrow IPC files. The manifest
+    records the configuration of the run, the fingerprint of its raw inputs, the stages
+    that completed and the metrics computed so far, each metric in a file of its own
+    written as soon as it is done. Files and the manifest are written to a temporary name
+    and renamed into place, so a run killed at any point leaves a consistent directory.
+    """
+
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, path):
+        """
+        Parameters:
+        path (str): The run directory; the manifest is read if it exists.
+        """
+        self.path = path
+        manifest_path = os.path.join(path, self.MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {'created': datetime.datetime.now().isoformat(timespec='seconds'), 'config': {},
+                             'inputs': None, 'stages': {}, 'metrics': {}}
+
+    @classmethod
+    def create(cls, root=RUNS_DIR):
+        """
+        Creates a new run directory named after the current time.
+
+        Parameters:
+        root (str): Directory of the runs.
+
+        Returns:
+        RunDirectory: The new run directory.
+        """
+        os.makedirs(root, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(root, stamp)
+        suffix = 1
+        while os.path.exists(path):
+            suffix += 1
+            path = os.path.join(root, f'{stamp}-{suffix}')
+        os.makedirs(path)
+        return cls(path)
+
+    @staticmethod
+    def latest(root=RUNS_DIR):
+        """
+        Returns the most recently created run directory with a manifest.
+
+        Parameters:
+        root (str): Directory of the runs.
+
+        Returns:
+        str: Path of the run directory, None if there is none.
+        """
+        if not os.path.isdir(root):
+            return None
+        runs = [entry.path for entry in os.scandir(root)
+                if entry.is_dir() and os.path.exists(os.path.join(entry.path, RunDirectory.MANIFEST))]
+        return max(runs, key=lambda path: os.path.getmtime(os.path.join(path, RunDirectory.MANIFEST)), default=None)
+
+    def start(self, config, inputs):
+        """
+        Records the configuration and input fingerprint of the run, checking that a resumed
+        run still reads the same inputs.
+
+        Parameters:
+        config (dict): The configuration of the run, JSON serializable.
+        inputs (str): Fingerprint of the raw input files.
+        """
+        if self.manifest['inputs'] is not None and self.manifest['inputs'] != inputs:
+            raise ValueError(f"The inputs changed since the run in {self.path} started, it cannot be resumed")
+        self.manifest['config'] = config
+        self.manifest['inputs'] = inputs
+        self._write_manifest()
+
+    def stage_done(self, stage):
+        return self.manifest['stages'].get(stage, {}).get('status') == 'done'
+
+    def complete_stage(self, stage, frames=None, **info):
+        """
+        Saves the outputs of a stage and marks it as done.
+
+        Parameters:
+        stage (str): Name of the stage.
+        frames (dict, optional): DataFrames to keep, by name.
+        **info: JSON serializable details recorded in the manifest.
+        """
+        files = {name: self.save_frame(f'{stage}-{name}', df) for name, df in (frames or {}).items()}
+        self.manifest['stages'][stage] = {'status': 'done', 'files': files,
+                                          'finished': datetime.datetime.now().isoformat(timespec='seconds'), **info}
+        self._write_manifest()
+
+    def load_stage(self, stage):
+        """
+        Loads the outputs of a completed stage.
+
+        Parameters:
+        stage (str): Name of the stage.
+
+        Returns:
+        dict: The DataFrames saved with the stage, by name.
+        """
+        files = self.manifest['stages'][stage].get('files', {})
+        return {name: self.load_frame(file_name) for name, file_name in files.items()}
+
+    def save_metric(self, metric, values):
+        """
+        Saves one computed metric.
+
+        Parameters:
+        metric (str): Name of the metric.
+        values (dict): Dictionary of nodes with the metric values.
+        """
+        import pandas as pd
+
+        df = pd.DataFrame({'node': list(values.keys()), 'value': list(values.values())})
+        self.manifest['metrics'][metric] = self.save_frame(f'metric-{metric}', df)
+        self._write_manifest()
+
+    def load_metrics(self, metrics=None):
+        """
+        Loads the metrics computed so far.
+
+        Parameters:
+        metrics (list, optional): Names of the metrics to load, all saved ones by default.
+
+        Returns:
+        dict: Dictionary of metric names with node dictionaries as values.
+        """
+        measures = {}
+        for metric, file_name in self.manifest['metrics'].items():
+            if metrics is None or metric in metrics:
+                df = self.load_frame(file_name)
+                measures[metric] = dict(zip(df['node'], df['value']))
+        return measures
+
+    def save_frame(self, name, df):
+        """
+        Saves a DataFrame as an uncompressed Arrow IPC file in the run directory.
+
+        Parameters:
+        name (str): Name of the file, without extension.
+        df (pd.DataFrame): The DataFrame to save; a named or non-default index is kept as columns.
+
+        Returns:
+        str: Name of the written file, relative to the run directory.
+        """
+        import pandas as pd
+        import pyarrow.feather as feather
+
+        file_name = f'{name}.arrow'
+        if not isinstance(df.index, pd.RangeIndex) or df.index.name is not None:
+            df = df.reset_index()
+        df = df.reset_index(drop=True)
+        df.columns = [str(column) for column in df.columns]
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.arrow.tmp')
+        os.close(fd)
+        try:
+            feather.write_feather(df, tmp_path, compression='uncompressed')
+            os.replace(tmp_path, os.path.join(self.path, file_name))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return file_name
+
+    def load_frame(self, file_name):
+        """
+        Loads a DataFrame saved in the run directory.
+
+        Parameters:
+        file_name (str): Name of the file, relative to the run directory.
+
+        Returns:
+        pd.DataFrame: The saved data.
+        """
+        import pyarrow.feather as feather
+
+        return feather.read_table(os.path.join(self.path, file_name), memory_map=True).to_pandas()
+
+    def _write_manifest(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix='.json.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.manifest, f, indent=2, default=str)
+        os.replace(tmp_path, os.path.join(self.path, self.MANIFEST))
@@ -1,19 +1,55 @@
-import time
 import logging
 
+from utils.instrumentation import Tracer, get_tracer
+
+
 class Timer:
-    def __init__(self, logger=None):
-        self.start_time = None
+    """Class to time consecutive tasks as spans of a tracer, logging how long each one took."""
+
+    def __init__(self, logger=None, tracer=None):
+        """
+        Parameters:
+        logger (logging.Logger, optional): Logger used to report the timings.
+        tracer (Tracer, optional): Tracer recording the tasks, the tracer of the process by default.
+            The timer keeps a tracer of its own when tracing is disabled.
+        """
+        self.span = None
         self.logger = logger or logging.getLogger(__name__)
+        tracer = tracer or get_tracer()
+        if not tracer.enabled:
+            tracer = Tracer(logger=self.logger)
+        self.tracer = tracer
 
-    def start(self):
-        self.start_time = time.time()
+    def start(self, task_name="Task", category='stage', **args):
+        """
+        Starts timing a task.
+
+        Parameters:
+        task_name (str): Name of the task, which decides whether the tracer profiles it.
+        category (str): Level of the span of the task.
+        **args: Attributes of the span.
+        """
+        if self.span is not None:
+            self.tracer.end(self.span)
+        self.span = self.tracer.begin(task_name, category, **args)
         self.logger.info("Timer started")
 
-    def stop(self, task_name="Task"):
-        if self.start_time is None:
+    def stop(self, task_name=None, **args):
+        """
+        Stops timing the task and logs its duration.
+
+        Parameters:
+        task_name (str, optional): Name of the task, the name given to start by default.
+        **args: Attributes added to the span, e.g. sizes only known once the task is done.
+
+        Returns:
+        Span: The span of the task, None if the timer was not started.
+        """
+        if self.span is None:
             self.logger.warning("Timer was not started")
-            return
-        elapsed_time = time.time() - self.start_time
-        self.logger.info(f"{task_name} completed in {elapsed_time:.2f} seconds")
-        self.start_time = None
\ No newline at end of file
+            return None
+        span = self.tracer.end(self.span, name=task_name, **args)
+        self.span = None
+        self.logger.info(f"{span.name} completed in {span.wall_seconds:.2f} seconds "
+                         f"(CPU time: {span.cpu_seconds:.2f} seconds)")
+        return span
@@ -0,0 +1,247 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Figure and axes of the current worker process, created once by _init_worker and reused for every plot
+_worker_figure = None
+_worker_axes = None
+
+# Bump when the drawing changes, so that plots of an older renderer are not skipped
+RENDERER_VERSION = 1
+
+
+def _init_worker(figsize, dpi):
+    global _worker_figure, _worker_axes
+    # A figure outside pyplot renders with Agg and leaves the process' backend alone
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    _worker_figure = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(_worker_figure)
+    _worker_axes = _worker_figure.subplots()
+
+
+def _regression_band(x, y, grid, z=1.96):
+    """
+    Fits a least-squares line and its 95% confidence band at the given points.
+
+    Parameters:
+    x (np.ndarray): The x values.
+    y (np.ndarray): The y values.
+    grid (np.ndarray): Points at which the line is evaluated.
+    z (float): Normal quantile of the band.
+
+    Returns:
+    tuple: Arrays of the fitted values and of the half-widths of the band, None without a line.
+    """
+    n = len(x)
+    x_mean = x.mean()
+    sxx = ((x - x_mean) ** 2).sum()
+    if n < 3 or sxx == 0:
+        return None, None
+    slope = ((x - x_mean) * (y - y.mean())).sum() / sxx
+    intercept = y.mean() - slope * x_mean
+    residual = y - (intercept + slope * x)
+    s = np.sqrt((residual ** 2).sum() / (n - 2))
+    fitted = intercept + slope * grid
+    return fitted, z * s * np.sqrt(1.0 / n + (grid - x_mean) ** 2 / sxx)
+
+
+def _draw(task):
+    """
+    Draws one correlation plot on the worker figure and saves it.
+
+    Parameters:
+    task (tuple): Output path, x and y arrays, the scatter sample, the column names, the
+        y tick labels of a categorical column and the hexbin flag.
+
+    Returns:
+    tuple: The output path and None, or the error message.
+    """
+    output_path, x, y, sample, x_col, y_col, y_labels, hexbin = task
+    ax = _worker_axes
+    try:
+        ax.clear()
+        if hexbin:
+            ax.hexbin(x, y, gridsize=80, mincnt=1, bins='log', cmap='Blues')
+        else:
+            ax.scatter(x[sample], y[sample], s=10, alpha=0.8, color='C0', linewidths=0)
+        grid = np.linspace(x.min(), x.max(), 100) if len(x) else np.empty(0)
+        fitted, band = _regression_band(x, y, grid)
+        if fitted is not None:
+            ax.fill_between(grid, fitted - band, fitted + band, color='r', alpha=0.15, linewidth=0)
+            ax.plot(grid, fitted, color='r', alpha=0.7, lw=2)
+        if y_labels is not None:
+            ax.set_yticks(range(len(y_labels)))
+            ax.set_yticklabels(y_labels)
+        ax.set_title(f'Correlation between {x_col} and {y_col}')
+        ax.set_xlabel(x_col)
+        ax.set_ylabel(y_col)
+        ax.grid(True)
+        directory = os.path.dirname(output_path) or '.'
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.png.tmp')
+        os.close(fd)
+        try:
+            # Category labels can be wider than the default margin
+            _worker_figure.savefig(tmp_path, format='png', bbox_inches='tight' if y_labels is not None else None)
+            os.replace(tmp_path, output_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return output_path, None
+    except Exception as e:
+        return output_path, str(e)
+
+
+class BatchPlotRenderer:
+    """Class to render many correlation plots at once, headless and in parallel.
+
+    Plots are drawn with the Agg backend in a process pool; every worker creates one
+    figure and clears and reuses it for all of its plots. Instead of seaborn's regplot,
+    whose bootstrapped confidence band dominates the cost, the regression line gets its
+    analytic 95% band. Scatters beyond max_points are drawn from a fixed random sample,
+    and beyond hexbin_points as a hexbin density; the line is always fitted on all points.
+
+    A JSON manifest next to the plots records a hash of the inputs of every plot; plots
+    whose inputs have not changed since the last run, and whose files still exist, are
+    skipped.
+    """
+
+    def __init__(self, max_workers=1, max_points=20000, hexbin_points=200000, figsize=(10, 6), dpi=100,
+                 manifest_name='.plot_manifest.json'):
+        """
+        Parameters:
+        max_workers (int, optional): Number of worker processes, the number of CPUs if None.
+        max_points (int): Largest number of points drawn in a scatter.
+        hexbin_points (int): Number of points from which a hexbin replaces the scatter.
+        figsize (tuple): Size of the figures in inches.
+        dpi (int): Resolution of the figures.
+        manifest_name (str): File name of the manifest, in the directory of the plots.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_points = max_points
+        self.hexbin_points = hexbin_points
+        self.figsize = figsize
+        self.dpi = dpi
+        self.manifest_name = manifest_name
+
+    def render(self, data_df, plots, force=False):
+        """
+        Renders the correlation plots whose inputs changed.
+
+        Parameters:
+        data_df (pd.DataFrame): DataFrame containing the data.
+        plots (list): Tuples of the x column, the y column and the output path.
+        force (bool): Render every plot, even if its inputs are unchanged.
+
+        Returns:
+        dict: Dictionary of output paths with 'rendered', 'skipped' or the error message as values.
+        """
+        results = {}
+        manifests = {}
+        tasks, keys = [], {}
+        for x_col, y_col, output_path in plots:
+            try:
+                task, key = self._prepare(data_df, x_col, y_col, output_path)
+            except Exception as e:
+                results[output_path] = str(e)
+                continue
+            directory = os.path.dirname(output_path) or '.'
+            if directory not in manifests:
+                manifests[directory] = self._load_manifest(directory)
+            name = os.path.basename(output_path)
+            if not force and manifests[directory].get(name) == key and os.path.exists(output_path):
+                results[output_path] = 'skipped'
+                continue
+            os.makedirs(directory, exist_ok=True)
+            tasks.append(task)
+            keys[output_path] = key
+
+        for output_path, error in self._run(tasks):
+            directory = os.path.dirname(output_path) or '.'
+            name = os.path.basename(output_path)
+            if error is None:
+                manifests[directory][name] = keys[output_path]
+                results[output_path] = 'rendered'
+            else:
+                manifests[directory].pop(name, None)
+                results[output_path] = error
+        for directory, manifest in manifests.items():
+            self._save_manifest(directory, manifest)
+        return results
+
+    def _prepare(self, data_df, x_col, y_col, output_path):
+        """
+        Extracts the arrays of one plot and hashes its inputs.
+
+        Parameters:
+        data_df (pd.DataFrame): DataFrame containing the data.
+        x_col (str): The column for the x-axis.
+        y_col (str): The column for the y-axis; a non-numeric column is drawn by category.
+        output_path (str): Path to save the plot.
+
+        Returns:
+        tuple: The drawing task and the hexadecimal hash of its inputs.
+        """
+        x = pd.to_numeric(data_df[x_col], errors='coerce').to_numpy(dtype=np.float64)
+        y_values = data_df[y_col]
+        if isinstance(y_values.dtype, pd.CategoricalDtype) and pd.api.types.is_numeric_dtype(
+                y_values.cat.categories):
+            # Numeric levels such as the importance are drawn at their values
+            y_values = y_values.astype(np.float64)
+        y_labels = None
+        if pd.api.types.is_numeric_dtype(y_values):
+            y = y_values.to_numpy(dtype=np.float64)
+        else:
+            codes, categories = pd.factorize(y_values, sort=True)
+            y = np.where(codes < 0, np.nan, codes).astype(np.float64)
+            y_labels = [str(category) for category in categories]
+        valid = ~(np.isnan(x) | np.isnan(y))
+        x, y = np.ascontiguousarray(x[valid]), np.ascontiguousarray(y[valid])
+
+        hexbin = len(x) >= self.hexbin_points
+        if hexbin or len(x) <= self.max_points:
+            sample = slice(None)
+        else:
+            sample = np.sort(np.random.default_rng(0).choice(len(x), self.max_points, replace=False))
+
+        digest = hashlib.sha256()
+        settings = [RENDERER_VERSION, x_col, y_col, y_labels, self.max_points, self.hexbin_points,
+                    list(self.figsize), self.dpi]
+        digest.update(json.dumps(settings).encode())
+        digest.update(x.tobytes())
+        digest.update(b'\0')
+        digest.update(y.tobytes())
+        return (output_path, x, y, sample, x_col, y_col, y_labels, hexbin), digest.hexdigest()
+
+    def _run(self, tasks):
+        workers = max(1, min(self.max_workers, len(tasks)))
+        if multiprocessing.current_process().daemon:
+            workers = 1
+        if not tasks:
+            return []
+        if workers == 1:
+            _init_worker(self.figsize, self.dpi)
+            return [_draw(task) for task in tasks]
+        with multiprocessing.get_context().Pool(workers, initializer=_init_worker,
+                                                initargs=(self.figsize, self.dpi)) as pool:
+            return pool.map(_draw, tasks, chunksize=max(1, len(tasks) // (4 * workers)))
+
+    def _load_manifest(self, directory):
+        try:
+            with open(os.path.join(directory, self.manifest_name)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_manifest(self, directory, manifest):
+        if not os.path.isdir(directory):
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.json.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, os.path.join(directory, self.manifest_name))
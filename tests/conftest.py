@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules import each other from the src directory, as when main.py runs
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
@@ -0,0 +1,53 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from centralities.disruption import DisruptionCalculator
+from graph.csr import CSRGraph
+
+
+def _graph():
+    G = nx.gnp_random_graph(80, 0.05, directed=True, seed=3)
+    # Self-loops, reciprocal citations and a node citing a node and one of its references
+    G.add_edges_from([(0, 0), (5, 5), (1, 2), (2, 1), (10, 11), (11, 10), (10, 12), (11, 12), (12, 12)])
+    G.add_node(100)
+    return G
+
+
+def _notebook_disruption(graph):
+    # calculate_disruptions_new of notebooks/groundTruths.ipynb, the definition the index must reproduce
+    disruptions = {}
+    for node in graph.nodes:
+        i, j, k = 0, 0, 0
+        for in_node in graph.predecessors(node):
+            for out_node in graph.successors(node):
+                if graph.has_edge(in_node, out_node):
+                    j += 1
+                    break
+        i = graph.in_degree(node) - j
+        for out_node in graph.successors(node):
+            for in_out_node in graph.predecessors(out_node):
+                if in_out_node != node and not graph.has_edge(in_out_node, node):
+                    k += 1
+        try:
+            disruptions[node] = (i - j) / (i + j + k)
+        except ZeroDivisionError:
+            disruptions[node] = np.nan
+    return disruptions
+
+
+def _assert_identical(values, expected):
+    assert set(values) == set(expected)
+    for node, value in expected.items():
+        assert values[node] == value or (np.isnan(values[node]) and np.isnan(value)), node
+
+
+@pytest.mark.parametrize('chunk_size', [7, 100000])
+def test_disruption_matches_notebook(chunk_size):
+    G = _graph()
+    _assert_identical(DisruptionCalculator(chunk_size=chunk_size).calculate(G), _notebook_disruption(G))
+
+
+def test_disruption_of_csr_graph():
+    G = _graph()
+    _assert_identical(DisruptionCalculator().calculate(CSRGraph.from_networkx(G)), _notebook_disruption(G))
@@ -0,0 +1,38 @@
+import networkx as nx
+import pytest
+
+from centralities.incremental import IncrementalCentralities
+from graph.csr import CSRGraph
+
+
+def _graph(labels):
+    G = nx.gnp_random_graph(40, 0.08, directed=True, seed=11)
+    return nx.relabel_nodes(G, {node: labels(node) for node in G})
+
+
+@pytest.mark.parametrize('labels', [lambda node: f'ECLI:{node}', lambda node: node])
+def test_saved_state_is_refreshed_incrementally(tmp_path, labels):
+    G = _graph(labels)
+    old = G.copy()
+    old.remove_edges_from(list(old.edges)[:5])
+    state = IncrementalCentralities()
+    state.initialize(CSRGraph.from_networkx(old))
+    state.save(tmp_path / 'state.npz')
+
+    restored = IncrementalCentralities.load(tmp_path / 'state.npz')
+    assert restored.graph.node_ids.equals(state.graph.node_ids)
+    measures = restored.refresh(CSRGraph.from_networkx(G))
+    # Only the removed edges are new, the nodes are recognized
+    assert restored.last_update['new_nodes'] == 0
+    assert restored.last_update['new_edges'] == 5
+    expected = IncrementalCentralities().initialize(CSRGraph.from_networkx(G))
+    for node, value in expected['in_degree_centrality'].items():
+        assert measures['in_degree_centrality'][node] == value
+
+
+def test_mixed_node_ids_are_rejected(tmp_path):
+    state = IncrementalCentralities()
+    state.initialize(CSRGraph.from_networkx(_graph(lambda node: node if node % 2 else str(node))))
+    with pytest.raises(ValueError, match='strings or all numbers'):
+        state.save(tmp_path / 'state.npz')
+    assert not list(tmp_path.iterdir())
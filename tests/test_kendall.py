@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import correlation.kendall as kendall
+from correlation.kendall import LEVEL_COUNTING_LIMIT, KendallCorrelation, _tau_b_rows
+
+
+def _rows(x_levels, y_levels, n_rows=12, n_columns=60, seed=0):
+    # Integer ranks with many ties, missing entries and one constant row
+    rng = np.random.default_rng(seed)
+    x = rng.integers(0, x_levels, size=(n_rows, n_columns))
+    y = rng.integers(0, y_levels, size=(n_rows, n_columns))
+    invalid = rng.random((n_rows, n_columns)) < 0.15
+    y[0] = 1
+    return x, y, invalid
+
+
+def _pandas_taus(x, y, invalid):
+    taus = []
+    for k in range(len(x)):
+        frame = pd.DataFrame({'x': np.where(invalid[k], np.nan, x[k]), 'y': y[k].astype(np.float64)})
+        taus.append(frame.corr('kendall').loc['x', 'y'])
+    return np.array(taus)
+
+
+@pytest.mark.parametrize('x_levels, y_levels', [(3, 4), (50, 4), (4, 50)])
+def test_tau_b_rows_matches_pandas(x_levels, y_levels):
+    x, y, invalid = _rows(x_levels, y_levels)
+    np.testing.assert_allclose(_tau_b_rows(x, y, invalid, 1), _pandas_taus(x, y, invalid), atol=1e-12)
+
+
+def test_tau_b_rows_falls_back_to_scipy_above_the_level_limit(monkeypatch):
+    calls = []
+    scipy_rows = kendall._tau_b_rows_scipy
+    monkeypatch.setattr(kendall, '_tau_b_rows_scipy', lambda *args: calls.append(1) or scipy_rows(*args))
+    x, y, invalid = _rows(LEVEL_COUNTING_LIMIT + 8, LEVEL_COUNTING_LIMIT + 3)
+    np.testing.assert_allclose(_tau_b_rows(x, y, invalid, 1), _pandas_taus(x, y, invalid), atol=1e-12)
+    assert calls
+
+
+def _frame(n_rows=300, seed=1):
+    rng = np.random.default_rng(seed)
+    importance = rng.integers(1, 5, size=n_rows).astype(np.float64)
+    frame = pd.DataFrame({
+        'ties': rng.integers(0, 6, size=n_rows) + importance,
+        'continuous': rng.normal(size=n_rows) - importance,
+        'levels': rng.integers(0, 40, size=n_rows).astype(np.float64),
+        'importance': importance,
+    })
+    frame.loc[rng.random(n_rows) < 0.1, 'ties'] = np.nan
+    frame.loc[rng.random(n_rows) < 0.05, 'importance'] = np.nan
+    return frame
+
+
+def test_correlations_match_pandas():
+    frame = _frame()
+    columns = ['ties', 'continuous', 'levels']
+    expected = frame.corr('kendall')['importance'][columns]
+    result = KendallCorrelation().resampled_correlations_with(frame, columns, 'importance', n_resamples=10, seed=0)
+    np.testing.assert_allclose(result['tau'].to_numpy(), expected.to_numpy(), atol=1e-12)
+
+
+def test_resamples_do_not_depend_on_the_workers():
+    frame = _frame()
+    columns = ['ties', 'continuous', 'levels']
+    # Small batches, so the resamples are spread over several tasks
+    results = [KendallCorrelation(max_workers=workers, batch_elements=2000).resampled_correlations_with(
+        frame, columns, 'importance', n_resamples=40, seed=5) for workers in (1, 3)]
+    pd.testing.assert_frame_equal(results[0], results[1])
+    assert results[0][['ci_low', 'ci_high', 'p_value']].notna().all().all()
@@ -0,0 +1,47 @@
+import networkx as nx
+import pytest
+
+from centralities.paths import PathCentralityEngine
+
+TOLERANCE = 1e-9
+
+
+def _graph():
+    # Several weakly connected components, reciprocated citations, sinks and an isolated node
+    G = nx.gnp_random_graph(60, 0.06, directed=True, seed=7)
+    G.add_edges_from([(100, 101), (101, 102), (102, 100), (102, 103)])
+    G.add_node(200)
+    return G
+
+
+def _forest_closeness(G):
+    values = {}
+    for component in nx.weakly_connected_components(G):
+        values.update(nx.closeness_centrality(G.subgraph(component)))
+    return values
+
+
+def _assert_close(values, expected):
+    assert set(values) == set(expected)
+    for node, value in expected.items():
+        assert values[node] == pytest.approx(value, abs=TOLERANCE)
+
+
+@pytest.mark.parametrize('max_workers', [1, 3])
+def test_distance_centralities_match_networkx(max_workers):
+    G = _graph()
+    results = PathCentralityEngine(max_workers=max_workers).distance_centralities(G)
+    _assert_close(results['betweenness_centrality'], nx.betweenness_centrality(G))
+    _assert_close(results['closeness_centrality'], nx.closeness_centrality(G))
+    _assert_close(results['harmonic_centrality'], nx.harmonic_centrality(G))
+    _assert_close(results['forest_closeness_centrality'], _forest_closeness(G))
+
+
+@pytest.mark.parametrize('max_workers', [1, 3])
+def test_single_metrics_match_networkx(max_workers):
+    G = _graph()
+    engine = PathCentralityEngine(max_workers=max_workers)
+    _assert_close(engine.betweenness_centrality(G), nx.betweenness_centrality(G))
+    _assert_close(engine.closeness_centrality(G), nx.closeness_centrality(G))
+    _assert_close(engine.harmonic_centrality(G), nx.harmonic_centrality(G))
+    _assert_close(engine.forest_closeness_centrality(G), _forest_closeness(G))
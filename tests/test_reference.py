@@ -0,0 +1,12 @@
+import pytest
+
+from benchmarks.correctness import ReferenceChecker
+
+METRICS = [name for name, _, _, _ in ReferenceChecker().checks()]
+
+
+@pytest.mark.parametrize('metric', METRICS)
+def test_metric_matches_reference(metric):
+    [result] = ReferenceChecker(n_nodes=120).run([metric])
+    assert result['error'] is None
+    assert result['passed'], f"{metric} differs by {result['max_abs_error']} (tolerance {result['tolerance']})"